@@ -0,0 +1,252 @@
+import asyncio
+import json
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+import profiling
+from database import init_db, read_connection, search_fulldata, table_columns
+from inventory_management import add_products, current_quantity, decrement_stock, delete_products
+
+# Threads running database and forecasting work, so the event loop only parses requests
+DB_WORKERS = 8
+
+# Largest request body accepted, in bytes
+MAX_BODY = 1024 * 1024
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+class HttpError(Exception):
+    # Raised by a handler to answer with an error status and message
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+# Endpoint handlers. Each runs on a worker thread and receives the path parameters,
+# the query string and the JSON body; it returns (status, JSON-serializable payload).
+
+def add_product_handler(params, query, body):
+    # product_id is optional; without it the next free ID is allocated
+    product_id = body.get('product_id')
+    if product_id is not None and (not isinstance(product_id, int) or isinstance(product_id, bool)):
+        raise HttpError(400, "product_id must be an integer.")
+    try:
+        record = (product_id, body['name'], body['category'], int(body['initial_quantity']),
+                  float(body['unit_price']), int(body.get('units_sold', 0)))
+    except (KeyError, TypeError, ValueError):
+        raise HttpError(400, "name, category, initial_quantity and unit_price are required.")
+    [(product_id, status)] = add_products([record], DB_NAME)
+    if status != 'added':
+        raise HttpError(409, f"Product ID {product_id} already exists.")
+    return 201, {'product_id': product_id}
+
+def delete_product_handler(params, query, body):
+    [(product_id, status)] = delete_products([int(params['product_id'])], DB_NAME)
+    if status != 'deleted':
+        raise HttpError(404, f"Product ID {product_id} does not exist.")
+    return 200, {'product_id': product_id, 'status': status}
+
+def stock_handler(params, query, body):
+    product_id = int(params['product_id'])
+    quantity = current_quantity(product_id, DB_NAME)
+    if quantity is None:
+        raise HttpError(404, f"No inventory record found for product ID {product_id}.")
+    return 200, {'product_id': product_id, 'quantity': quantity}
+
+def sell_handler(params, query, body):
+    # Same as update_inventory, or several products in one order with {"items": {id: units}}
+    if 'items' in body:
+        if not isinstance(body['items'], dict):
+            raise HttpError(400, "items must be an object mapping product IDs to units.")
+        items = {int(product_id): int(units) for product_id, units in body['items'].items()}
+    else:
+        items = {int(params['product_id']): int(body.get('units_sold', 0))}
+    new_quantities = decrement_stock(items, DB_NAME)
+    if new_quantities is None:
+        raise HttpError(409, "Insufficient inventory.")
+    return 200, {'quantities': {str(product_id): quantity for product_id, quantity in new_quantities.items()}}
+
+def forecast_handler(params, query, body):
+    from forecasting import cached_forecast, DEFAULT_HORIZON  # Loads pandas and numpy on first use
+
+    product_id = int(params['product_id'])
+    horizon = int(query.get('horizon', DEFAULT_HORIZON))
+    if horizon < 1:
+        raise HttpError(400, "horizon must be at least 1.")
+    forecast = cached_forecast(product_id, DB_NAME, horizon, query.get('model', 'moving_average'))
+    if isinstance(forecast, list):
+        raise HttpError(404, f"No data available for product ID {product_id}.")
+    return 200, {'product_id': product_id, 'forecast': [
+        {'date': date.strftime('%Y-%m-%d'), 'forecasted_quantity': float(quantity)}
+        for date, quantity in zip(forecast['date'], forecast['forecasted_quantity'])]}
+
+def search_handler(params, query, body):
+    term = query.get('q', '').strip()
+    if not term:
+        raise HttpError(400, "Query parameter q is required.")
+    rows = search_fulldata(term, DB_NAME, query.get('column'), int(query.get('limit', 50)))
+    return 200, {'results': [dict(zip(FULLDATA_COLUMNS, row)) for row in rows]}
+
+def monthly_sales_handler(params, query, body):
+    # Monthly totals from the sales rollups, overall or for one product
+    with read_connection(DB_NAME) as conn:
+        if 'product_id' in query:
+            rows = conn.execute("""
+                SELECT month, units_sold, total_revenue FROM SalesMonthlyProduct
+                WHERE product_id = ? ORDER BY month
+            """, (int(query['product_id']),)).fetchall()
+        else:
+            rows = conn.execute("SELECT month, units_sold, total_revenue FROM SalesMonthly ORDER BY month").fetchall()
+    return 200, {'months': [{'month': month, 'units_sold': units, 'total_revenue': revenue}
+                            for month, units, revenue in rows]}
+
+def low_stock_handler(params, query, body):
+    # Products at or below their reorder point, as of the last reorder refresh
+    from reorder import low_stock_products
+
+    limit = int(query['limit']) if 'limit' in query else None
+    columns = ('product_id', 'product_name', 'product_category', 'on_hand', 'avg_daily_demand',
+               'safety_stock', 'reorder_point', 'days_of_cover')
+    return 200, {'products': [dict(zip(columns, row)) for row in low_stock_products(DB_NAME, limit)]}
+
+def metrics_handler(params, query, body):
+    # Profiling aggregates for a Prometheus scrape; empty unless INVENTORY_PROFILE is set
+    return 200, profiling.prometheus_text()
+
+ROUTES = [
+    ('POST', r'/products', add_product_handler),
+    ('DELETE', r'/products/(?P<product_id>\d+)', delete_product_handler),
+    ('GET', r'/products/(?P<product_id>\d+)/stock', stock_handler),
+    ('POST', r'/products/(?P<product_id>\d+)/sell', sell_handler),
+    ('POST', r'/orders', sell_handler),
+    ('GET', r'/products/(?P<product_id>\d+)/forecast', forecast_handler),
+    ('GET', r'/search', search_handler),
+    ('GET', r'/sales/monthly', monthly_sales_handler),
+    ('GET', r'/reorder/low-stock', low_stock_handler),
+    ('GET', r'/metrics', metrics_handler),
+]
+# Time each endpoint handler when profiling is on. The wrappers go into the table
+# itself, since it holds the functions rather than looking them up by name.
+ROUTES = [(method, re.compile(pattern + '$'), profiling.timed(handler) if profiling.enabled() else handler)
+          for method, pattern, handler in ROUTES]
+
+# Database served and FullData column names, set by serve()
+DB_NAME = "inventory.db"
+FULLDATA_COLUMNS = []
+
+def _route(method, path):
+    allowed = False
+    for route_method, pattern, handler in ROUTES:
+        match = pattern.match(path)
+        if match:
+            if route_method == method:
+                return handler, match.groupdict()
+            allowed = True
+    raise HttpError(405 if allowed else 404, f"No route for {method} {path}.")
+
+def _dispatch(method, target, body):
+    # Runs on a worker thread: route the request and call its handler
+    try:
+        url = urlsplit(target)
+        handler, params = _route(method, url.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        body = json.loads(body) if body else {}
+        if not isinstance(body, dict):
+            raise HttpError(400, "Request body must be a JSON object.")
+        return handler(params, query, body)
+    except HttpError as e:
+        return e.status, {'error': str(e)}
+    except (ValueError, KeyError, TypeError) as e:
+        return 400, {'error': str(e)}
+    except Exception as e:
+        return 500, {'error': str(e)}
+
+async def _read_request(reader):
+    # Parse one HTTP/1.1 request; returns None when the client closed the connection
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+    except asyncio.LimitOverrunError:
+        raise HttpError(400, "Request headers too large.")
+    lines = head.decode('latin-1').split('\r\n')
+    method, target, version = lines[0].split(' ', 2)
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0))
+    if length > MAX_BODY:
+        raise HttpError(413, "Request body too large.")
+    try:
+        body = await reader.readexactly(length) if length else b''
+    except asyncio.IncompleteReadError:
+        return None  # The client closed the connection partway through the body
+    keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+    return method, target, body, keep_alive
+
+def _response(status, payload, keep_alive):
+    # Handlers returning a string are served as plain text, everything else as JSON
+    if isinstance(payload, str):
+        body, content_type = payload.encode(), "text/plain; version=0.0.4"
+    else:
+        body, content_type = json.dumps(payload).encode(), "application/json"
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode() + body
+
+async def _handle_connection(reader, writer, executor):
+    # Serve requests on one keep-alive connection until the client closes it
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            try:
+                request = await _read_request(reader)
+            except (HttpError, ValueError) as e:
+                writer.write(_response(getattr(e, 'status', 400), {'error': str(e)}, False))
+                break
+            if request is None:
+                break
+            method, target, body, keep_alive = request
+            status, payload = await loop.run_in_executor(executor, _dispatch, method, target, body)
+            writer.write(_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+async def serve(host="127.0.0.1", port=8080, db_name="inventory.db", workers=DB_WORKERS, ready=None):
+    # Run the API until cancelled; ready, if given, is an asyncio.Event set once listening
+    global DB_NAME, FULLDATA_COLUMNS
+    DB_NAME = db_name
+    init_db(db_name)
+    with read_connection(db_name) as conn:
+        FULLDATA_COLUMNS = table_columns(conn, 'FullData')
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api-db")
+    server = await asyncio.start_server(
+        lambda reader, writer: _handle_connection(reader, writer, executor), host, port, backlog=1024)
+    print(f"Inventory API listening on http://{host}:{port}")
+    if ready is not None:
+        ready.set()
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        executor.shutdown(wait=False)
+
+if __name__ == "__main__":
+    # python api.py [port] [database]
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+    db_name = sys.argv[2] if len(sys.argv) > 2 else "inventory.db"
+    try:
+        asyncio.run(serve(port=port, db_name=db_name))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,148 @@
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import profiling
+from database import read_connection
+
+# How often the Tk thread collects finished jobs (about one frame at 60 fps)
+POLL_MS = 16
+
+# SQLite virtual machine steps between cancellation checks on a running query
+PROGRESS_STEPS = 10000
+
+class Task:
+    # Handle passed to a background job: lets it check for cancellation, report
+    # progress to the UI and borrow a read connection that stops when cancelled
+
+    def __init__(self, runner, channel, on_progress):
+        self.channel = channel
+        self._runner = runner
+        self._on_progress = on_progress
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def report(self, message):
+        # Deliver a progress message to the job's on_progress callback on the Tk thread
+        if self._on_progress is not None:
+            self._runner._post(self, self._on_progress, message)
+
+    @contextmanager
+    def reader(self, db_name="inventory.db"):
+        # Pooled read connection whose queries are aborted as soon as the task is cancelled
+        with read_connection(db_name) as conn:
+            conn.set_progress_handler(lambda: 1 if self._cancelled.is_set() else 0, PROGRESS_STEPS)
+            try:
+                yield conn
+            finally:
+                conn.set_progress_handler(None, 0)
+
+def _channel_name(channel):
+    # Metric name for a channel: per-window channels such as ("forecast", id(form)) share
+    # their first element, so opening windows does not keep adding timer series
+    return channel[0] if isinstance(channel, tuple) else channel
+
+class BackgroundTasks:
+    # Runs database and analytics jobs on worker threads so the Tk main loop never
+    # blocks on SQLite. Results come back through a queue that the Tk thread polls
+    # with root.after, since Tk widgets may only be touched from that thread.
+    # Jobs submitted on the same channel supersede each other: the older job is
+    # cancelled (interrupting its query) and its result is dropped.
+
+    def __init__(self, root, workers=2, on_busy=None):
+        self.root = root
+        self.on_busy = on_busy
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db-worker")
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._current = {}
+        self._running = 0
+        self._closed = False
+        self.root.after(POLL_MS, self._poll)
+
+    def submit(self, channel, job, on_done, on_error=None, on_progress=None):
+        # Run job(task) in the background and call on_done(result) on the Tk thread,
+        # or on_error(exception) if it fails, unless a newer job on the channel replaced it
+        with self._lock:
+            previous = self._current.get(channel)
+            if previous is not None:
+                previous.cancel()
+            task = Task(self, channel, on_progress)
+            self._current[channel] = task
+            self._running += 1
+        self._notify_busy()
+        self._executor.submit(self._run, task, job, on_done, on_error)
+        return task
+
+    def cancel(self, channel):
+        # Cancel whatever job is running on a channel, e.g. when its window closes
+        with self._lock:
+            task = self._current.pop(channel, None)
+        if task is not None:
+            task.cancel()
+
+    def shutdown(self):
+        self._closed = True
+        with self._lock:
+            for task in self._current.values():
+                task.cancel()
+            self._current.clear()
+        self._executor.shutdown(wait=False)
+
+    @property
+    def busy(self):
+        return self._running > 0
+
+    def _run(self, task, job, on_done, on_error):
+        try:
+            with profiling.timer(f"background.{_channel_name(task.channel)}"):
+                result = job(task)
+        except sqlite3.OperationalError as e:
+            # An interrupted query surfaces as OperationalError; only report real failures
+            self._finish(task, None if task.cancelled else on_error, e)
+        except Exception as e:
+            self._finish(task, on_error, e)
+        else:
+            self._finish(task, on_done, result)
+
+    def _finish(self, task, callback, value):
+        with self._lock:
+            self._running -= 1
+            if self._current.get(task.channel) is task:
+                del self._current[task.channel]
+        self._results.put((task, callback, value, True))
+
+    def _post(self, task, callback, value):
+        self._results.put((task, callback, value, False))
+
+    def _is_current(self, task):
+        with self._lock:
+            current = self._current.get(task.channel)
+        return not task.cancelled and (current is None or current is task)
+
+    def _poll(self):
+        # Runs on the Tk thread: deliver queued results of jobs that were not superseded
+        finished = False
+        while True:
+            try:
+                task, callback, value, done = self._results.get_nowait()
+            except queue.Empty:
+                break
+            finished = finished or done
+            if callback is not None and self._is_current(task):
+                callback(value)
+        if finished:
+            self._notify_busy()
+        if not self._closed:
+            self.root.after(POLL_MS, self._poll)
+
+    def _notify_busy(self):
+        if self.on_busy is not None:
+            self.on_busy(self.busy)
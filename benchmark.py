@@ -0,0 +1,1011 @@
+import argparse
+import asyncio
+import contextlib
+import csv
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from database import connect_db, create_tables, migrate, MIGRATIONS, write_connection, read_connection, close_connections, load_data_from_csv, fetch_page, search_condition, table_columns
+from inventory_management import add_products, decrement_stock, delete_products, record_movement, update_inventory, update_prices, update_products
+from forecasting import forecast_inventory, forecast_all, forecast_parallel, cached_forecast
+
+CATEGORIES = ["Electronics", "Home Appliances", "Clothing", "Books", "Beauty Products", "Sports"]
+
+# Scratch directory for one benchmark's CSVs and databases. It is removed with everything
+# in it when the block exits, after the pooled connections to those databases are closed.
+@contextlib.contextmanager
+def _scratch_dir():
+    with tempfile.TemporaryDirectory(prefix="bench_", ignore_cleanup_errors=True) as path:
+        try:
+            yield path
+        finally:
+            close_connections()
+
+# Time a callable over a number of iterations and return microseconds per call
+def _time_per_call(func, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        func(i)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+# Compare opening a connection per operation with the pooled connection manager
+def bench_connections(iterations=2000, db_name=None):
+    if db_name is None:
+        with _scratch_dir() as workdir:
+            return bench_connections(iterations, os.path.join(workdir, "bench_connections.db"))
+    create_tables(db_name)
+    with write_connection(db_name) as conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO Products (product_id, product_name, product_category, initial_quantity) VALUES (?, ?, ?, ?)",
+            [(10000 + i, f"Product {i}", "Bench", 100) for i in range(1000)])
+
+    # Current pattern: connect, query, close for every operation
+    def per_call_read(i):
+        conn = connect_db(db_name)
+        conn.execute("SELECT initial_quantity FROM Products WHERE product_id = ?", (10000 + i % 1000,)).fetchone()
+        conn.close()
+
+    def per_call_write(i):
+        conn = connect_db(db_name)
+        conn.execute("UPDATE Products SET initial_quantity = ? WHERE product_id = ?", (i, 10000 + i % 1000))
+        conn.commit()
+        conn.close()
+
+    # Pooled pattern: borrow a long-lived connection
+    def pooled_read(i):
+        with read_connection(db_name) as conn:
+            conn.execute("SELECT initial_quantity FROM Products WHERE product_id = ?", (10000 + i % 1000,)).fetchone()
+
+    def pooled_write(i):
+        with write_connection(db_name) as conn:
+            conn.execute("UPDATE Products SET initial_quantity = ? WHERE product_id = ?", (i, 10000 + i % 1000))
+
+    results = {
+        "per_call_read_us": _time_per_call(per_call_read, iterations),
+        "pooled_read_us": _time_per_call(pooled_read, iterations),
+        "per_call_write_us": _time_per_call(per_call_write, iterations),
+        "pooled_write_us": _time_per_call(pooled_write, iterations),
+    }
+    close_connections()
+
+    print(f"Connection benchmark ({iterations} operations each):")
+    for name, value in results.items():
+        print(f"  {name}: {value:.1f}")
+    return results
+
+# Measure streaming CSV ingestion throughput and peak memory
+# on about rows rows of one-per-product-per-day sales
+def bench_csv_ingest(rows=1000000, chunksize=50000, products=1000):
+    with _scratch_dir() as workdir:
+        csv_file = generate_sales_csv(os.path.join(workdir, "sales.csv"), products=products,
+                                      days=max(1, -(-rows // products)))
+        db_name = os.path.join(workdir, "bench_ingest.db")
+        create_tables(db_name)
+        stats = load_data_from_csv(csv_file, db_name, chunksize=chunksize)
+        close_connections()
+        return stats
+
+# The sample export shipped with the repo, which generate_sales_csv scales up
+TEMPLATE_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Online Sales Data.csv")
+
+# Demand multiplier per weekday, Monday first
+WEEKDAY_DEMAND = (0.9, 0.9, 0.95, 1.0, 1.1, 1.25, 1.2)
+
+# Product names, prices and daily units per category in the sample export
+def _template_profile(template=TEMPLATE_CSV):
+    profile = {}
+    with open(template, newline="") as f:
+        for row in csv.DictReader(f):
+            entry = profile.setdefault(row["Product Category"], {"names": [], "prices": [], "units": []})
+            entry["names"].append(row["Product Name"])
+            entry["prices"].append(float(row["Unit Price"]))
+            entry["units"].append(int(row["Units Sold"]))
+    return profile
+
+def _csv_field(value):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow([value])
+    return buffer.getvalue().rstrip("\r\n")
+
+# Write a synthetic sales export in the layout of Online Sales Data.csv, scaled to
+# products x days rows ordered by date. Products are drawn from the sample's categories,
+# names and prices (prices jittered per product). Mean daily units follow the sample's
+# per-category average, spread over products by a Zipf popularity curve with exponent
+# skew (0 gives every product the same demand), times a weekday pattern, with
+# Poisson noise. categories is a number of categories or a list of names; beyond the
+# sample's six, names are suffixed and reuse the sample profiles in turn.
+# The same arguments always produce the same file.
+def generate_sales_csv(path, products=1000, days=365, categories=None, skew=1.1, seed=0,
+                       start_date=datetime.date(2024, 1, 1), template=TEMPLATE_CSV):
+    rng = np.random.default_rng(seed)
+    profile = _template_profile(template)
+    bases = list(profile)
+    if categories is None:
+        categories = bases
+    elif isinstance(categories, int):
+        categories = [bases[i % len(bases)] + (f" {i // len(bases) + 1}" if i >= len(bases) else "")
+                      for i in range(categories)]
+    category_bases = [bases[i % len(bases)] for i in range(len(categories))]
+
+    product_category = rng.integers(len(categories), size=products)
+    popularity = rng.permutation(np.arange(1, products + 1) ** -float(skew))
+    popularity /= popularity.mean()
+    heads, prices, mean_units, initial = [], [], np.empty(products), np.empty(products, dtype=np.int64)
+    for product in range(products):
+        category = product_category[product]
+        sample = profile[category_bases[category]]
+        pick = rng.integers(len(sample["names"]))
+        price = round(sample["prices"][pick] * rng.lognormal(0, 0.2), 2)
+        mean_units[product] = np.mean(sample["units"]) * popularity[product]
+        initial[product] = int(mean_units[product] * days * rng.uniform(0.8, 1.5)) + 100
+        name = _csv_field(f"{sample['names'][pick]} #{product}")
+        heads.append((f"{10000 + product},", f",{_csv_field(categories[category])},{name},"))
+        prices.append(price)
+    prices = np.array(prices)
+
+    with open(path, "w", newline="") as f:
+        f.write("Product ID,Date,Product Category,Product Name,Units Sold,Unit Price,Total Revenue,Initial_Quantity\n")
+        for day in range(days):
+            date = start_date + datetime.timedelta(days=day)
+            stamp = f"{date.month}/{date.day}/{date.year}"
+            units = rng.poisson(mean_units * WEEKDAY_DEMAND[date.weekday()])
+            revenue = np.round(units * prices, 2)
+            f.write("".join(f"{head}{stamp}{middle}{sold},{price},{total:.2f},{stock}\n" for (head, middle), sold, price, total, stock
+                            in zip(heads, units.tolist(), prices.tolist(), revenue.tolist(), initial.tolist())))
+    return path
+
+# Time one call of a function in milliseconds
+def _time_ms(func):
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) * 1000
+
+# Median of several timed calls, for queries fast enough that one run is mostly noise
+def _median_ms(func, repeat=5):
+    return float(np.median([_time_ms(func) for _ in range(repeat)]))
+
+# Fill Sales and Inventory with one row per product per day in the legacy %m/%d/%Y format
+def _fill_legacy_tables(db_name, rows, products=1000, start_date=datetime.date(2024, 1, 1)):
+    def dates():
+        for i in range(rows):
+            day, product = divmod(i, products)
+            date = start_date + datetime.timedelta(days=day)
+            yield 10000 + product, f"{date.month:02d}/{date.day:02d}/{date.year}"
+
+    with write_connection(db_name) as conn:
+        for name in ("idx_sales_date_product", "idx_inventory_product_id", "idx_inventory_date", "idx_fulldata_product_date"):
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+        conn.execute("DELETE FROM schema_version WHERE version IN (2, 3)")  # Re-run the date migration and indexes
+        conn.executemany(
+            "INSERT INTO Sales (product_id, sale_date, units_sold, unit_price, total_revenue) VALUES (?, ?, 5, 2.0, 10.0)",
+            dates())
+        conn.executemany(
+            "INSERT INTO Inventory (product_id, inventory_date, quantity, remaining_quantity) VALUES (?, ?, 100, 95)",
+            dates())
+    last_date = start_date + datetime.timedelta(days=(rows - 1) // products)
+    return last_date
+
+# Compare the date queries behind show_monthly_inventory and show_sales_chart
+# before and after the ISO date migration and secondary indexes
+def bench_date_queries(sizes=(1000000, 10000000)):
+    results = {}
+    for rows in sizes:
+        with _scratch_dir() as workdir:
+            db_name = os.path.join(workdir, f"bench_dates_{rows}.db")
+            create_tables(db_name)
+            last_date = _fill_legacy_tables(db_name, rows)
+
+            def legacy_monthly():
+                with read_connection(db_name) as conn:
+                    conn.execute("""
+                        SELECT SUBSTR(inventory_date, 1, 2) || '/' || SUBSTR(inventory_date, 7, 4) AS month,
+                               SUM(remaining_quantity)
+                        FROM Inventory
+                        WHERE SUBSTR(inventory_date, 1, 2) || '/' || SUBSTR(inventory_date, 7, 4) = ?
+                        GROUP BY month
+                    """, (last_date.strftime('%m/%Y'),)).fetchall()
+
+            def legacy_chart():
+                with read_connection(db_name) as conn:
+                    data = pd.read_sql_query("SELECT sale_date, SUM(total_revenue) AS total_revenue FROM Sales GROUP BY sale_date", conn)
+                data['sale_date'] = pd.to_datetime(data['sale_date'], format='%m/%d/%Y')
+                data.resample('MS', on='sale_date').sum()
+
+            def iso_monthly():
+                month_start = last_date.replace(day=1).isoformat()
+                with read_connection(db_name) as conn:
+                    conn.execute("""
+                        SELECT SUBSTR(inventory_date, 1, 7) AS month, SUM(remaining_quantity)
+                        FROM Inventory
+                        WHERE inventory_date >= ? AND inventory_date < date(?, '+1 month')
+                        GROUP BY month
+                    """, (month_start, month_start)).fetchall()
+
+            def iso_chart():
+                with read_connection(db_name) as conn:
+                    pd.read_sql_query("""
+                        SELECT SUBSTR(sale_date, 1, 7) AS month, SUM(total_revenue) AS total_revenue
+                        FROM Sales GROUP BY month ORDER BY month
+                    """, conn)
+
+            def rollup_chart():
+                with read_connection(db_name) as conn:
+                    pd.read_sql_query("SELECT month, total_revenue FROM SalesMonthly ORDER BY month", conn)
+
+            result = {
+                "legacy_monthly_inventory_ms": _time_ms(legacy_monthly),
+                "legacy_sales_chart_ms": _time_ms(legacy_chart),
+                "migration_ms": _time_ms(lambda: create_tables(db_name)),
+                "iso_monthly_inventory_ms": _time_ms(iso_monthly),
+                "iso_sales_chart_ms": _time_ms(iso_chart),
+                "rollup_sales_chart_ms": _time_ms(rollup_chart),
+            }
+            close_connections()
+
+            print(f"Date query benchmark ({rows} rows per table):")
+            for name, value in result.items():
+                print(f"  {name}: {value:.1f}")
+            results[rows] = result
+    return results
+
+# Fill FullData with one ISO-dated row per product per day
+def _fill_fulldata(db_name, products, days, start_date=datetime.date(2024, 1, 1), seed=0):
+    rng = random.Random(seed)
+    dates = [(start_date + datetime.timedelta(days=day)).isoformat() for day in range(days)]
+
+    def rows():
+        for product in range(products):
+            category = CATEGORIES[product % len(CATEGORIES)]
+            for date in dates:
+                units = rng.randint(0, 20)
+                yield 10000 + product, date, category, f"Product {product}", units, 2.0, units * 2.0, 100000
+
+    with write_connection(db_name) as conn:
+        conn.executemany("""
+            INSERT INTO FullData (product_id, date, product_category, product_name, units_sold, unit_price, total_revenue, initial_quantity)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows())
+
+# Compare forecasting the whole catalogue in one pass with one call per product
+def bench_forecast_all(products=100000, days=30, sample=200):
+    with _scratch_dir() as workdir:
+        db_name = os.path.join(workdir, "bench_forecast.db")
+        create_tables(db_name)
+        _fill_fulldata(db_name, products, days)
+
+        batch_ms = _time_ms(lambda: forecast_all(db_name))
+        per_product_ms = _time_ms(lambda: [forecast_inventory(10000 + i, db_name) for i in range(sample)]) / sample
+        close_connections()
+
+        results = {
+            "forecast_all_ms": batch_ms,
+            "per_product_ms": per_product_ms,
+            "per_product_extrapolated_ms": per_product_ms * products,
+        }
+        print(f"Forecast benchmark ({products} products x {days} days):")
+        for name, value in results.items():
+            print(f"  {name}: {value:.1f}")
+        return results
+
+# Measure how forecast_parallel scales with the number of worker processes
+def bench_forecast_parallel(products=20000, days=180, model="exponential_smoothing", chunk_size=500, workers=None):
+    with _scratch_dir() as workdir:
+        db_name = os.path.join(workdir, "bench_parallel.db")
+        create_tables(db_name)
+        _fill_fulldata(db_name, products, days)
+        close_connections()
+
+        if workers is None:
+            cpus = os.cpu_count() or 1
+            workers = sorted({1, 2, 4, 8, 16, 32, cpus} & set(range(1, cpus + 1)))
+        results = {}
+        for count in workers:
+            results[count] = _time_ms(lambda: forecast_parallel(db_name, model=model, workers=count, chunk_size=chunk_size))
+
+        print(f"Parallel forecast benchmark ({products} products x {days} days, {model}):")
+        for count, value in results.items():
+            print(f"  {count} workers: {value:.1f} ms (speedup {results[workers[0]] / value:.2f}x)")
+        return results
+
+# Compare uncached forecasts with repeat lookups served from the forecast cache
+def bench_forecast_cache(products=1000, days=365, iterations=2000):
+    with _scratch_dir() as workdir:
+        db_name = os.path.join(workdir, "bench_cache.db")
+        create_tables(db_name)
+        _fill_fulldata(db_name, products, days)
+
+        results = {
+            "uncached_us": _time_per_call(lambda i: forecast_inventory(10000 + i % products, db_name), iterations // 10),
+            "first_lookup_us": _time_per_call(lambda i: cached_forecast(10000 + i, db_name), products),
+            "repeat_lookup_us": _time_per_call(lambda i: cached_forecast(10000 + i % products, db_name), iterations),
+        }
+        close_connections()
+
+        print(f"Forecast cache benchmark ({products} products x {days} days):")
+        for name, value in results.items():
+            print(f"  {name}: {value:.1f}")
+        return results
+
+# Time opening the FullData viewer (column list plus first page) and paging through it,
+# compared with the previous full SELECT * into pandas
+def bench_viewer(products=5000, days=1000, pages=50, sort_column="units_sold"):
+    with _scratch_dir() as workdir:
+        db_name = os.path.join(workdir, "bench_viewer.db")
+        create_tables(db_name)
+        _fill_fulldata(db_name, products, days)
+
+        def open_viewer():
+            with read_connection(db_name) as conn:
+                table_columns(conn, "FullData")
+                fetch_page(conn, "FullData")
+
+        def scroll(sort):
+            with read_connection(db_name) as conn:
+                columns = table_columns(conn, "FullData")
+                after = None
+                for _ in range(pages):
+                    rows = fetch_page(conn, "FullData", sort_column=sort, after=after)
+                    after = (rows[-1][columns.index(sort) + 1] if sort else None, rows[-1][0])
+
+        def full_select():
+            with read_connection(db_name) as conn:
+                pd.read_sql_query("SELECT * FROM FullData", conn)
+
+        results = {
+            "open_viewer_ms": _time_ms(open_viewer),
+            "scroll_pages_ms": _time_ms(lambda: scroll(None)) / pages,
+            "scroll_sorted_pages_ms": _time_ms(lambda: scroll(sort_column)) / pages,
+            "full_select_ms": _time_ms(full_select),
+        }
+        close_connections()
+
+        print(f"Viewer benchmark ({products * days} rows, per-page times over {pages} pages):")
+        for name, value in results.items():
+            print(f"  {name}: {value:.1f}")
+        return results
+
+# Compare the viewer's old LIKE filter with the full-text and range search conditions
+def bench_search(products=5000, days=200, term="Product 4321"):
+    with _scratch_dir() as workdir:
+        db_name = os.path.join(workdir, "bench_search.db")
+        create_tables(db_name)
+        _fill_fulldata(db_name, products, days)
+
+        def first_page(where, params):
+            with read_connection(db_name) as conn:
+                fetch_page(conn, "FullData", where, params)
+
+        def matches(where, params):
+            with read_connection(db_name) as conn:
+                conn.execute(f"SELECT COUNT(*) FROM FullData WHERE {where}", params).fetchone()
+
+        with read_connection(db_name) as conn:
+            fulltext = search_condition(conn, "product_name", term)
+            date_range = search_condition(conn, "date", "2024-03")
+        like = ('"product_name" LIKE ?', (f"%{term}%",))
+        date_like = ('"date" LIKE ?', ("%2024-03%",))
+
+        results = {
+            "like_first_page_ms": _time_ms(lambda: first_page(*like)),
+            "fulltext_first_page_ms": _time_ms(lambda: first_page(*fulltext)),
+            "like_count_ms": _time_ms(lambda: matches(*like)),
+            "fulltext_count_ms": _time_ms(lambda: matches(*fulltext)),
+            "date_like_count_ms": _time_ms(lambda: matches(*date_like)),
+            "date_range_count_ms": _time_ms(lambda: matches(*date_range)),
+        }
+        close_connections()
+
+        print(f"Search benchmark ({products * days} rows, term {term!r}):")
+        for name, value in results.items():
+            print(f"  {name}: {value:.1f}")
+        return results
+
+# Place random multi-line orders from one worker process; returns the units accepted per product
+def _place_orders(db_name, orders, products, seed):
+    rng = random.Random(seed)
+    accepted = {}
+    with contextlib.redirect_stdout(io.StringIO()):  # Silence "Insufficient inventory!"
+        for _ in range(orders):
+            lines = {10000 + rng.randrange(products): rng.randint(1, 3) for _ in range(rng.randint(1, 3))}
+            if decrement_stock(lines, db_name) is not None:
+                for product_id, units in lines.items():
+                    accepted[product_id] = accepted.get(product_id, 0) + units
+    close_connections()
+    return accepted
+
+# Stress decrement_stock from several processes until stock runs out, then check
+# that no product was oversold and the ledger agrees with StockLevel
+def bench_stock_decrement(processes=4, orders=2000, products=50, stock=500):
+    with _scratch_dir() as workdir:
+        db_name = os.path.join(workdir, "bench_stock.db")
+        create_tables(db_name)
+        with write_connection(db_name) as conn:
+            for product in range(products):
+                record_movement(conn, 10000 + product, 'receipt', stock)
+        close_connections()
+
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = [pool.submit(_place_orders, db_name, orders, products, seed) for seed in range(processes)]
+            results = [future.result() for future in futures]
+        seconds = time.perf_counter() - start
+
+        sold = {}
+        for accepted in results:
+            for product_id, units in accepted.items():
+                sold[product_id] = sold.get(product_id, 0) + units
+        with read_connection(db_name) as conn:
+            levels = dict(conn.execute("SELECT product_id, quantity FROM StockLevel"))
+            ledger = dict(conn.execute("SELECT product_id, SUM(quantity) FROM StockMovement GROUP BY product_id"))
+            sale_lines = conn.execute("SELECT COUNT(*) FROM StockMovement WHERE kind = 'sale'").fetchone()[0]
+        close_connections()
+
+        oversold = sum(1 for product_id, units in sold.items() if units > stock)
+        mismatched = sum(1 for product_id, quantity in levels.items()
+                         if quantity != stock - sold.get(product_id, 0) or quantity != ledger[product_id] or quantity < 0)
+        results = {
+            "orders": processes * orders,
+            "decrements_per_second": sale_lines / seconds,
+            "units_sold": sum(sold.values()),
+            "oversold_products": oversold,
+            "mismatched_products": mismatched,
+        }
+
+        print(f"Stock decrement stress test ({processes} processes x {orders} orders, {products} products x {stock} units):")
+        for name, value in results.items():
+            print(f"  {name}: {value:.1f}" if isinstance(value, float) else f"  {name}: {value}")
+        if oversold or mismatched:
+            raise AssertionError("Stock was oversold or the ledger disagrees with StockLevel.")
+        return results
+
+# Time the bulk product operations on a large catalogue sync against one call per product
+def bench_bulk_products(products=50000, sample=500):
+    with _scratch_dir() as workdir:
+        db_name = os.path.join(workdir, "bench_bulk.db")
+        create_tables(db_name)
+        rng = random.Random(0)
+        ids = [10000 + i for i in range(products)]
+        records = [(pid, f"Product {pid}", CATEGORIES[pid % len(CATEGORIES)], 1000, 2.0, rng.randint(0, 50)) for pid in ids]
+
+        results = {
+            "add_products_s": _time_ms(lambda: add_products(records, db_name)) / 1000,
+            "update_prices_s": _time_ms(lambda: update_prices([(pid, 2.5) for pid in ids], db_name)) / 1000,
+            "update_products_s": _time_ms(lambda: update_products([(pid, 5, 3.0, 2000) for pid in ids], db_name)) / 1000,
+            "per_call_update_prices_s": _time_ms(lambda: [update_prices([(pid, 2.75)], db_name) for pid in ids[:sample]])
+                                        / 1000 * products / sample,
+            "delete_products_s": _time_ms(lambda: delete_products(ids, db_name)) / 1000,
+        }
+        close_connections()
+
+        print(f"Bulk product benchmark ({products} products; per-call time extrapolated from {sample} calls):")
+        for name, value in results.items():
+            print(f"  {name}: {value:.2f}")
+        return results
+
+# Compare adding products under allocator IDs with the form's former random IDs
+def bench_id_allocation(products=200000, batch=1000):
+    rng = random.Random(0)
+    random_ids = rng.sample(range(10000, 10000 + products * 10), products)
+    results = {}
+    for name, ids in (("allocated", [None] * products), ("random", random_ids)):
+        with _scratch_dir() as workdir:
+            db_name = os.path.join(workdir, f"bench_ids_{name}.db")
+            create_tables(db_name)
+
+            def add_all():
+                for start in range(0, products, batch):
+                    add_products([(pid, "Product", "Books", 100, 2.0, 1) for pid in ids[start:start + batch]], db_name)
+
+            results[f"{name}_rows_per_second"] = products / (_time_ms(add_all) / 1000)
+            close_connections()
+
+    print(f"Product ID allocation benchmark ({products} products in batches of {batch}):")
+    for name, value in results.items():
+        print(f"  {name}: {value:.0f}")
+    return results
+
+# Compare analysts' SELECT * into pandas with reading a Parquet export through Arrow
+def bench_parquet(products=5000, days=200):
+    import parquet_store
+
+    with _scratch_dir() as workdir:
+        db_name = os.path.join(workdir, "bench_parquet.db")
+        create_tables(db_name)
+        _fill_fulldata(db_name, products, days)
+        out_dir = os.path.join(workdir, "parquet")
+
+        def select_all():
+            with read_connection(db_name) as conn:
+                pd.read_sql_query("SELECT * FROM FullData", conn)
+
+        results = {
+            "export_ms": _time_ms(lambda: parquet_store.export_table("FullData", out_dir, db_name)),
+            "sqlite_select_all_ms": _time_ms(select_all),
+            "parquet_read_all_ms": _time_ms(lambda: parquet_store.read_table("FullData", out_dir).to_pandas()),
+            "parquet_read_month_ms": _time_ms(lambda: parquet_store.read_table(
+                "FullData", out_dir, filter=parquet_store.ds.field("month") == "2024-03").to_pandas()),
+            "forecast_all_sqlite_ms": _time_ms(lambda: forecast_all(db_name)),
+            "forecast_all_parquet_ms": _time_ms(lambda: forecast_all(db_name, parquet_dir=out_dir)),
+        }
+        close_connections()
+
+        print(f"Parquet benchmark ({products * days} FullData rows):")
+        for name, value in results.items():
+            print(f"  {name}: {value:.1f}")
+        return results
+
+# One keep-alive client issuing a mix of API requests; appends each latency in seconds
+async def _api_client(port, requests, products, latencies, errors, seed):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        for _ in range(requests):
+            product_id = 10000 + rng.randrange(products)
+            roll = rng.random()
+            if roll < 0.4:
+                method, path, body = "GET", f"/products/{product_id}/stock", b""
+            elif roll < 0.6:
+                method, path, body = "GET", f"/products/{product_id}/forecast", b""
+            elif roll < 0.75:
+                method, path, body = "GET", f"/search?q=Product+{product_id - 10000}&limit=20", b""
+            elif roll < 0.85:
+                method, path, body = "GET", "/sales/monthly", b""
+            else:
+                method, path, body = "POST", f"/products/{product_id}/sell", json.dumps({"units_sold": 1}).encode()
+
+            start = time.perf_counter()
+            writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = int(head.split(b"Content-Length: ")[1].split(b"\r\n")[0])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            if not head.startswith(b"HTTP/1.1 2"):
+                errors.append(head.split(b"\r\n")[0])
+    finally:
+        writer.close()
+
+# Load-test the HTTP API in a separate server process with many concurrent clients,
+# reporting latency percentiles and throughput
+def bench_api(clients=200, requests=50, products=1000, days=90):
+    with _scratch_dir() as workdir:
+        db_name = os.path.join(workdir, "bench_api.db")
+        create_tables(db_name)
+        _fill_fulldata(db_name, products, days)
+        with write_connection(db_name) as conn:
+            conn.execute("""
+                INSERT INTO Sales (product_id, sale_date, units_sold, unit_price, total_revenue)
+                SELECT product_id, date, units_sold, unit_price, total_revenue FROM FullData
+            """)
+        close_connections()
+
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        server = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api.py"),
+                                   str(port), db_name], stdout=subprocess.DEVNULL)
+        try:
+            for _ in range(300):
+                try:
+                    socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                    break
+                except OSError:
+                    time.sleep(0.1)
+
+            latencies, errors = [], []
+
+            async def run():
+                await asyncio.gather(*(_api_client(port, requests, products, latencies, errors, seed)
+                                       for seed in range(clients)))
+
+            seconds = _time_ms(lambda: asyncio.run(run())) / 1000
+        finally:
+            server.terminate()
+            server.wait()
+
+        latencies.sort()
+        results = {
+            "requests": len(latencies),
+            "errors": len(errors),
+            "requests_per_second": len(latencies) / seconds,
+            "p50_ms": latencies[len(latencies) // 2] * 1000,
+            "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+        }
+        print(f"API load test ({clients} concurrent clients x {requests} requests):")
+        for name, value in results.items():
+            print(f"  {name}: {value:.1f}" if isinstance(value, float) else f"  {name}: {value}")
+        return results
+
+# Time a fresh interpreter importing each module, and init_db on an up-to-date database
+def bench_startup(modules=("database", "inventory_management", "background", "api", "main", "forecasting")):
+    here = os.path.dirname(os.path.abspath(__file__))
+    with _scratch_dir() as workdir:
+        db_name = os.path.join(workdir, "bench_startup.db")
+        create_tables(db_name)
+
+        def run(code):
+            subprocess.run([sys.executable, "-c", code], cwd=here, check=True)
+
+        results = {"interpreter_ms": _time_ms(lambda: run("pass"))}
+        for module in modules:
+            results[f"import_{module}_ms"] = _time_ms(lambda: run(f"import {module}"))
+        results["init_db_ms"] = _time_ms(lambda: run(f"import database; database.init_db({db_name!r})"))
+
+        print("Startup benchmark (fresh interpreter per measurement):")
+        for name, value in results.items():
+            print(f"  {name}: {value:.1f}")
+        return results
+
+# Time each schema migration on a large fixture built at the schema before them, then
+# the startup check on the migrated database
+def bench_migrations(products=10000, days=1000, first_timed=4):
+    with _scratch_dir() as workdir:
+        db_name = os.path.join(workdir, "bench_migrations.db")
+        migrate(db_name, target=first_timed - 1)
+        _fill_fulldata(db_name, products, days)
+        with write_connection(db_name) as conn:
+            conn.execute("""
+                INSERT INTO Inventory (product_id, inventory_date, quantity)
+                SELECT product_id, MIN(date), MAX(initial_quantity) FROM FullData GROUP BY product_id
+            """)
+
+        results = {}
+        for version, name, step in MIGRATIONS:
+            if version >= first_timed:
+                results[f"migration_{version}_ms"] = _time_ms(lambda: migrate(db_name, target=version))
+        results["startup_check_ms"] = _time_ms(lambda: migrate(db_name))
+        close_connections()
+
+        print(f"Migration benchmark ({products * days} FullData rows):")
+        for name, value in results.items():
+            print(f"  {name}: {value:.1f}")
+        return results
+
+# Compare a full reorder-point pass over the catalogue with the incremental refresh
+# after a burst of orders touches a few SKUs
+def bench_reorder(products=200000, days=60, changed=1000, start_date=datetime.date(2024, 1, 1)):
+    import reorder
+
+    with _scratch_dir() as workdir:
+        db_name = os.path.join(workdir, "bench_reorder.db")
+        create_tables(db_name)
+        rng = random.Random(0)
+        dates = [(start_date + datetime.timedelta(days=day)).isoformat() for day in range(days)]
+        with write_connection(db_name) as conn:
+            conn.executemany("INSERT INTO Products (product_id, product_name, product_category, initial_quantity) VALUES (?, ?, ?, ?)",
+                             ((10000 + i, f"Product {i}", CATEGORIES[i % len(CATEGORIES)], 500) for i in range(products)))
+            conn.executemany("INSERT INTO StockMovement (product_id, movement_date, kind, quantity) VALUES (?, ?, 'opening', ?)",
+                             ((10000 + i, dates[0], rng.randint(0, 200)) for i in range(products)))
+            conn.executemany("INSERT INTO Sales (product_id, sale_date, units_sold, unit_price, total_revenue) VALUES (?, ?, ?, 2.0, 0)",
+                             ((10000 + i, date, rng.randint(0, 6)) for i in range(products) for date in dates))
+
+        results = {"full_refresh_ms": _time_ms(lambda: reorder.refresh_reorder_status(db_name, full=True))}
+        for _ in range(changed):
+            with write_connection(db_name) as conn:
+                record_movement(conn, 10000 + rng.randrange(products), 'sale', -1, dates[-1])
+        results["incremental_refresh_ms"] = _time_ms(lambda: reorder.refresh_reorder_status(db_name))
+        results["idle_refresh_ms"] = _time_ms(lambda: reorder.refresh_reorder_status(db_name))
+        results["low_stock_list_ms"] = _time_ms(lambda: reorder.low_stock_products(db_name))
+        close_connections()
+
+        print(f"Reorder benchmark ({products} products x {days} days of sales, {changed} orders between refreshes):")
+        for name, value in results.items():
+            print(f"  {name}: {value:.1f}")
+        return results
+
+# Cost of statement tracing per primary-key read and per 100-row product scan, against a
+# plain connection to the same database
+def bench_profiling(iterations=20000, rows=100000):
+    import profiling
+
+    with _scratch_dir() as workdir:
+        db_name = os.path.join(workdir, "bench_profiling.db")
+        create_tables(db_name)
+        _fill_fulldata(db_name, rows // 100, 100)
+        results = {}
+        for name, factory in (("plain", sqlite3.Connection), ("traced", profiling.TracingConnection)):
+            conn = sqlite3.connect(db_name, factory=factory)
+            results[f"{name}_point_read_us"] = _time_per_call(lambda i: conn.execute(
+                "SELECT units_sold FROM FullData WHERE product_id = ? AND date = '2024-01-01'", (10000 + i % 1000,)).fetchone(),
+                iterations)
+            results[f"{name}_product_scan_us"] = _time_per_call(lambda i: conn.execute(
+                "SELECT * FROM FullData WHERE product_id = ?", (10000 + i % 1000,)).fetchall(), iterations // 10)
+            conn.close()
+        profiling.reset()
+        close_connections()
+
+        print(f"Profiling overhead benchmark ({iterations} point reads):")
+        for name, value in results.items():
+            print(f"  {name}: {value:.1f}")
+        return results
+
+# In-memory catalogue snapshot for a large catalogue: load time and size, point and
+# batch lookups against the same read through SQLite, catching up after a burst of
+# writes, and a filter and per-category aggregate against their SQL equivalents
+def bench_catalogue(products=1000000, changed=1000, lookups=100000, start_date=datetime.date(2024, 1, 1)):
+    from catalogue import Catalogue
+
+    with _scratch_dir() as workdir:
+        db_name = os.path.join(workdir, "bench_catalogue.db")
+        create_tables(db_name)
+        rng = random.Random(0)
+        with write_connection(db_name) as conn:
+            conn.executemany("INSERT INTO Products (product_id, product_name, product_category, initial_quantity) VALUES (?, ?, ?, ?)",
+                             ((10000 + i, f"Product {i}", CATEGORIES[i % len(CATEGORIES)], 500) for i in range(products)))
+            conn.executemany("INSERT INTO StockMovement (product_id, movement_date, kind, quantity) VALUES (?, ?, 'opening', ?)",
+                             ((10000 + i, start_date.isoformat(), rng.randint(0, 500)) for i in range(products)))
+            conn.executemany("""
+                INSERT INTO FullData (product_id, date, product_category, product_name, units_sold, unit_price, total_revenue, initial_quantity)
+                VALUES (?, ?, ?, ?, 0, ?, 0, 500)
+            """, ((10000 + i, start_date.isoformat(), CATEGORIES[i % len(CATEGORIES)], f"Product {i}",
+                   round(rng.uniform(5, 1000), 2)) for i in range(products)))
+
+        catalogue = Catalogue(db_name)
+        results = {"load_ms": _time_ms(catalogue.load), "memory_mb": catalogue.nbytes / 1e6}
+        ids = [10000 + rng.randrange(products) for _ in range(lookups)]
+        results["point_lookup_us"] = _time_per_call(lambda i: catalogue.contains(ids[i]), lookups)
+        results["point_get_us"] = _time_per_call(lambda i: catalogue.get(ids[i]), lookups)
+        batch = np.array(ids)
+        results["batch_lookup_us"] = _time_ms(lambda: catalogue.lookup(batch)) * 1000 / lookups
+        with read_connection(db_name) as conn:
+            results["sql_point_lookup_us"] = _time_per_call(lambda i: conn.execute(
+                "SELECT 1 FROM Products WHERE product_id = ?", (ids[i],)).fetchone(), lookups)
+
+            results["filter_ms"] = _median_ms(lambda: catalogue.select(category="Books", max_on_hand=10))
+            results["sql_filter_ms"] = _median_ms(lambda: conn.execute("""
+                SELECT Products.product_id FROM Products JOIN StockLevel ON StockLevel.product_id = Products.product_id
+                WHERE product_category = 'Books' AND quantity <= 10
+            """).fetchall())
+            results["totals_by_category_ms"] = _median_ms(catalogue.totals_by_category)
+            results["sql_totals_by_category_ms"] = _median_ms(lambda: conn.execute("""
+                SELECT product_category, COUNT(*), SUM(quantity),
+                       SUM(quantity * (SELECT unit_price FROM FullData WHERE FullData.product_id = Products.product_id
+                                       ORDER BY date DESC LIMIT 1))
+                FROM Products LEFT JOIN StockLevel ON StockLevel.product_id = Products.product_id
+                GROUP BY product_category
+            """).fetchall())
+
+        for _ in range(changed):
+            with write_connection(db_name) as conn:
+                record_movement(conn, 10000 + rng.randrange(products), 'sale', -1, start_date.isoformat())
+        results["refresh_ms"] = _time_ms(catalogue.refresh)
+        results["idle_refresh_ms"] = _time_ms(catalogue.refresh)
+        close_connections()
+
+        print(f"Catalogue benchmark ({products} products, {lookups} lookups, {changed} writes between refreshes):")
+        for name, value in results.items():
+            print(f"  {name}: {value:.2f}")
+        return results
+
+# Draw times of the sales chart for growing histories: the previous fresh pyplot
+# figure with a label per month, the reusable chart's full render, and a blitted
+# update of the latest month. Rendered off-screen with the Agg canvas.
+def bench_sales_chart(history_months=(12, 120, 600), repeat=5):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    from sales_chart import SalesChartView
+
+    results = {}
+    for months in history_months:
+        rows = [(f"{2000 + i // 12}-{i % 12 + 1:02d}", 1000.0 + (i * 37) % 500) for i in range(months)]
+
+        def legacy():
+            plt.figure(figsize=(10, 6))
+            labels = [f"{month[5:]}/{month[:4]}" for month, _ in rows]
+            plt.bar(labels, [revenue for _, revenue in rows], color='skyblue')
+            plt.xticks(rotation=45, ha="right")
+            for index, (_, revenue) in enumerate(rows):
+                plt.text(index, revenue, f"{revenue:.2f}", ha='center', va='bottom')
+            plt.tight_layout()
+            plt.gcf().canvas.draw()
+            plt.close()
+
+        # Value labels are deferred as in the Tk window and timed on their own
+        pending = []
+        figure = Figure(figsize=(10, 6))
+        view = SalesChartView(figure, FigureCanvasAgg(figure), schedule=pending.append)
+        updates = iter(range(1, 1000))
+        scopes = iter(range(1, 1000))
+
+        def rescope():
+            # Another scope over the same months: new heights, y range and title
+            scope = next(scopes)
+            view.set_data([(month, revenue * (1 + scope % 3)) for month, revenue in rows], f"Sales {scope}")
+
+        def rebin():
+            # Alternate bin sizes, so the bars and ticks are rebuilt
+            view.set_data(rows, "Sales", 3 if next(scopes) % 2 else 12)
+
+        def render_times(render):
+            # Median ms of the full render and of the labels it deferred
+            renders, labels = [], []
+            for _ in range(repeat):
+                renders.append(_time_ms(render))
+                labels.append(_time_ms(lambda: [pending.pop(0)() for _ in list(pending)]))
+            return float(np.median(renders)), float(np.median(labels))
+
+        render_ms, labels_ms = render_times(rescope)
+        incremental_ms = _median_ms(lambda: view.update_tail([(rows[-1][0], rows[-1][1] - next(updates))]), repeat)
+        result = {
+            "legacy_draw_ms": _median_ms(legacy, repeat),
+            "render_ms": render_ms,
+            "labels_ms": labels_ms,
+            "rebin_render_ms": render_times(rebin)[0],
+            "incremental_update_ms": incremental_ms,
+        }
+        print(f"Sales chart benchmark ({months} months of history):")
+        for name, value in result.items():
+            print(f"  {name}: {value:.1f}")
+        results[months] = result
+    return results
+
+# Dataset sizes, in rows, of the end-to-end suite
+SUITE_SIZES = (10000, 1000000, 10000000)
+
+# Products and days for a suite dataset of about the given number of rows: a year of
+# history once there are enough rows, and at least 30 days
+def _suite_shape(rows):
+    days = min(365, max(30, rows // 1000))
+    return max(1, rows // days), days
+
+# The rollup query and binning behind the sales chart window
+def _sales_chart_data(conn):
+    from sales_chart import monthly_sales, bin_series
+    return bin_series(dict(monthly_sales(conn)))
+
+# End-to-end suite over generated datasets of each size: CSV import, per-product
+# forecasts and sales, the FullData viewer's searches and sorts, and the sales chart.
+# Per-call times are averaged over `sample` random products; query times are the
+# median of five runs.
+def bench_suite(sizes=SUITE_SIZES, skew=1.1, seed=0, sample=50):
+    results = {}
+    for rows in sizes:
+        products, days = _suite_shape(rows)
+        with _scratch_dir() as workdir:
+            csv_file = os.path.join(workdir, "sales.csv")
+            db_name = os.path.join(workdir, "bench_suite.db")
+            rng = random.Random(seed)
+            sample_ids = [10000 + rng.randrange(products) for _ in range(sample)]
+
+            result = {"generate_s": _time_ms(lambda: generate_sales_csv(csv_file, products, days, skew=skew, seed=seed)) / 1000}
+            with contextlib.redirect_stdout(io.StringIO()):
+                create_tables(db_name)
+                result["load_csv_s"] = _time_ms(lambda: load_data_from_csv(csv_file, db_name)) / 1000
+                result["forecast_inventory_ms"] = _time_ms(lambda: [forecast_inventory(pid, db_name) for pid in sample_ids]) / sample
+                result["update_inventory_ms"] = _time_ms(lambda: [update_inventory(pid, 1, db_name) for pid in sample_ids]) / sample
+
+            with read_connection(db_name) as conn:
+                name = conn.execute("SELECT product_name FROM FullData WHERE product_id = ? LIMIT 1", (sample_ids[0],)).fetchone()[0]
+                middle_month = (datetime.date(2024, 1, 1) + datetime.timedelta(days=days // 2)).strftime("%Y-%m")
+                searches = {
+                    "viewer_first_page_ms": ("", (), None),
+                    "viewer_sorted_page_ms": ("", (), "total_revenue"),
+                    "search_name_ms": search_condition(conn, "product_name", name) + (None,),
+                    "search_category_sorted_ms": search_condition(conn, "product_category", "Books") + ("units_sold",),
+                    "search_units_range_ms": search_condition(conn, "units_sold", "10..12") + (None,),
+                    "search_month_sorted_ms": search_condition(conn, "date", middle_month) + ("unit_price",),
+                }
+                for metric, (where, params, sort) in searches.items():
+                    result[metric] = _median_ms(lambda: fetch_page(conn, "FullData", where, params, sort_column=sort, descending=True))
+                result["sales_chart_ms"] = _median_ms(lambda: _sales_chart_data(conn))
+            close_connections()
+
+            print(f"Suite ({products} products x {days} days = {products * days} rows):")
+            for metric, value in result.items():
+                print(f"  {metric}: {value:.2f}")
+            results[str(rows)] = result
+    return results
+
+BENCHMARKS = {
+    "connections": bench_connections,
+    "csv_ingest": bench_csv_ingest,
+    "date_queries": bench_date_queries,
+    "forecast_all": bench_forecast_all,
+    "forecast_parallel": bench_forecast_parallel,
+    "forecast_cache": bench_forecast_cache,
+    "viewer": bench_viewer,
+    "search": bench_search,
+    "stock_decrement": bench_stock_decrement,
+    "bulk_products": bench_bulk_products,
+    "id_allocation": bench_id_allocation,
+    "parquet": bench_parquet,
+    "api": bench_api,
+    "startup": bench_startup,
+    "migrations": bench_migrations,
+    "reorder": bench_reorder,
+    "profiling": bench_profiling,
+    "sales_chart": bench_sales_chart,
+    "catalogue": bench_catalogue,
+    "suite": bench_suite,
+}
+
+# Whether a smaller value of a metric is an improvement, judged by its name;
+# None for metrics that are not compared (counts, sizes)
+def _lower_is_better(metric):
+    if "per_second" in metric:
+        return False
+    if metric.endswith(("_ms", "_us", "_s", "_mb")):
+        return True
+    return None
+
+def _flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = float(value)
+    return flat
+
+# Compare results with a baseline from an earlier run; returns (metric, baseline,
+# current, relative change, status) for every metric present in both, where status
+# is 'regression' when the metric got worse by more than tolerance (0.2 = 20%)
+def compare_results(results, baseline, tolerance=0.2):
+    current, previous = _flatten(results), _flatten(baseline)
+    comparison = []
+    for metric in sorted(current.keys() & previous.keys()):
+        lower_better = _lower_is_better(metric.rsplit(".", 1)[-1])
+        if lower_better is None or previous[metric] == 0:
+            continue
+        change = (current[metric] - previous[metric]) / abs(previous[metric])
+        worse = change if lower_better else -change
+        status = "regression" if worse > tolerance else "improvement" if worse < -tolerance else "ok"
+        comparison.append((metric, previous[metric], current[metric], change, status))
+    return comparison
+
+def environment():
+    return {"python": platform.python_version(), "sqlite": sqlite3.sqlite_version, "platform": platform.platform(),
+            "cpus": os.cpu_count(), "started_at": datetime.datetime.now().isoformat(timespec="seconds")}
+
+if __name__ == "__main__":
+    # python benchmark.py [name ...] [--sizes 10000,1000000] [--json results.json]
+    #                     [--baseline baseline.json] [--tolerance 0.2]
+    # Runs the named benchmarks, or all of them. --json saves the results, which can
+    # serve as the baseline of a later run; comparing exits with status 1 on regressions.
+    parser = argparse.ArgumentParser(description="Inventory Management System benchmarks")
+    parser.add_argument("names", nargs="*", metavar="name", help=f"benchmarks to run: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--sizes", help="comma-separated suite dataset sizes in rows")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare with the results saved in this file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative slowdown reported as a regression")
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark {', '.join(unknown)}")
+
+    results = {}
+    for name in args.names or BENCHMARKS:
+        if name == "suite" and args.sizes:
+            results[name] = bench_suite(sizes=[int(size) for size in args.sizes.split(",")])
+        else:
+            results[name] = BENCHMARKS[name]()
+    report = {"environment": environment(), "results": results}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2, default=float)
+        print(f"Results written to {args.json}.")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        comparison = compare_results(results, baseline, args.tolerance)
+        print(f"Comparison with {args.baseline} (tolerance {args.tolerance:.0%}):")
+        for metric, previous, current, change, status in comparison:
+            print(f"  {metric}: {previous:.2f} -> {current:.2f} ({change:+.1%}) {status}")
+        if any(status == "regression" for *_, status in comparison):
+            sys.exit(1)
@@ -0,0 +1,308 @@
+import os
+import sys
+import threading
+import numpy as np
+import profiling
+from database import init_db, read_connection
+from inventory_management import ID_BATCH
+
+# Each product as the catalogue holds it: current stock from StockLevel and the unit
+# price of its latest FullData row, a seek on idx_fulldata_product_date per product
+CATALOGUE_QUERY = """
+    SELECT Products.product_id, product_category, Products.initial_quantity,
+           COALESCE(StockLevel.quantity, 0),
+           (SELECT unit_price FROM FullData WHERE FullData.product_id = Products.product_id
+            ORDER BY date DESC LIMIT 1)
+    FROM Products
+    LEFT JOIN StockLevel ON StockLevel.product_id = Products.product_id
+"""
+
+# Rows converted to arrays at a time while loading
+LOAD_BATCH = 100000
+
+# Empty slot marker in the id index; product IDs are never negative
+EMPTY = -1
+
+# 2**64 / golden ratio, for Fibonacci hashing
+HASH_MULTIPLIER = 11400714819323198485
+
+class IdIndex:
+    # Open-addressing hash table from product ID to row, held in two NumPy arrays with
+    # linear probing and at most half the slots in use. Inserts and batch lookups are
+    # vectorized; a single lookup probes with plain integer arithmetic.
+
+    def __init__(self, ids=(), rows=None):
+        ids = np.asarray(ids, dtype=np.int64)
+        self.size = 0
+        self._allocate(max(16, 1 << (2 * len(ids) - 1).bit_length()))
+        self.insert(ids, np.arange(len(ids), dtype=np.int32) if rows is None else rows)
+
+    def _allocate(self, capacity):
+        self.keys = np.full(capacity, EMPTY, dtype=np.int64)
+        self.rows = np.zeros(capacity, dtype=np.int32)
+        self.mask = capacity - 1
+        self.shift = 64 - (capacity.bit_length() - 1)
+
+    @property
+    def nbytes(self):
+        return self.keys.nbytes + self.rows.nbytes
+
+    def _slots(self, ids):
+        hashed = ids.astype(np.uint64) * np.uint64(HASH_MULTIPLIER)
+        return (hashed >> np.uint64(self.shift)).astype(np.int64)
+
+    def insert(self, ids, rows):
+        # Map each id to its row, replacing the row of ids already present
+        ids = np.asarray(ids, dtype=np.int64)
+        rows = np.asarray(rows, dtype=np.int32)
+        if 2 * (self.size + len(ids)) > len(self.keys):
+            keys, old_rows = self.keys[self.keys != EMPTY], self.rows[self.keys != EMPTY]
+            self._allocate(1 << (2 * (self.size + len(ids)) - 1).bit_length())
+            self.size = 0
+            self._insert(keys, old_rows)
+        self._insert(ids, rows)
+
+    def _insert(self, ids, rows):
+        pending = np.arange(len(ids))
+        slots = self._slots(ids)
+        while len(pending):
+            keys = self.keys[slots]
+            # An id already in the table keeps its slot and takes the new row
+            found = keys == ids[pending]
+            self.rows[slots[found]] = rows[pending[found]]
+            # Of the ids probing the same empty slot, the first claims it
+            empty = np.flatnonzero(keys == EMPTY)
+            claimed, first = np.unique(slots[empty], return_index=True)
+            winners = pending[empty[first]]
+            self.keys[claimed] = ids[winners]
+            self.rows[claimed] = rows[winners]
+            self.size += len(winners)
+            placed = found
+            placed[empty[first]] = True
+            pending, slots = pending[~placed], (slots[~placed] + 1) & self.mask
+
+    def get(self, product_id):
+        # Row of one product ID, or -1
+        slot = ((product_id * HASH_MULTIPLIER) & 0xFFFFFFFFFFFFFFFF) >> self.shift
+        keys = self.keys
+        while True:
+            key = keys.item(slot)
+            if key == product_id:
+                return self.rows.item(slot)
+            if key == EMPTY:
+                return -1
+            slot = (slot + 1) & self.mask
+
+    def lookup(self, ids):
+        # Rows of an array of product IDs, -1 for those not in the table
+        ids = np.asarray(ids, dtype=np.int64)
+        result = np.full(len(ids), -1, dtype=np.int32)
+        pending = np.arange(len(ids))
+        slots = self._slots(ids)
+        while len(pending):
+            keys = self.keys[slots]
+            found = keys == ids[pending]
+            result[pending[found]] = self.rows[slots[found]]
+            searching = ~found & (keys != EMPTY)
+            pending, slots = pending[searching], (slots[searching] + 1) & self.mask
+        return result
+
+class Catalogue:
+    # Column-oriented snapshot of the product catalogue in NumPy arrays: IDs, initial
+    # and on-hand quantities, latest unit prices and category codes, with an IdIndex
+    # from product ID to row. Answers lookups, filters and aggregates without SQLite.
+    # The CatalogueChange feed keeps it current: refresh() re-reads only the products
+    # changed since the snapshot's last change_id. Deleted products keep their row and
+    # index slot, marked not present, and take them back if re-added.
+
+    def __init__(self, db_name="inventory.db"):
+        self.db_name = db_name
+        self.change_id = 0
+        self.categories = []
+        self._category_codes = {}
+        self._lock = threading.RLock()
+        self._allocate(0)
+        self.index = IdIndex()
+
+    def _allocate(self, capacity):
+        self.count = 0
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.initial_quantity = np.zeros(capacity, dtype=np.int64)
+        self.on_hand = np.zeros(capacity, dtype=np.int64)
+        self.unit_price = np.full(capacity, np.nan)
+        self.category = np.full(capacity, -1, dtype=np.int32)
+        self.present = np.zeros(capacity, dtype=bool)
+
+    def _grow(self, count):
+        capacity = len(self.ids)
+        if count <= capacity:
+            return
+        capacity = max(count, 2 * capacity, 1024)
+        for name, fill in (('ids', 0), ('initial_quantity', 0), ('on_hand', 0), ('unit_price', np.nan),
+                           ('category', -1), ('present', False)):
+            old = getattr(self, name)
+            new = np.full(capacity, fill, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    @property
+    def nbytes(self):
+        arrays = (self.ids, self.initial_quantity, self.on_hand, self.unit_price, self.category, self.present)
+        return sum(array.nbytes for array in arrays) + self.index.nbytes
+
+    def __len__(self):
+        return int(np.count_nonzero(self.present[:self.count]))
+
+    def _category_code(self, category):
+        if category is None:
+            return -1
+        code = self._category_codes.get(category)
+        if code is None:
+            code = self._category_codes[category] = len(self.categories)
+            self.categories.append(category)
+        return code
+
+    def _columns(self, rows):
+        ids, categories, initial, on_hand, prices = zip(*rows)
+        return (np.array(ids, dtype=np.int64), np.array([self._category_code(c) for c in categories], dtype=np.int32),
+                np.array([q or 0 for q in initial], dtype=np.int64), np.array(on_hand, dtype=np.int64),
+                np.array([np.nan if p is None else p for p in prices], dtype=float))
+
+    def _store(self, positions, columns):
+        ids, categories, initial, on_hand, prices = columns
+        self.ids[positions] = ids
+        self.category[positions] = categories
+        self.initial_quantity[positions] = initial
+        self.on_hand[positions] = on_hand
+        self.unit_price[positions] = prices
+        self.present[positions] = True
+
+    def load(self):
+        # Read the whole catalogue, replacing the current snapshot
+        with read_connection(self.db_name) as conn:
+            conn.execute("BEGIN")
+            change_id = conn.execute("SELECT COALESCE(MAX(change_id), 0) FROM CatalogueChange").fetchone()[0]
+            total = conn.execute("SELECT COUNT(*) FROM Products").fetchone()[0]
+            with self._lock:
+                self.categories, self._category_codes = [], {}
+                self._allocate(total)
+                cursor = conn.execute(CATALOGUE_QUERY)
+                while True:
+                    rows = cursor.fetchmany(LOAD_BATCH)
+                    if not rows:
+                        break
+                    positions = np.arange(self.count, self.count + len(rows))
+                    self._grow(self.count + len(rows))
+                    self._store(positions, self._columns(rows))
+                    self.count += len(rows)
+                self.index = IdIndex(self.ids[:self.count])
+                self.change_id = change_id
+        return self
+
+    def refresh(self):
+        # Apply the changes recorded since the snapshot was taken; returns how many
+        # products were re-read
+        with read_connection(self.db_name) as conn:
+            conn.execute("BEGIN")
+            latest = conn.execute("SELECT COALESCE(MAX(change_id), 0) FROM CatalogueChange").fetchone()[0]
+            if latest <= self.change_id:
+                return 0
+            changed = [row[0] for row in conn.execute(
+                "SELECT product_id FROM CatalogueChange WHERE change_id > ? AND change_id <= ?",
+                (self.change_id, latest))]
+            rows = []
+            for start in range(0, len(changed), ID_BATCH):
+                batch = changed[start:start + ID_BATCH]
+                rows += conn.execute(f"{CATALOGUE_QUERY} WHERE Products.product_id IN ({','.join('?' * len(batch))})",
+                                     batch).fetchall()
+        with self._lock:
+            if rows:
+                columns = self._columns(rows)
+                positions = self.index.lookup(columns[0]).astype(np.int64)
+                new = np.flatnonzero(positions < 0)
+                positions[new] = np.arange(self.count, self.count + len(new))
+                self._grow(self.count + len(new))
+                self.count += len(new)
+                self.index.insert(columns[0][new], positions[new])
+                self._store(positions, columns)
+            # Changed products that are no longer in Products were deleted
+            gone = np.setdiff1d(np.array(changed, dtype=np.int64), np.array([row[0] for row in rows], dtype=np.int64))
+            removed = self.index.lookup(gone)
+            self.present[removed[removed >= 0]] = False
+            self.change_id = max(self.change_id, latest)
+        return len(changed)
+
+    def row(self, product_id):
+        # Row of a product in the arrays, or -1 if the snapshot does not have it
+        with self._lock:
+            row = self.index.get(product_id)
+            return row if row >= 0 and self.present[row] else -1
+
+    def contains(self, product_id):
+        # Whether the product exists; a miss refreshes first, so products added since
+        # the last refresh are found
+        return self.row(product_id) >= 0 or (self.refresh() > 0 and self.row(product_id) >= 0)
+
+    def get(self, product_id):
+        # One product as a dict, or None
+        with self._lock:
+            row = self.row(product_id)
+            if row < 0:
+                return None
+            code = self.category.item(row)
+            return {'product_id': product_id, 'product_category': self.categories[code] if code >= 0 else None,
+                    'initial_quantity': self.initial_quantity.item(row), 'on_hand': self.on_hand.item(row),
+                    'unit_price': None if np.isnan(self.unit_price[row]) else self.unit_price.item(row)}
+
+    def lookup(self, product_ids):
+        # Rows of many products at once, -1 for those missing
+        with self._lock:
+            rows = self.index.lookup(product_ids)
+            rows[rows >= 0] = np.where(self.present[rows[rows >= 0]], rows[rows >= 0], -1)
+            return rows
+
+    def _mask(self, category=None, min_on_hand=None, max_on_hand=None, min_price=None, max_price=None):
+        mask = self.present[:self.count].copy()
+        if category is not None:
+            mask &= self.category[:self.count] == self._category_codes.get(category, -2)
+        for column, bound, compare in ((self.on_hand, min_on_hand, np.greater_equal),
+                                       (self.on_hand, max_on_hand, np.less_equal),
+                                       (self.unit_price, min_price, np.greater_equal),
+                                       (self.unit_price, max_price, np.less_equal)):
+            if bound is not None:
+                mask &= compare(column[:self.count], bound)
+        return mask
+
+    def select(self, **conditions):
+        # IDs of the products matching all the given bounds, e.g. select(category='Toys', max_on_hand=5)
+        with self._lock:
+            return self.ids[:self.count][self._mask(**conditions)]
+
+    def totals_by_category(self, **conditions):
+        # {category: (products, units on hand, stock value)} over the matching products
+        with self._lock:
+            mask = self._mask(**conditions)
+            codes = self.category[:self.count][mask] + 1
+            on_hand = self.on_hand[:self.count][mask]
+            value = on_hand * np.nan_to_num(self.unit_price[:self.count][mask])
+            size = len(self.categories) + 1
+            counts = np.bincount(codes, minlength=size)
+            units = np.bincount(codes, weights=on_hand, minlength=size)
+            values = np.bincount(codes, weights=value, minlength=size)
+            return {([None] + self.categories)[code]: (int(counts[code]), int(units[code]), float(values[code]))
+                    for code in np.flatnonzero(counts)}
+
+_catalogues = {}
+_catalogues_lock = threading.Lock()
+
+def get_catalogue(db_name="inventory.db"):
+    # Return the shared snapshot of a database, loading it on first use
+    key = os.path.abspath(db_name)
+    with _catalogues_lock:
+        catalogue = _catalogues.get(key)
+        if catalogue is None:
+            init_db(db_name)
+            catalogue = _catalogues[key] = Catalogue(db_name).load()
+        return catalogue
+
+profiling.instrument(sys.modules[__name__])
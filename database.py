@@ -1,13 +1,227 @@
+import csv
+import datetime
+import hashlib
+import os
+import queue
+import random
 import sqlite3
-import pandas as pd
+import sys
+import threading
+import time
+from contextlib import contextmanager
+import profiling
+
+# Connection settings applied to every pooled connection
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",  # Readers no longer block the writer and vice versa
+    "PRAGMA synchronous=NORMAL",  # Safe with WAL, avoids an fsync on every commit
+    "PRAGMA cache_size=-65536",  # 64 MB page cache per connection
+    "PRAGMA mmap_size=268435456",  # Map up to 256 MB of the database file
+    "PRAGMA temp_store=MEMORY",
+)
+
+# Dates are stored as ISO-8601 text so they sort and range-compare correctly
+DATE_FORMAT = '%Y-%m-%d'
+# Format used by the CSV export and by databases created before the ISO migration
+LEGACY_DATE_FORMAT = '%m/%d/%Y'
 
 def connect_db(db_name="inventory.db"):
     # Establish a connection to the specified SQLite database
-    return sqlite3.connect(db_name)
+    return sqlite3.connect(db_name, factory=profiling.connection_factory())
+
+def configure_connection(conn):
+    # Apply the performance pragmas to an open connection
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+class ConnectionManager:
+    # Keeps long-lived connections to one database: a single writer shared behind
+    # a lock and a bounded pool of read-only connections handed out per caller
+
+    def __init__(self, db_name="inventory.db", max_readers=4):
+        self.db_name = db_name
+        self.pid = os.getpid()
+        self._readers = queue.LifoQueue(maxsize=max_readers)
+        self._writer = None
+        self._write_lock = threading.RLock()
+        self._write_depth = 0
+        self._closed = False
+
+    def _open(self, read_only=False):
+        conn = sqlite3.connect(self.db_name, check_same_thread=False, factory=profiling.connection_factory())
+        configure_connection(conn)
+        if read_only:
+            conn.execute("PRAGMA query_only=1")
+        return conn
+
+    @contextmanager
+    def writer(self, immediate=False):
+        # Serialize writers; nested use on the same thread joins the outer transaction.
+        # immediate takes SQLite's write lock up front (BEGIN IMMEDIATE) so a
+        # read-check-write sequence cannot interleave with another process.
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._open()
+            conn = self._writer
+            self._write_depth += 1
+            try:
+                if immediate and self._write_depth == 1 and not conn.in_transaction:
+                    conn.execute("BEGIN IMMEDIATE")
+                yield conn
+                if self._write_depth == 1:
+                    conn.commit()
+            except BaseException:
+                if self._write_depth == 1:
+                    conn.rollback()
+                raise
+            finally:
+                self._write_depth -= 1
+
+    @property
+    def nested_write(self):
+        # Whether the writer in use joined an outer transaction on this thread; only
+        # meaningful inside a writer() block
+        return self._write_depth > 1
+
+    @contextmanager
+    def reader(self):
+        # Borrow a pooled reader, opening a new one if the pool is empty
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            conn = self._open(read_only=True)
+        try:
+            yield conn
+        finally:
+            # End any open read transaction so the next borrower sees fresh data
+            if conn.in_transaction:
+                conn.rollback()
+            if self._closed:
+                conn.close()
+            else:
+                try:
+                    self._readers.put_nowait(conn)
+                except queue.Full:
+                    conn.close()
+
+    def close(self):
+        # Close every idle connection held by this manager
+        self._closed = True
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+def get_manager(db_name="inventory.db"):
+    # Return the connection manager for a database, creating it on first use.
+    # A forked child never reuses connections inherited from its parent.
+    key = os.path.abspath(db_name)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None or manager.pid != os.getpid():
+            manager = ConnectionManager(db_name)
+            _managers[key] = manager
+        return manager
+
+def write_connection(db_name="inventory.db"):
+    # Context manager yielding the shared writer; commits on success, rolls back on error
+    return get_manager(db_name).writer()
+
+# Attempts and first backoff delay (seconds) for writes that find the database locked
+WRITE_ATTEMPTS = 8
+WRITE_BACKOFF = 0.005
+
+def retry_write(func, db_name="inventory.db", attempts=WRITE_ATTEMPTS, backoff=WRITE_BACKOFF):
+    # Run func(conn) in an IMMEDIATE write transaction and return its result. If another
+    # process keeps the database locked past the busy timeout, the transaction is rolled
+    # back and retried with exponential backoff and jitter. Called inside an outer
+    # write_connection it joins that transaction and is not retried on its own.
+    manager = get_manager(db_name)
+    for attempt in range(attempts):
+        nested = False
+        try:
+            with manager.writer(immediate=True) as conn:
+                nested = manager.nested_write
+                return func(conn)
+        except sqlite3.OperationalError as e:
+            busy = 'locked' in str(e) or 'busy' in str(e)
+            if not busy or nested or attempt == attempts - 1:
+                raise
+            time.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+def read_connection(db_name="inventory.db"):
+    # Context manager yielding a pooled read-only connection
+    return get_manager(db_name).reader()
+
+def close_connections():
+    # Close all pooled connections, e.g. before the application exits
+    with _managers_lock:
+        for manager in _managers.values():
+            if manager.pid == os.getpid():
+                manager.close()
+        _managers.clear()
 
 def create_tables(db_name="inventory.db"):
     # Create necessary tables in the database if they do not already exist
-    conn = connect_db(db_name)
+    migrate(db_name)
+    print("Tables created successfully.")
+
+_initialized = set()
+_initialized_lock = threading.Lock()
+
+def init_db(db_name="inventory.db"):
+    # Bring a database's schema up to date, once per process. Entry points (the GUI,
+    # the API, setup scripts) call this explicitly; importing this module has no effects.
+    key = os.path.abspath(db_name)
+    with _initialized_lock:
+        if key not in _initialized:
+            migrate(db_name)
+            _initialized.add(key)
+
+# Tables that the original loader replaced with pandas.to_sql, which drops their keys
+LEGACY_TABLES = ('Products', 'Sales', 'Inventory', 'FullData')
+
+def _has_key(conn, table):
+    # Whether a table has a primary key or any UNIQUE constraint
+    return (any(row[5] for row in conn.execute(f"PRAGMA table_info({table})"))
+            or any(row[2] for row in conn.execute(f"PRAGMA index_list({table})")))
+
+def _rebuild_legacy_tables(conn):
+    # Databases built by the original setup script hold Products, Sales, Inventory and
+    # FullData as written by to_sql: no primary keys, no inventory_id or sale_id and no
+    # UNIQUE constraints, which the indexes and upserts rely on. Recreate each such
+    # table with the _create_tables schema and copy its rows across; rows that repeat
+    # a key keep the first copy.
+    legacy = [table for table in LEGACY_TABLES
+              if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+              and not _has_key(conn, table)]
+    if not legacy:
+        return
+    # Renaming must not rewrite other tables' foreign keys to the old copy
+    conn.execute("PRAGMA legacy_alter_table = ON")
+    for table in legacy:
+        conn.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+        for (trigger,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?",
+                                       (f"{table}_legacy",)).fetchall():
+            conn.execute(f"DROP TRIGGER {trigger}")
+    conn.execute("PRAGMA legacy_alter_table = OFF")
+    _create_tables(conn)
+    for table in legacy:
+        old_columns = set(table_columns(conn, f"{table}_legacy"))
+        columns = ', '.join(f'"{name}"' for name in table_columns(conn, table) if name in old_columns)
+        conn.execute(f"INSERT OR IGNORE INTO {table} ({columns}) SELECT {columns} FROM {table}_legacy ORDER BY rowid")
+        conn.execute(f"DROP TABLE {table}_legacy")
+
+def _create_tables(conn):
     cursor = conn.cursor()
     
     # Create Products table
@@ -74,51 +288,1052 @@ def create_tables(db_name="inventory.db"):
     # Add default user account
     cursor.execute("INSERT OR IGNORE INTO Users (username, password) VALUES (?, ?)", ('account', 'password'))
 
-    print("Tables created successfully.")
-    conn.commit()
-    conn.close()
+    # Create ImportState table holding the high-water mark of each imported CSV file
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS ImportState (
+        source_file TEXT PRIMARY KEY,
+        file_size INTEGER,
+        file_mtime REAL,
+        fingerprint TEXT,
+        rows_loaded INTEGER,
+        loaded_at TEXT
+    )
+    ''')
 
-def load_data_from_csv(csv_file, db_name="inventory.db"):
-    # Read data from CSV
-    df = pd.read_csv(csv_file)
-    
-    # Connect to the database
-    conn = connect_db(db_name)
+    # Create Sequences table holding the next value of each ID allocator
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS Sequences (
+        name TEXT PRIMARY KEY,
+        next_value INTEGER NOT NULL
+    )
+    ''')
+
+    # Create ProductVersion table: a per-product counter bumped by triggers on every write
+    # to that product's FullData or Inventory rows, and on its stock movements (see
+    # create_stock_version_trigger), used to invalidate cached forecasts
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS ProductVersion (
+        product_id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL
+    )
+    ''')
+    for table in ('FullData', 'Inventory'):
+        bump = '''
+            INSERT INTO ProductVersion (product_id, version) VALUES ({row}.product_id, 1)
+            ON CONFLICT(product_id) DO UPDATE SET version = version + 1;
+        '''
+        cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table.lower()}_version_insert AFTER INSERT ON {table}
+        BEGIN {bump.format(row='NEW')} END
+        ''')
+        cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table.lower()}_version_update AFTER UPDATE ON {table}
+        BEGIN {bump.format(row='OLD')} {bump.format(row='NEW')} END
+        ''')
+        cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table.lower()}_version_delete AFTER DELETE ON {table}
+        BEGIN {bump.format(row='OLD')} END
+        ''')
+
+def create_indexes(conn):
+    # Secondary indexes so date-range and per-product lookups avoid full table scans.
+    # Trailing columns make them covering for the queries that use them.
     cursor = conn.cursor()
 
-    # Add data to Products table
-    products_data = df[['Product ID', 'Product Name', 'Product Category', 'Initial_Quantity']].drop_duplicates()
-    products_data.columns = ['product_id', 'product_name', 'product_category', 'initial_quantity']
-    products_data.to_sql('Products', conn, if_exists='replace', index=False)
-    
-    # Add data to Sales table
-    sales_data = df[['Product ID', 'Date', 'Units Sold', 'Unit Price', 'Total Revenue']]
-    sales_data.columns = ['product_id', 'sale_date', 'units_sold', 'unit_price', 'total_revenue']
-    sales_data.to_sql('Sales', conn, if_exists='replace', index=False)
-
-    # Initialize Inventory table with initial quantities if needed
-    inventory_data = products_data[['product_id', 'initial_quantity']].copy()
-    inventory_data['inventory_date'] = pd.to_datetime('today').strftime('%m/%d/%Y')
-    inventory_data.rename(columns={'initial_quantity': 'quantity'}, inplace=True)
-    inventory_data = inventory_data[['product_id', 'inventory_date', 'quantity']]
-    inventory_data.to_sql('Inventory', conn, if_exists='replace', index=False)
-
-    # Add data to FullData table
-    full_data = df.rename(columns={
-        'Product ID': 'product_id',
-        'Date': 'date',
-        'Product Category': 'product_category',
-        'Product Name': 'product_name',
-        'Units Sold': 'units_sold',
-        'Unit Price': 'unit_price',
-        'Total Revenue': 'total_revenue',
-        'Initial_Quantity': 'initial_quantity'
-    })
-    full_data.to_sql('FullData', conn, if_exists='replace', index=False)
-
-    print("Data loaded into the database successfully.")
-    conn.commit()
-    conn.close()
-
-# Only create tables when this module is imported or run
-create_tables()
+    # Monthly revenue chart: range/group on sale_date reading only total_revenue
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_date_product ON Sales (sale_date, product_id, total_revenue)")
+
+    # Latest stock level per product: ORDER BY inventory_id DESC LIMIT 1
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_inventory_product_id ON Inventory (product_id, inventory_id, quantity)")
+
+    # Inventory for a month: range on inventory_date
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_inventory_date ON Inventory (inventory_date)")
+
+    # Per-product forecast: product_id equality, grouped by date
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_fulldata_product_date ON FullData (product_id, date, initial_quantity, units_sold)")
+
+    # FullData search by date: range on date
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_fulldata_date ON FullData (date)")
+
+# FullData columns covered by the full-text index
+FULLTEXT_COLUMNS = ('product_name', 'product_category')
+
+def create_search_index(conn):
+    # FTS5 index over the FullData text columns, kept in sync by triggers. It is an
+    # external-content table keyed on FullData's rowid; run rebuild_search_index after
+    # anything that renumbers rowids, such as VACUUM. Skipped if SQLite lacks FTS5.
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'FullDataSearch'").fetchone()
+    if not exists:
+        try:
+            conn.execute(f"""
+                CREATE VIRTUAL TABLE FullDataSearch USING fts5(
+                    {', '.join(FULLTEXT_COLUMNS)}, content='FullData', content_rowid='rowid'
+                )
+            """)
+        except sqlite3.OperationalError:
+            return
+        conn.execute("INSERT INTO FullDataSearch (FullDataSearch) VALUES ('rebuild')")
+
+    columns = ', '.join(FULLTEXT_COLUMNS)
+    new_values = ', '.join(f"NEW.{column}" for column in FULLTEXT_COLUMNS)
+    old_values = ', '.join(f"OLD.{column}" for column in FULLTEXT_COLUMNS)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_fulldata_search_insert AFTER INSERT ON FullData BEGIN
+            INSERT INTO FullDataSearch (rowid, {columns}) VALUES (NEW.rowid, {new_values});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_fulldata_search_delete AFTER DELETE ON FullData BEGIN
+            INSERT INTO FullDataSearch (FullDataSearch, rowid, {columns}) VALUES ('delete', OLD.rowid, {old_values});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_fulldata_search_update AFTER UPDATE OF {columns} ON FullData BEGIN
+            INSERT INTO FullDataSearch (FullDataSearch, rowid, {columns}) VALUES ('delete', OLD.rowid, {old_values});
+            INSERT INTO FullDataSearch (rowid, {columns}) VALUES (NEW.rowid, {new_values});
+        END
+    """)
+
+# Monthly sales rollups and the columns they are keyed on
+SALES_ROLLUPS = {
+    'SalesMonthly': ('month',),
+    'SalesMonthlyProduct': ('month', 'product_id'),
+}
+
+def create_sales_rollup(conn):
+    # Pre-aggregated monthly sales totals, overall and per product, kept current by
+    # triggers on Sales so every write path (forms, inventory functions, CSV import)
+    # updates them in the same transaction. Created after the ISO date migration
+    # because months are the first seven characters of sale_date.
+    for table, keys in SALES_ROLLUPS.items():
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (table,)).fetchone()
+        key_columns = ', '.join(f"{key} {'INTEGER' if key == 'product_id' else 'TEXT'}" for key in keys)
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                {key_columns},
+                units_sold INTEGER NOT NULL,
+                total_revenue REAL NOT NULL,
+                sales_count INTEGER NOT NULL,
+                PRIMARY KEY ({', '.join(keys)})
+            ) WITHOUT ROWID
+        """)
+        if not exists:
+            _fill_sales_rollup(conn, table, keys)
+
+        def key_values(row):
+            return [f"SUBSTR({row}.sale_date, 1, 7)" if key == 'month' else f"{row}.{key}" for key in keys]
+
+        def key_match(row):
+            return ' AND '.join(f"{key} = {value}" for key, value in zip(keys, key_values(row)))
+
+        add = f"""
+            INSERT INTO {table} ({', '.join(keys)}, units_sold, total_revenue, sales_count)
+            SELECT {', '.join(key_values('NEW'))}, COALESCE(NEW.units_sold, 0), COALESCE(NEW.total_revenue, 0), 1
+            WHERE {' AND '.join(f"{value} IS NOT NULL" for value in key_values('NEW'))}
+            ON CONFLICT({', '.join(keys)}) DO UPDATE SET
+                units_sold = units_sold + excluded.units_sold,
+                total_revenue = total_revenue + excluded.total_revenue,
+                sales_count = sales_count + 1;
+        """
+        remove = f"""
+            UPDATE {table} SET
+                units_sold = units_sold - COALESCE(OLD.units_sold, 0),
+                total_revenue = total_revenue - COALESCE(OLD.total_revenue, 0),
+                sales_count = sales_count - 1
+            WHERE {key_match('OLD')};
+            DELETE FROM {table} WHERE {key_match('OLD')} AND sales_count <= 0;
+        """
+        trigger = f"trg_{table.lower()}"
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {trigger}_insert AFTER INSERT ON Sales BEGIN {add} END")
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {trigger}_update
+            AFTER UPDATE OF product_id, sale_date, units_sold, total_revenue ON Sales
+            BEGIN {remove} {add} END
+        """)
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {trigger}_delete AFTER DELETE ON Sales BEGIN {remove} END")
+    create_chart_indexes(conn)
+
+def create_chart_indexes(conn):
+    # Sales chart drilldown: one product's months, and the products of a category,
+    # without scanning the month-keyed rollup
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_salesmonthlyproduct_product ON SalesMonthlyProduct (product_id, month, total_revenue)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_products_category ON Products (product_category, product_id)")
+
+def _fill_sales_rollup(conn, table, keys):
+    key_values = ["SUBSTR(sale_date, 1, 7)" if key == 'month' else key for key in keys]
+    conn.execute(f"""
+        INSERT INTO {table} ({', '.join(keys)}, units_sold, total_revenue, sales_count)
+        SELECT {', '.join(key_values)}, COALESCE(SUM(units_sold), 0), COALESCE(SUM(total_revenue), 0), COUNT(*)
+        FROM Sales
+        WHERE {' AND '.join(f"{value} IS NOT NULL" for value in key_values)}
+        GROUP BY {', '.join(key_values)}
+    """)
+
+def _drop_sales_rollup(conn):
+    # Drop the rollup tables and their triggers; returns whether they existed
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'SalesMonthly'").fetchone() is not None
+    for table in SALES_ROLLUPS:
+        for event in ('insert', 'update', 'delete'):
+            conn.execute(f"DROP TRIGGER IF EXISTS trg_{table.lower()}_{event}")
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+    return exists
+
+def rebuild_sales_rollup(db_name="inventory.db"):
+    # Recompute the monthly rollups from Sales, e.g. after a backfill that bypassed the
+    # triggers or to clear rounding drift in the revenue totals; returns the month count
+    with write_connection(db_name) as conn:
+        for table, keys in SALES_ROLLUPS.items():
+            conn.execute(f"DELETE FROM {table}")
+            _fill_sales_rollup(conn, table, keys)
+        months = conn.execute("SELECT COUNT(*) FROM SalesMonthly").fetchone()[0]
+    print(f"Sales rollup rebuilt: {months} months.")
+    return months
+
+def create_stock_ledger(conn):
+    # Append-only stock ledger. Every receipt, sale and adjustment is a StockMovement row
+    # with a signed quantity; a trigger folds it into the per-product running balance in
+    # StockLevel within the same transaction, so the current quantity is one primary-key
+    # read. StockSnapshot holds periodic balances for reconstructing history.
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'StockLevel'").fetchone()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS StockMovement (
+            movement_id INTEGER PRIMARY KEY,
+            product_id INTEGER NOT NULL,
+            movement_date TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            quantity INTEGER NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_stockmovement_product_date ON StockMovement (product_id, movement_date, quantity)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS StockLevel (
+            product_id INTEGER PRIMARY KEY,
+            quantity INTEGER NOT NULL,
+            last_movement_id INTEGER NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS StockSnapshot (
+            product_id INTEGER,
+            snapshot_date TEXT,
+            quantity INTEGER NOT NULL,
+            movement_id INTEGER NOT NULL,
+            PRIMARY KEY (product_id, snapshot_date)
+        ) WITHOUT ROWID
+    """)
+
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_stockmovement_level AFTER INSERT ON StockMovement BEGIN
+            INSERT INTO StockLevel (product_id, quantity, last_movement_id)
+            VALUES (NEW.product_id, NEW.quantity, NEW.movement_id)
+            ON CONFLICT(product_id) DO UPDATE SET
+                quantity = quantity + excluded.quantity,
+                last_movement_id = excluded.last_movement_id;
+        END
+    """)
+    for event in ('UPDATE', 'DELETE'):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_stockmovement_{event.lower()} BEFORE {event} ON StockMovement BEGIN
+                SELECT RAISE(ABORT, 'StockMovement is append-only; record an adjustment instead');
+            END
+        """)
+
+    # Sales recorded in FullData (forms, CSV import) become ledger movements. A product's
+    # first row also receives its initial quantity, matching the forecast's
+    # initial_quantity - SUM(units_sold).
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_fulldata_stock_insert AFTER INSERT ON FullData
+        WHEN NEW.product_id IS NOT NULL BEGIN
+            INSERT INTO StockMovement (product_id, movement_date, kind, quantity)
+            SELECT NEW.product_id, COALESCE(NEW.date, date('now')), 'receipt', COALESCE(NEW.initial_quantity, 0)
+            WHERE NOT EXISTS (SELECT 1 FROM StockLevel WHERE product_id = NEW.product_id);
+            INSERT INTO StockMovement (product_id, movement_date, kind, quantity)
+            SELECT NEW.product_id, COALESCE(NEW.date, date('now')), 'sale', -NEW.units_sold
+            WHERE COALESCE(NEW.units_sold, 0) != 0;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_fulldata_stock_update AFTER UPDATE OF units_sold ON FullData
+        WHEN NEW.product_id IS NOT NULL AND COALESCE(NEW.units_sold, 0) != COALESCE(OLD.units_sold, 0) BEGIN
+            INSERT INTO StockMovement (product_id, movement_date, kind, quantity)
+            VALUES (NEW.product_id, COALESCE(NEW.date, date('now')), 'adjustment',
+                    COALESCE(OLD.units_sold, 0) - COALESCE(NEW.units_sold, 0));
+        END
+    """)
+
+    if not exists:
+        # Opening balances for existing data: initial_quantity - SUM(units_sold) for products
+        # with sales history, otherwise their latest Inventory quantity
+        conn.execute("""
+            INSERT INTO StockMovement (product_id, movement_date, kind, quantity)
+            SELECT product_id, MAX(date), 'opening',
+                   COALESCE((SELECT initial_quantity FROM FullData AS first
+                             WHERE first.product_id = sales.product_id
+                             ORDER BY date LIMIT 1), 0) - COALESCE(SUM(units_sold), 0)
+            FROM FullData AS sales
+            WHERE product_id IS NOT NULL
+            GROUP BY product_id
+        """)
+        conn.execute("""
+            INSERT INTO StockMovement (product_id, movement_date, kind, quantity)
+            SELECT product_id, COALESCE(inventory_date, date('now')), 'opening', COALESCE(quantity, 0)
+            FROM Inventory AS latest
+            WHERE product_id IS NOT NULL
+              AND inventory_id = (SELECT MAX(inventory_id) FROM Inventory WHERE product_id = latest.product_id)
+              AND NOT EXISTS (SELECT 1 FROM StockLevel WHERE product_id = latest.product_id)
+        """)
+
+def create_reorder_status(conn):
+    # Reorder points per product, computed by reorder.refresh_reorder_status. Triggers on
+    # Products, Sales and StockLevel queue every product whose catalogue entry, sales or
+    # stock balance changed in ReorderQueue, so a refresh only recomputes those.
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'ReorderStatus'").fetchone()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ReorderStatus (
+            product_id INTEGER PRIMARY KEY,
+            on_hand INTEGER NOT NULL,
+            avg_daily_demand REAL NOT NULL,
+            demand_stddev REAL NOT NULL,
+            lead_time_days INTEGER NOT NULL,
+            service_z REAL NOT NULL,
+            safety_stock REAL NOT NULL,
+            reorder_point REAL NOT NULL,
+            days_of_cover REAL,
+            low_stock INTEGER NOT NULL,
+            window_end TEXT,
+            computed_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reorderstatus_low_stock ON ReorderStatus (days_of_cover) WHERE low_stock = 1")
+    conn.execute("CREATE TABLE IF NOT EXISTS ReorderQueue (product_id INTEGER PRIMARY KEY) WITHOUT ROWID")
+
+    # An upsert rather than INSERT OR IGNORE: inside a trigger fired by another upsert,
+    # such as the StockLevel balance, the outer statement's conflict policy would apply
+    enqueue = """
+        INSERT INTO ReorderQueue (product_id) SELECT {row}.product_id WHERE {row}.product_id IS NOT NULL
+        ON CONFLICT(product_id) DO NOTHING;
+    """
+    for table in ('Products', 'Sales', 'StockLevel'):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table.lower()}_reorder_insert AFTER INSERT ON {table}
+            BEGIN {enqueue.format(row='NEW')} END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table.lower()}_reorder_update AFTER UPDATE ON {table}
+            BEGIN {enqueue.format(row='OLD')} {enqueue.format(row='NEW')} END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table.lower()}_reorder_delete AFTER DELETE ON {table}
+            BEGIN {enqueue.format(row='OLD')} END
+        """)
+
+    if not exists:
+        # The first refresh computes every product in the catalogue
+        conn.execute("INSERT OR IGNORE INTO ReorderQueue (product_id) SELECT product_id FROM Products")
+
+def create_catalogue_feed(conn):
+    # Change feed for in-process catalogue snapshots (catalogue.py): one row per product
+    # holding the sequence number of its latest change to Products, StockLevel or its
+    # FullData price, so a snapshot catches up by reading the rows past its last number
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS CatalogueChange (
+            product_id INTEGER PRIMARY KEY,
+            change_id INTEGER NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cataloguechange_change ON CatalogueChange (change_id)")
+
+    record = """
+        INSERT INTO CatalogueChange (product_id, change_id)
+        SELECT {row}.product_id, COALESCE((SELECT MAX(change_id) FROM CatalogueChange), 0) + 1
+        WHERE {row}.product_id IS NOT NULL
+        ON CONFLICT(product_id) DO UPDATE SET change_id = excluded.change_id;
+    """
+    for table, update in (('Products', ''), ('StockLevel', ''), ('FullData', ' OF unit_price')):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table.lower()}_catalogue_insert AFTER INSERT ON {table}
+            BEGIN {record.format(row='NEW')} END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table.lower()}_catalogue_update AFTER UPDATE{update} ON {table}
+            BEGIN {record.format(row='OLD')} {record.format(row='NEW')} END
+        """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_products_catalogue_delete AFTER DELETE ON Products
+        BEGIN {record.format(row='OLD')} END
+    """)
+
+def create_stock_version_trigger(conn):
+    # Forecasts read the StockLevel balance, so a receipt or adjustment recorded straight
+    # into the ledger must invalidate the product's cached forecast too
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_stockmovement_version AFTER INSERT ON StockMovement BEGIN
+            INSERT INTO ProductVersion (product_id, version) VALUES (NEW.product_id, 1)
+            ON CONFLICT(product_id) DO UPDATE SET version = version + 1;
+        END
+    """)
+
+def _drop_search_triggers(conn):
+    # Stop indexing FullData writes, e.g. for a bulk import; returns whether the search
+    # index exists and so needs restoring with _restore_search_index afterwards
+    for event in ('insert', 'update', 'delete'):
+        conn.execute(f"DROP TRIGGER IF EXISTS trg_fulldata_search_{event}")
+    return has_search_index(conn)
+
+def _restore_search_index(conn):
+    # Recreate the sync triggers and re-index every FullData row in one pass
+    create_search_index(conn)
+    conn.execute("INSERT INTO FullDataSearch (FullDataSearch) VALUES ('rebuild')")
+
+def rebuild_search_index(db_name="inventory.db"):
+    # Re-index every FullData row from scratch, restoring the sync triggers if an
+    # interrupted import left them dropped
+    with write_connection(db_name) as conn:
+        _restore_search_index(conn)
+
+def iso_date(value):
+    # Convert a legacy %m/%d/%Y date or an ISO timestamp to an ISO-8601 date;
+    # anything else is returned unchanged
+    if not isinstance(value, str):
+        return value
+    if '/' not in value:
+        return value[:10] if len(value) > 10 and value[4:5] == '-' else value
+    # Split by hand rather than strptime; this runs once per row in bulk migrations
+    try:
+        month, day, year = (int(part) for part in value.split('/'))
+        return datetime.date(year, month, day).isoformat()
+    except ValueError:
+        return value
+
+# Date columns kept in ISO-8601 form
+DATE_COLUMNS = (("Sales", "sale_date"), ("Inventory", "inventory_date"), ("FullData", "date"))
+
+def standardize_date_format(db_name="inventory.db"):
+    # Normalize every stored date to ISO-8601 in a single transaction and
+    # return the number of rows changed per table
+    with write_connection(db_name) as conn:
+        counts = _standardize_dates(conn)
+    print(f"Date format standardized to {DATE_FORMAT}: " +
+          ", ".join(f"{table} {count} rows" for table, count in counts.items()) + ".")
+    return counts
+
+def _standardize_dates(conn):
+    # One set-based UPDATE per table; only rows not already in ISO form are touched.
+    # Rows that would collide with an existing row for the same day are left as they are.
+    # The sales rollups are dropped and re-aggregated once afterwards, which is far
+    # cheaper than moving every rewritten sale between months through the triggers.
+    conn.create_function("iso_date", 1, iso_date, deterministic=True)
+    had_rollup = _drop_sales_rollup(conn)
+    counts = {}
+    for table, column in DATE_COLUMNS:
+        counts[table] = conn.execute(f"""
+            UPDATE OR IGNORE {table} SET {column} = iso_date({column})
+            WHERE {column} LIKE '%/%' OR LENGTH({column}) > 10
+        """).rowcount
+    if had_rollup:
+        create_sales_rollup(conn)
+    return counts
+
+def _add_remaining_quantity(conn):
+    # remaining_quantity on FullData and Inventory. Databases opened by earlier versions
+    # of the GUI may already have the columns, so they are only added when missing.
+    for table in ('FullData', 'Inventory'):
+        if 'remaining_quantity' not in table_columns(conn, table):
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN remaining_quantity INTEGER")
+
+    # One pass over FullData, writing only rows whose value is missing or stale
+    conn.execute("""
+        UPDATE FullData
+        SET remaining_quantity = initial_quantity - units_sold
+        WHERE initial_quantity IS NOT NULL AND units_sold IS NOT NULL
+          AND remaining_quantity IS NOT initial_quantity - units_sold
+    """)
+
+    # Each Inventory row takes its product's latest remaining quantity: one seek on the
+    # (product_id, date) index per row instead of a scan of FullData
+    conn.execute("""
+        UPDATE Inventory
+        SET remaining_quantity = (SELECT remaining_quantity FROM FullData
+                                  WHERE FullData.product_id = Inventory.product_id
+                                  ORDER BY date DESC LIMIT 1)
+        WHERE remaining_quantity IS NULL
+    """)
+
+# Schema migrations in the order they are applied. Each runs once per database, in its
+# own IMMEDIATE transaction together with the schema_version row that records it, so
+# startup on an up-to-date database is a single query. Add new steps at the end.
+# Version 0 was added later but runs first: it also repairs databases that recorded
+# versions 1 and 2 and then failed to build the indexes on legacy tables.
+MIGRATIONS = [
+    (0, "legacy table rebuild", _rebuild_legacy_tables),
+    (1, "base tables", _create_tables),
+    (2, "ISO-8601 dates", _standardize_dates),
+    (3, "secondary indexes", create_indexes),
+    (4, "full-text search", create_search_index),
+    (5, "monthly sales rollups", create_sales_rollup),
+    (6, "stock ledger", create_stock_ledger),
+    (7, "remaining quantity columns", _add_remaining_quantity),
+    (8, "reorder status", create_reorder_status),
+    (9, "sales chart indexes", create_chart_indexes),
+    (10, "catalogue change feed", create_catalogue_feed),
+    (11, "stock movement forecast invalidation", create_stock_version_trigger),
+]
+
+# PRAGMA user_version value that marked the ISO date migration before schema_version
+ISO_DATES_USER_VERSION = 1
+
+def _applied_migrations(conn):
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'schema_version'").fetchone() is None:
+        return set()
+    return {row[0] for row in conn.execute("SELECT version FROM schema_version")}
+
+def migrate(db_name="inventory.db", target=None):
+    # Apply pending migrations, up to and including version target if given;
+    # returns the versions applied by this call
+    pending = [(version, name, step) for version, name, step in MIGRATIONS if target is None or version <= target]
+    with write_connection(db_name) as conn:
+        applied = _applied_migrations(conn)
+    if all(version in applied for version, name, step in pending):
+        return []
+
+    def create_version_table(conn):
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'schema_version'").fetchone() is None:
+            conn.execute("""
+                CREATE TABLE schema_version (
+                    version INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    applied_at TEXT NOT NULL
+                )
+            """)
+            # Databases that converted their dates before schema_version existed
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= ISO_DATES_USER_VERSION:
+                conn.execute("INSERT INTO schema_version VALUES (2, 'ISO-8601 dates', datetime('now'))")
+
+    retry_write(create_version_table, db_name)
+
+    newly_applied = []
+    for version, name, step in pending:
+        def apply(conn):
+            # Re-checked inside the transaction in case another process got here first
+            if conn.execute("SELECT 1 FROM schema_version WHERE version = ?", (version,)).fetchone():
+                return False
+            step(conn)
+            conn.execute("INSERT INTO schema_version VALUES (?, ?, datetime('now'))", (version, name))
+            return True
+
+        if version not in applied and retry_write(apply, db_name):
+            print(f"Applied migration {version}: {name}.")
+            newly_applied.append(version)
+    return newly_applied
+
+# Column names used in the sales CSV export and their database equivalents
+CSV_COLUMNS = {
+    'Product ID': 'product_id',
+    'Date': 'date',
+    'Product Category': 'product_category',
+    'Product Name': 'product_name',
+    'Units Sold': 'units_sold',
+    'Unit Price': 'unit_price',
+    'Total Revenue': 'total_revenue',
+    'Initial_Quantity': 'initial_quantity'
+}
+
+# The import statements read the chunk staged in temp.LoadRows by _load_chunk. WHERE
+# true keeps SQLite from parsing ON CONFLICT as a join constraint.
+
+# Each product takes the values of its last row in the chunk
+LAST_ROW_PER_PRODUCT = "rowid IN (SELECT MAX(rowid) FROM temp.LoadRows WHERE product_id IS NOT NULL GROUP BY product_id)"
+
+UPSERT_PRODUCTS = f"""
+    INSERT INTO Products (product_id, product_name, product_category, initial_quantity)
+    SELECT product_id, product_name, product_category, initial_quantity
+    FROM temp.LoadRows WHERE {LAST_ROW_PER_PRODUCT}
+    ON CONFLICT(product_id) DO UPDATE SET
+        product_name = excluded.product_name,
+        product_category = excluded.product_category,
+        initial_quantity = excluded.initial_quantity
+    WHERE product_name IS NOT excluded.product_name
+       OR product_category IS NOT excluded.product_category
+       OR initial_quantity IS NOT excluded.initial_quantity
+"""
+
+UPSERT_SALES = """
+    INSERT INTO Sales (product_id, sale_date, units_sold, unit_price, total_revenue)
+    SELECT product_id, date, units_sold, unit_price, total_revenue FROM temp.LoadRows WHERE true
+    ON CONFLICT(product_id, sale_date) DO UPDATE SET
+        units_sold = excluded.units_sold,
+        unit_price = excluded.unit_price,
+        total_revenue = excluded.total_revenue
+    WHERE units_sold IS NOT excluded.units_sold
+       OR unit_price IS NOT excluded.unit_price
+       OR total_revenue IS NOT excluded.total_revenue
+"""
+
+# Only products without any inventory record get an opening balance
+INSERT_OPENING_INVENTORY = f"""
+    INSERT INTO Inventory (product_id, inventory_date, quantity)
+    SELECT product_id, ?, initial_quantity FROM temp.LoadRows AS row
+    WHERE {LAST_ROW_PER_PRODUCT}
+      AND NOT EXISTS (SELECT 1 FROM Inventory WHERE product_id = row.product_id)
+"""
+
+UPSERT_FULLDATA = """
+    INSERT INTO FullData (product_id, date, product_category, product_name, units_sold, unit_price, total_revenue, initial_quantity{extra_columns})
+    SELECT product_id, date, product_category, product_name, units_sold, unit_price, total_revenue, initial_quantity{extra_values}
+    FROM temp.LoadRows WHERE true
+    ON CONFLICT(product_id, date) DO UPDATE SET
+        product_category = excluded.product_category,
+        product_name = excluded.product_name,
+        units_sold = excluded.units_sold,
+        unit_price = excluded.unit_price,
+        total_revenue = excluded.total_revenue,
+        initial_quantity = excluded.initial_quantity{extra_updates}
+    WHERE product_category IS NOT excluded.product_category
+       OR product_name IS NOT excluded.product_name
+       OR units_sold IS NOT excluded.units_sold
+       OR unit_price IS NOT excluded.unit_price
+       OR total_revenue IS NOT excluded.total_revenue
+       OR initial_quantity IS NOT excluded.initial_quantity
+"""
+
+def table_columns(conn, table):
+    # Return the column names of a table
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+# Rows fetched per page by the data viewer
+PAGE_SIZE = 200
+
+def fetch_page(conn, table, where="", params=(), sort_column=None, descending=False, after=None, limit=PAGE_SIZE):
+    # Keyset pagination: return up to `limit` rows, rowid first, ordered by (sort_column, rowid)
+    # and starting after `after`, the (sort value, rowid) key of the previous page's last row.
+    # SQLite sorts NULLs first ascending and last descending, so the predicates do too.
+    conditions = [where] if where else []
+    params = list(params)
+    direction, op = ("DESC", "<") if descending else ("ASC", ">")
+
+    if sort_column is None:
+        order = f"rowid {direction}"
+        if after is not None:
+            conditions.append(f"rowid {op} ?")
+            params.append(after[1])
+    else:
+        column = f'"{sort_column}"'
+        order = f"{column} {direction}, rowid {direction}"
+        if after is not None:
+            value, rowid = after
+            if value is None:
+                condition = f"{column} IS NULL AND rowid {op} ?"
+                if not descending:
+                    condition += f" OR {column} IS NOT NULL"
+                params.append(rowid)
+            else:
+                condition = f"{column} {op} ? OR ({column} = ? AND rowid {op} ?)"
+                if descending:
+                    condition += f" OR {column} IS NULL"
+                params += [value, value, rowid]
+            conditions.append(condition)
+
+    query = f"SELECT rowid, * FROM {table}"
+    if conditions:
+        query += " WHERE " + " AND ".join(f"({condition})" for condition in conditions)
+    query += f" ORDER BY {order} LIMIT ?"
+    return conn.execute(query, params + [limit]).fetchall()
+
+def has_search_index(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'FullDataSearch'").fetchone() is not None
+
+def fulltext_query(term, column=None):
+    # FTS5 query matching every word of the term as a prefix, optionally within one column
+    words = ['"' + word.replace('"', '""') + '"*' for word in term.split()]
+    query = ' '.join(words)
+    return f"{{{column}}} : ({query})" if column else query
+
+def _range_condition(column, term, convert):
+    # Parse "a..b", ">=a", "<a", "=a" or "a" into a sargable predicate on the column
+    term = term.strip()
+    if '..' in term:
+        low, high = term.split('..', 1)
+        return f'"{column}" BETWEEN ? AND ?', (convert(low.strip()), convert(high.strip()))
+    for op in ('>=', '<=', '>', '<', '='):
+        if term.startswith(op):
+            return f'"{column}" {op} ?', (convert(term[len(op):].strip()),)
+    return f'"{column}" = ?', (convert(term),)
+
+def search_condition(conn, column, term, table="FullData"):
+    # WHERE clause and parameters for searching one column of FullData:
+    # the full-text index for product names and categories, range predicates for
+    # numbers and dates, and LIKE only for anything else
+    column_types = {row[1]: row[2].upper() for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in column_types:
+        raise ValueError(f"Unknown column {column!r}.")
+
+    if column in FULLTEXT_COLUMNS and table == "FullData" and has_search_index(conn) and term.split():
+        return ("rowid IN (SELECT rowid FROM FullDataSearch WHERE FullDataSearch MATCH ?)",
+                (fulltext_query(term, column),))
+
+    if column_types[column] in ('INTEGER', 'REAL'):
+        convert = int if column_types[column] == 'INTEGER' else float
+        try:
+            return _range_condition(column, term, convert)
+        except ValueError:
+            raise ValueError(f"Search {column} with a number, a range such as 10..20, or a comparison such as >=5.")
+
+    if column in ('date', 'sale_date', 'inventory_date'):
+        # A full or partial ISO date such as 2024-03 matches everything starting with it
+        term = term.strip()
+        if '..' in term or term[:1] in '<>=':
+            return _range_condition(column, term, iso_date)
+        prefix = iso_date(term)
+        return f'"{column}" >= ? AND "{column}" < ?', (prefix, prefix + '~')
+
+    return f'"{column}" LIKE ?', (f"%{term}%",)
+
+def search_fulldata(term, db_name="inventory.db", column=None, limit=50):
+    # Ranked full-text search over product names and categories, best matches first
+    with read_connection(db_name) as conn:
+        if not has_search_index(conn):
+            where, params = search_condition(conn, column or 'product_name', term)
+            return conn.execute(f"SELECT * FROM FullData WHERE {where} LIMIT ?", params + (limit,)).fetchall()
+        return conn.execute("""
+            SELECT FullData.*
+            FROM FullDataSearch
+            JOIN FullData ON FullData.rowid = FullDataSearch.rowid
+            WHERE FullDataSearch MATCH ?
+            ORDER BY FullDataSearch.rank
+            LIMIT ?
+        """, (fulltext_query(term, column), limit)).fetchall()
+
+def peak_rss_mb():
+    # Peak resident set size of this process in MB, or None where unsupported
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _fulldata_upsert(conn):
+    # Fill remaining_quantity as well once the column has been added to FullData
+    if 'remaining_quantity' in table_columns(conn, 'FullData'):
+        return UPSERT_FULLDATA.format(
+            extra_columns=", remaining_quantity",
+            extra_values=", initial_quantity - units_sold",
+            extra_updates=",\n        remaining_quantity = excluded.remaining_quantity")
+    return UPSERT_FULLDATA.format(extra_columns="", extra_values="", extra_updates="")
+
+# Triggers that keep the derived tables current one row at a time: stock movements and
+# balances, monthly sales rollups, the reorder queue, the catalogue change feed and the
+# forecast versions. A CSV chunk suspends them and applies the same changes set-based.
+# Only insert and update triggers are listed; an import never deletes.
+BULK_LOAD_TRIGGERS = (
+    'trg_products_reorder_insert', 'trg_products_reorder_update',
+    'trg_products_catalogue_insert', 'trg_products_catalogue_update',
+    'trg_sales_reorder_insert', 'trg_sales_reorder_update',
+    'trg_salesmonthly_insert', 'trg_salesmonthly_update',
+    'trg_salesmonthlyproduct_insert', 'trg_salesmonthlyproduct_update',
+    'trg_inventory_version_insert', 'trg_inventory_version_update',
+    'trg_fulldata_version_insert', 'trg_fulldata_version_update',
+    'trg_fulldata_stock_insert', 'trg_fulldata_stock_update',
+    'trg_fulldata_catalogue_insert', 'trg_fulldata_catalogue_update',
+    'trg_stockmovement_level', 'trg_stockmovement_version',
+    'trg_stocklevel_reorder_insert', 'trg_stocklevel_reorder_update',
+    'trg_stocklevel_catalogue_insert', 'trg_stocklevel_catalogue_update',
+)
+
+@contextmanager
+def _triggers_suspended(conn, names):
+    # Drop the named triggers inside the current transaction and recreate them from their
+    # stored SQL before it commits, so other connections never see them missing; on an
+    # error the rollback restores them. The caller must have begun the transaction:
+    # sqlite3 runs DDL outside one otherwise.
+    placeholders = ', '.join('?' * len(names))
+    saved = conn.execute(
+        f"SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name IN ({placeholders})",
+        names).fetchall()
+    for name, sql in saved:
+        conn.execute(f"DROP TRIGGER {name}")
+    yield
+    for name, sql in saved:
+        conn.execute(sql)
+
+def _load_chunk(conn, chunk, inventory_date, fulldata_sql):
+    # Upsert one chunk of CSV rows into Products, Sales, Inventory and FullData. The rows
+    # are staged in a temporary table together with the values they replace, and the
+    # derived tables are brought up to date from it with one statement each, rather than
+    # by the per-row trigger cascade (see BULK_LOAD_TRIGGERS).
+    chunk = chunk.drop_duplicates(['product_id', 'date'], keep='last')
+    columns = ['product_id', 'date', 'product_category', 'product_name',
+               'units_sold', 'unit_price', 'total_revenue', 'initial_quantity']
+    cursor = conn.cursor()
+
+    with _triggers_suspended(conn, BULK_LOAD_TRIGGERS):
+        cursor.execute("""
+            CREATE TEMP TABLE LoadRows (
+                product_id INTEGER, date TEXT, product_category TEXT, product_name TEXT,
+                units_sold INTEGER, unit_price REAL, total_revenue REAL, initial_quantity INTEGER,
+                fulldata_existed INTEGER, fulldata_changed INTEGER, old_units_sold INTEGER,
+                sale_existed INTEGER, sale_changed INTEGER, old_sale_units INTEGER, old_sale_revenue REAL
+            )
+        """)
+        cursor.execute("CREATE TEMP TABLE LoadTouched (product_id INTEGER PRIMARY KEY)")
+        cursor.executemany(
+            f"INSERT INTO temp.LoadRows ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            chunk[columns].itertuples(index=False, name=None))
+        cursor.execute("""
+            UPDATE temp.LoadRows SET (fulldata_existed, fulldata_changed, old_units_sold) = (
+                SELECT 1,
+                       product_category IS NOT LoadRows.product_category
+                       OR product_name IS NOT LoadRows.product_name
+                       OR units_sold IS NOT LoadRows.units_sold
+                       OR unit_price IS NOT LoadRows.unit_price
+                       OR total_revenue IS NOT LoadRows.total_revenue
+                       OR initial_quantity IS NOT LoadRows.initial_quantity,
+                       units_sold
+                FROM main.FullData WHERE product_id = LoadRows.product_id AND date = LoadRows.date)
+        """)
+        cursor.execute("""
+            UPDATE temp.LoadRows SET (sale_existed, sale_changed, old_sale_units, old_sale_revenue) = (
+                SELECT 1,
+                       units_sold IS NOT LoadRows.units_sold
+                       OR unit_price IS NOT LoadRows.unit_price
+                       OR total_revenue IS NOT LoadRows.total_revenue,
+                       units_sold, total_revenue
+                FROM main.Sales WHERE product_id = LoadRows.product_id AND sale_date = LoadRows.date)
+        """)
+
+        # Products whose catalogue entry, opening inventory, sales or history change
+        cursor.execute(f"""
+            INSERT INTO temp.LoadTouched (product_id)
+            SELECT DISTINCT product_id FROM temp.LoadRows AS row
+            WHERE product_id IS NOT NULL AND (
+                fulldata_existed IS NULL OR fulldata_changed OR sale_existed IS NULL OR sale_changed
+                OR NOT EXISTS (SELECT 1 FROM main.Inventory WHERE product_id = row.product_id)
+                OR ({LAST_ROW_PER_PRODUCT} AND NOT EXISTS (
+                    SELECT 1 FROM main.Products
+                    WHERE product_id = row.product_id AND product_name IS row.product_name
+                      AND product_category IS row.product_category AND initial_quantity IS row.initial_quantity)))
+        """)
+
+        cursor.execute(UPSERT_PRODUCTS)
+        cursor.execute(UPSERT_SALES)
+        cursor.execute(INSERT_OPENING_INVENTORY, (inventory_date,))
+        cursor.execute(fulldata_sql)
+
+        _apply_chunk_changes(cursor)
+        cursor.execute("DROP TABLE temp.LoadRows")
+        cursor.execute("DROP TABLE temp.LoadTouched")
+
+def _apply_chunk_changes(cursor):
+    # The set-based equivalent of the BULK_LOAD_TRIGGERS for the chunk staged in LoadRows
+
+    # Monthly rollups: each new or changed sale adds the difference from its old values
+    for table, keys in SALES_ROLLUPS.items():
+        key_values = ["SUBSTR(date, 1, 7)" if key == 'month' else key for key in keys]
+        cursor.execute(f"""
+            INSERT INTO {table} ({', '.join(keys)}, units_sold, total_revenue, sales_count)
+            SELECT {', '.join(key_values)},
+                   SUM(COALESCE(units_sold, 0) - COALESCE(old_sale_units, 0)),
+                   SUM(COALESCE(total_revenue, 0) - COALESCE(old_sale_revenue, 0)),
+                   SUM(sale_existed IS NULL)
+            FROM temp.LoadRows
+            WHERE (sale_existed IS NULL OR sale_changed)
+              AND {' AND '.join(f"{value} IS NOT NULL" for value in key_values)}
+            GROUP BY {', '.join(key_values)}
+            ON CONFLICT({', '.join(keys)}) DO UPDATE SET
+                units_sold = units_sold + excluded.units_sold,
+                total_revenue = total_revenue + excluded.total_revenue,
+                sales_count = sales_count + excluded.sales_count
+        """)
+
+    # Stock ledger, as trg_fulldata_stock_insert and _update would record it: a receipt of
+    # the initial quantity for products without a balance, a sale for each new row and an
+    # adjustment for each changed units_sold, then one balance update per product
+    last_movement = cursor.execute("SELECT COALESCE(MAX(movement_id), 0) FROM StockMovement").fetchone()[0]
+    cursor.execute("""
+        INSERT INTO StockMovement (product_id, movement_date, kind, quantity)
+        SELECT product_id, COALESCE(date, date('now')), 'receipt', COALESCE(initial_quantity, 0)
+        FROM (SELECT product_id, date, initial_quantity, MIN(rowid) FROM temp.LoadRows
+              WHERE fulldata_existed IS NULL AND product_id IS NOT NULL
+              GROUP BY product_id) AS first_row
+        WHERE NOT EXISTS (SELECT 1 FROM StockLevel WHERE product_id = first_row.product_id)
+    """)
+    cursor.execute("""
+        INSERT INTO StockMovement (product_id, movement_date, kind, quantity)
+        SELECT product_id, COALESCE(date, date('now')), 'sale', -units_sold
+        FROM temp.LoadRows
+        WHERE fulldata_existed IS NULL AND product_id IS NOT NULL AND COALESCE(units_sold, 0) != 0
+        ORDER BY rowid
+    """)
+    cursor.execute("""
+        INSERT INTO StockMovement (product_id, movement_date, kind, quantity)
+        SELECT product_id, COALESCE(date, date('now')), 'adjustment', COALESCE(old_units_sold, 0) - COALESCE(units_sold, 0)
+        FROM temp.LoadRows
+        WHERE fulldata_existed AND product_id IS NOT NULL AND COALESCE(units_sold, 0) != COALESCE(old_units_sold, 0)
+        ORDER BY rowid
+    """)
+    cursor.execute("""
+        INSERT INTO StockLevel (product_id, quantity, last_movement_id)
+        SELECT product_id, SUM(quantity), MAX(movement_id) FROM StockMovement
+        WHERE movement_id > ?
+        GROUP BY product_id
+        ON CONFLICT(product_id) DO UPDATE SET
+            quantity = quantity + excluded.quantity,
+            last_movement_id = excluded.last_movement_id
+    """, (last_movement,))
+
+    # Every touched product is queued for a reorder refresh, announced on the catalogue
+    # feed and has its cached forecasts invalidated
+    cursor.execute("""
+        INSERT INTO ReorderQueue (product_id) SELECT product_id FROM temp.LoadTouched WHERE true
+        ON CONFLICT(product_id) DO NOTHING
+    """)
+    last_change = cursor.execute("SELECT COALESCE(MAX(change_id), 0) FROM CatalogueChange").fetchone()[0]
+    cursor.execute("""
+        INSERT INTO CatalogueChange (product_id, change_id)
+        SELECT product_id, ? + ROW_NUMBER() OVER (ORDER BY product_id) FROM temp.LoadTouched WHERE true
+        ON CONFLICT(product_id) DO UPDATE SET change_id = excluded.change_id
+    """, (last_change,))
+    cursor.execute("""
+        INSERT INTO ProductVersion (product_id, version) SELECT product_id, 1 FROM temp.LoadTouched WHERE true
+        ON CONFLICT(product_id) DO UPDATE SET version = version + 1
+    """)
+
+# Bytes read per block when hashing a source file
+HASH_BLOCK = 1024 * 1024
+
+def _prefix_fingerprints(path, sizes):
+    # SHA-1 of the file's first n bytes for each n in sizes (ascending), in one read
+    digest = hashlib.sha1()
+    fingerprints = []
+    position = 0
+    with open(path, 'rb') as f:
+        for size in sizes:
+            while position < size:
+                block = f.read(min(HASH_BLOCK, size - position))
+                if not block:
+                    break
+                digest.update(block)
+                position += len(block)
+            fingerprints.append(digest.hexdigest())
+    return fingerprints
+
+def _file_fingerprint(path, size):
+    # Hash the first size bytes of the file
+    return _prefix_fingerprints(path, (size,))[0]
+
+def _ends_with_newline(path, size):
+    with open(path, 'rb') as f:
+        f.seek(size - 1)
+        return f.read(1) == b'\n'
+
+def _import_plan(conn, csv_file, file_size, file_mtime):
+    # Decide where an incremental import resumes: None when the file is unchanged,
+    # the previous file size when rows were only appended, or 0 for a full import.
+    # Also returns the fingerprint of the whole file when it was computed on the way.
+    # An append is only trusted if the entire previously imported part of the file still
+    # hashes to the stored fingerprint, so an edit to any imported row means a full
+    # import (its upserts update the changed rows). That costs one read of the file,
+    # cheap next to parsing it. An unchanged file is recognised by size and mtime alone.
+    state = conn.execute(
+        "SELECT file_size, file_mtime, fingerprint FROM ImportState WHERE source_file = ?",
+        (csv_file,)).fetchone()
+    if state is None:
+        return 0, None
+    last_size, last_mtime, fingerprint = state
+    if file_size == last_size and file_mtime == last_mtime:
+        return None, fingerprint
+    if file_size <= last_size:
+        return 0, None
+    prefix, whole = _prefix_fingerprints(csv_file, (last_size, file_size))
+    if prefix != fingerprint or not _ends_with_newline(csv_file, last_size):
+        return 0, whole
+    return last_size, whole
+
+def _read_csv_chunks(csv_file, chunksize, offset=0):
+    # Yield chunks of the CSV, starting at a byte offset past the header if given
+    import pandas as pd  # Imported on first use so importing this module stays fast
+    if offset == 0:
+        yield from pd.read_csv(csv_file, chunksize=chunksize)
+        return
+    with open(csv_file, newline='') as f:
+        header = next(csv.reader(f))
+    with open(csv_file, 'rb') as f:
+        f.seek(offset)
+        yield from pd.read_csv(f, header=None, names=header, chunksize=chunksize)
+
+def load_data_from_csv(csv_file, db_name="inventory.db", chunksize=50000, incremental=False):
+    # Stream the CSV in bounded chunks and upsert each chunk into the existing schema
+    # in its own transaction, so memory use stays flat regardless of file size.
+    # In incremental mode a file that has not changed since the last import is skipped,
+    # and a file that has only grown is read from where the last import stopped.
+    # For a full import the full-text index is not updated row by row: its triggers are
+    # dropped and the index is rebuilt once at the end, as _standardize_dates does for
+    # the rollups. An append keeps the triggers, so it only indexes the new rows and
+    # costs nothing in proportion to the history already loaded.
+    import pandas as pd
+
+    # The upserts need the keys that the migrations add to legacy databases
+    init_db(db_name)
+    start = time.perf_counter()
+    inventory_date = datetime.date.today().strftime(DATE_FORMAT)
+    source_file = os.path.abspath(csv_file)
+    file_stat = os.stat(source_file)
+    rows = 0
+
+    with read_connection(db_name) as conn:
+        fulldata_sql = _fulldata_upsert(conn)
+        offset, fingerprint = (_import_plan(conn, source_file, file_stat.st_size, file_stat.st_mtime)
+                               if incremental else (0, None))
+
+    if offset is None:
+        print(f"{csv_file} is unchanged since the last import; nothing to load.")
+        return {'rows': 0, 'seconds': time.perf_counter() - start, 'rows_per_second': 0.0,
+                'peak_rss_mb': peak_rss_mb(), 'skipped': True}
+
+    indexed = False
+    if offset == 0:
+        with write_connection(db_name) as conn:
+            indexed = _drop_search_triggers(conn)
+    try:
+        for chunk in _read_csv_chunks(source_file, chunksize, offset):
+            chunk = chunk.rename(columns=CSV_COLUMNS)
+            chunk['date'] = pd.to_datetime(chunk['date'], format=LEGACY_DATE_FORMAT).dt.strftime(DATE_FORMAT)
+            retry_write(lambda conn: _load_chunk(conn, chunk, inventory_date, fulldata_sql), db_name)
+            rows += len(chunk)
+    finally:
+        if indexed:
+            with write_connection(db_name) as conn:
+                _restore_search_index(conn)
+
+    # Record the high-water mark only after every chunk is in; an interrupted run
+    # simply repeats from the previous mark, which the upserts make harmless
+    with write_connection(db_name) as conn:
+        conn.execute("""
+            INSERT INTO ImportState (source_file, file_size, file_mtime, fingerprint, rows_loaded, loaded_at)
+            VALUES (?, ?, ?, ?, ?, datetime('now'))
+            ON CONFLICT(source_file) DO UPDATE SET
+                file_size = excluded.file_size,
+                file_mtime = excluded.file_mtime,
+                fingerprint = excluded.fingerprint,
+                rows_loaded = CASE WHEN ? > 0 THEN rows_loaded + excluded.rows_loaded ELSE excluded.rows_loaded END,
+                loaded_at = excluded.loaded_at
+        """, (source_file, file_stat.st_size, file_stat.st_mtime,
+              fingerprint or _file_fingerprint(source_file, file_stat.st_size), rows, offset))
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        'rows': rows,
+        'seconds': elapsed,
+        'rows_per_second': rows / elapsed if elapsed > 0 else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+        'skipped': False,
+    }
+    print(f"Data loaded into the database successfully: {rows} rows in {elapsed:.2f}s "
+          f"({stats['rows_per_second']:.0f} rows/s, peak RSS {stats['peak_rss_mb'] or 0:.1f} MB).")
+    return stats
+
+# Time the public functions when profiling is on; the connection helpers are skipped
+# because they only hand out context managers, and iso_date runs once per row
+profiling.instrument(sys.modules[__name__], skip=(
+    'configure_connection', 'get_manager', 'write_connection', 'read_connection', 'iso_date', 'table_columns'))
@@ -1,43 +1,291 @@
+import datetime
+import os
 import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
-from database import connect_db
+import profiling
+from database import read_connection
+
+# Number of days forecast when no horizon is given
+DEFAULT_HORIZON = 10
+
+# Sales summary per product, aggregated in SQL so only one row per product is fetched.
+# last_units_sold is a bare column, which SQLite takes from the row holding MAX(date).
+# stock_level is the product's running balance from the stock ledger.
+SALES_SUMMARY_QUERY = """
+    SELECT product_id,
+           (SELECT initial_quantity FROM FullData AS first
+            WHERE first.product_id = daily.product_id
+            ORDER BY date LIMIT 1) AS initial_quantity,
+           (SELECT quantity FROM StockLevel
+            WHERE StockLevel.product_id = daily.product_id) AS stock_level,
+           SUM(units_sold) AS total_units_sold,
+           units_sold AS last_units_sold,
+           COUNT(*) AS days,
+           MAX(date) AS last_date
+    FROM (
+        SELECT product_id, date, SUM(units_sold) AS units_sold
+        FROM FullData
+        {where}
+        GROUP BY product_id, date
+    ) AS daily
+    GROUP BY product_id
+"""
+
+# Build per-product forecasts from the sales summary in one vectorized pass
+def _forecast_from_summary(summary, horizon):
+    summary['last_date'] = pd.to_datetime(summary['last_date'])
+
+    # Current inventory quantity from the stock ledger, falling back to the sales history
+    current_inventory = summary['stock_level'].fillna(
+        summary['initial_quantity'] - summary['total_units_sold']).to_numpy(dtype=float)
+
+    # Average daily consumption rate based on sales volume: the mean of the day-over-day
+    # differences (first day taken as-is), which telescopes to the last day over the day count.
+    # If there is no consumption rate, keep the value fixed.
+    avg_daily_usage = (summary['last_units_sold'] / summary['days']).clip(lower=0).to_numpy(dtype=float)
+
+    # Inventory forecast for the next `horizon` days of every product
+    steps = np.arange(horizon)
+    forecasted = np.maximum(0, current_inventory[:, None] - steps[None, :] * avg_daily_usage[:, None])
+    offsets = pd.to_timedelta(np.tile(steps + 1, len(summary)), unit='D')
+
+    return pd.DataFrame({
+        'product_id': np.repeat(summary['product_id'].to_numpy(), horizon),
+        'date': np.repeat(summary['last_date'].to_numpy(), horizon) + offsets,
+        'forecasted_quantity': forecasted.ravel(),
+    })
 
 # Inventory forecast function based on Initial_Quantity and Units Sold from FullData table
-def forecast_inventory(product_id, db_name="inventory.db"):
-    conn = connect_db(db_name)
-    query = "SELECT date, initial_quantity, SUM(units_sold) AS total_units_sold FROM FullData WHERE product_id = ? GROUP BY date"
-    df = pd.read_sql_query(query, conn, params=(product_id,))
-    conn.close()
-    
+def forecast_inventory(product_id, db_name="inventory.db", horizon=DEFAULT_HORIZON):
+    query = SALES_SUMMARY_QUERY.format(where="WHERE product_id = ?")
+    with read_connection(db_name) as conn:
+        df = pd.read_sql_query(query, conn, params=(product_id,))
+
     # Check inventory data
     if df.empty:
         print(f"No data available for product ID {product_id}.")
         return []
-    
-    # Calculate current inventory quantity
-    initial_quantity = df['initial_quantity'].iloc[0]  # Initial Available Quantity
-    total_units_sold = df['total_units_sold'].sum()    # Total quantity sold
-    current_inventory = initial_quantity - total_units_sold
-
-    # Calculate average daily consumption rate based on sales volume
-    df['date'] = pd.to_datetime(df['date'])
-    df = df.sort_values(by="date")
-    df['daily_units_sold'] = df['total_units_sold'].diff().fillna(df['total_units_sold'].iloc[0])
-    avg_daily_usage = df['daily_units_sold'].mean()
-
-    # If there is no consumption rate, keep the value fixed
-    if avg_daily_usage <= 0:
-        avg_daily_usage = 0
-
-    # Inventory forecast for the next 10 days
-    future_dates = pd.date_range(df['date'].iloc[-1] + pd.Timedelta(days=1), periods=10, freq='D')
-    forecasted_quantities = [max(0, current_inventory - i * avg_daily_usage) for i in range(10)]
-    
-    # Create DataFrame containing forecast
-    forecast_df = pd.DataFrame({
-        'date': future_dates,
-        'forecasted_quantity': forecasted_quantities
-    })
 
     # Return forecast data
-    return forecast_df
+    return _forecast_from_summary(df, horizon)[['date', 'forecasted_quantity']]
+
+# SALES_SUMMARY_QUERY computed from a Parquet export instead of the database
+def _parquet_summary(parquet_dir):
+    import parquet_store  # pyarrow is only needed when forecasting from Parquet
+
+    fulldata = parquet_store.read_table(
+        'FullData', parquet_dir, columns=['product_id', 'date', 'initial_quantity', 'units_sold']).to_pandas()
+    daily = (fulldata.dropna(subset=['product_id'])
+             .groupby(['product_id', 'date'], as_index=False, sort=True)
+             .agg(units_sold=('units_sold', 'sum'), initial_quantity=('initial_quantity', 'first')))
+    products = daily.groupby('product_id', sort=True)
+    summary = pd.DataFrame({
+        'initial_quantity': products['initial_quantity'].nth(0).to_numpy(),
+        'total_units_sold': products['units_sold'].sum(),
+        'last_units_sold': products['units_sold'].nth(-1).to_numpy(),
+        'days': products.size(),
+        'last_date': products['date'].max(),
+    }).reset_index()
+
+    if os.path.isdir(os.path.join(parquet_dir, 'StockLevel')):
+        levels = parquet_store.read_table('StockLevel', parquet_dir, columns=['product_id', 'quantity']).to_pandas()
+        summary['stock_level'] = summary['product_id'].map(levels.set_index('product_id')['quantity'])
+    else:
+        summary['stock_level'] = np.nan
+    return summary
+
+# Forecast every product in FullData with a single query; returns one row per
+# (product_id, date) for the next `horizon` days. With parquet_dir the sales are read
+# from a parquet_store export instead, leaving the database untouched.
+def forecast_all(db_name="inventory.db", horizon=DEFAULT_HORIZON, parquet_dir=None):
+    if parquet_dir is not None:
+        summary = _parquet_summary(parquet_dir)
+    else:
+        with read_connection(db_name) as conn:
+            summary = pd.read_sql_query(SALES_SUMMARY_QUERY.format(where=""), conn)
+
+    if summary.empty:
+        return pd.DataFrame(columns=['product_id', 'date', 'forecasted_quantity'])
+    return _forecast_from_summary(summary, horizon)
+
+# Per-SKU demand models used by forecast_parallel. Each takes the observed daily units
+# sold and the same series with missing days filled with zero, and returns the expected
+# demand for each of the next `horizon` days.
+
+# Same consumption rate as forecast_inventory
+def moving_average_model(observed, daily, horizon):
+    return np.full(horizon, max(observed[-1] / len(observed), 0.0))
+
+# Simple exponential smoothing of daily demand
+def exponential_smoothing_model(observed, daily, horizon, alpha=0.3):
+    level = daily[0]
+    for units in daily[1:]:
+        level = alpha * units + (1 - alpha) * level
+    return np.full(horizon, max(level, 0.0))
+
+# Repeat the last full week of demand
+def seasonal_naive_model(observed, daily, horizon, season=7):
+    if len(daily) < season:
+        return np.full(horizon, max(daily.mean(), 0.0))
+    return np.resize(np.clip(daily[-season:], 0, None), horizon)
+
+MODELS = {
+    'moving_average': moving_average_model,
+    'exponential_smoothing': exponential_smoothing_model,
+    'seasonal_naive': seasonal_naive_model,
+}
+
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+# Rows without an ISO-8601 date are skipped: NULL dates, and legacy dates that the
+# date migration left in place because the converted row would have collided
+SHARD_QUERY = """
+    SELECT FullData.product_id, date, initial_quantity, SUM(units_sold) AS units_sold, StockLevel.quantity
+    FROM FullData
+    LEFT JOIN StockLevel ON StockLevel.product_id = FullData.product_id
+    WHERE FullData.product_id BETWEEN ? AND ?
+      AND date GLOB '[0-9][0-9][0-9][0-9]-[0-1][0-9]-[0-3][0-9]*'
+    GROUP BY FullData.product_id, date
+    ORDER BY FullData.product_id, date
+"""
+
+# Forecast one contiguous range of product IDs; runs inside a pool worker
+def _forecast_shard(db_name, first_id, last_id, horizon, model):
+    uri = f"file:{os.path.abspath(db_name)}?mode=ro"
+    conn = sqlite3.connect(uri, uri=True)
+    try:
+        rows = conn.execute(SHARD_QUERY, (first_id, last_id)).fetchall()
+    finally:
+        conn.close()
+    return _forecast_rows(rows, horizon, model)
+
+# Apply a model to SHARD_QUERY rows, which are grouped by product and ordered by date
+def _forecast_rows(rows, horizon, model):
+    model_func = MODELS[model]
+    product_ids, start_dates, quantities = [], [], []
+    steps = np.arange(horizon)
+    start = 0
+    while start < len(rows):
+        product_id = rows[start][0]
+        end = start
+        while end < len(rows) and rows[end][0] == product_id:
+            end += 1
+        product_rows = rows[start:end]
+        start = end
+
+        # Observed days, plus a gap-free daily series for the time-based models
+        days = np.array([datetime.date.fromisoformat(row[1][:10]).toordinal() for row in product_rows])
+        observed = np.array([row[3] or 0 for row in product_rows], dtype=float)
+        daily = np.zeros(days[-1] - days[0] + 1)
+        np.add.at(daily, days - days[0], observed)
+
+        demand = model_func(observed, daily, horizon)
+        stock_level = product_rows[0][4]
+        current_inventory = stock_level if stock_level is not None else (product_rows[0][2] or 0) - observed.sum()
+        consumed = np.concatenate(([0.0], np.cumsum(demand)[:-1]))
+        quantities.append(np.maximum(0, current_inventory - consumed))
+        product_ids.append(product_id)
+        start_dates.append(days[-1] + 1)
+
+    if not product_ids:
+        return pd.DataFrame(columns=['product_id', 'date', 'forecasted_quantity'])
+    ordinals = np.repeat(start_dates, horizon) + np.tile(steps, len(product_ids))
+    return pd.DataFrame({
+        'product_id': np.repeat(product_ids, horizon),
+        'date': pd.to_datetime((ordinals - EPOCH_ORDINAL).astype('datetime64[D]')),
+        'forecasted_quantity': np.concatenate(quantities),
+    })
+
+# Forecast every product with a per-SKU model, sharding product IDs across a process pool.
+# Each worker reads its own contiguous ID range over a read-only connection.
+def forecast_parallel(db_name="inventory.db", horizon=DEFAULT_HORIZON, model='exponential_smoothing',
+                      workers=None, chunk_size=1000):
+    if model not in MODELS:
+        raise ValueError(f"Unknown forecast model {model!r}; choose from {', '.join(MODELS)}.")
+
+    with read_connection(db_name) as conn:
+        product_ids = [row[0] for row in conn.execute("SELECT DISTINCT product_id FROM FullData WHERE product_id IS NOT NULL ORDER BY product_id")]
+    shards = [(product_ids[i], product_ids[min(i + chunk_size, len(product_ids)) - 1])
+              for i in range(0, len(product_ids), chunk_size)]
+    if not shards:
+        return pd.DataFrame(columns=['product_id', 'date', 'forecasted_quantity'])
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = [_forecast_shard(db_name, first, last, horizon, model) for first, last in shards]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_forecast_shard, db_name, first, last, horizon, model) for first, last in shards]
+            results = [future.result() for future in futures]
+    return pd.concat(results, ignore_index=True)
+
+def _product_version(conn, product_id):
+    row = conn.execute("SELECT version FROM ProductVersion WHERE product_id = ?", (product_id,)).fetchone()
+    return row[0] if row else 0
+
+class ForecastCache:
+    # Bounded LRU cache of forecasts keyed on (database, product_id, horizon, model).
+    # Each entry remembers the product's ProductVersion counter, which triggers bump
+    # on every write to its FullData or Inventory rows and on its stock movements, so a
+    # hit is only served while the product is unchanged. Cached frames are shared between callers and must not
+    # be modified.
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, product_id, db_name="inventory.db", horizon=DEFAULT_HORIZON, model='moving_average'):
+        if model not in MODELS:
+            raise ValueError(f"Unknown forecast model {model!r}; choose from {', '.join(MODELS)}.")
+        key = (os.path.abspath(db_name), product_id, horizon, model)
+
+        with read_connection(db_name) as conn:
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None and entry[0] == _product_version(conn, product_id):
+                with self._lock:
+                    if key in self._entries:
+                        self._entries.move_to_end(key)
+                    self.hits += 1
+                return entry[1]
+
+            # Read the version and the sales in one snapshot so a concurrent write
+            # can never be cached under the version that preceded it
+            conn.execute("BEGIN")
+            version = _product_version(conn, product_id)
+            rows = conn.execute(SHARD_QUERY, (product_id, product_id)).fetchall()
+
+        forecast = _forecast_rows(rows, horizon, model)[['date', 'forecasted_quantity']]
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (version, forecast)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return forecast
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+forecast_cache = ForecastCache()
+
+# Forecast for one product served from the shared cache; like forecast_inventory it
+# returns an empty list when the product has no sales data
+def cached_forecast(product_id, db_name="inventory.db", horizon=DEFAULT_HORIZON, model='moving_average'):
+    forecast = forecast_cache.get(product_id, db_name, horizon, model)
+    if forecast.empty:
+        print(f"No data available for product ID {product_id}.")
+        return []
+    return forecast
+
+# Time the pandas and NumPy post-processing alongside the public functions
+profiling.instrument(sys.modules[__name__], extra=('_forecast_from_summary', '_forecast_rows'))
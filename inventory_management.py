@@ -1,63 +1,351 @@
 import sqlite3
-from database import connect_db
+import sys
+import profiling
+from database import read_connection, write_connection, retry_write, table_columns, DATE_FORMAT
 import datetime
 
 # Add product to inventory
 def add_product(product_id, name, category, initial_quantity, unit_price, units_sold, db_name="inventory.db"):
-    conn = connect_db(db_name)
-    cursor = conn.cursor()
+    with write_connection(db_name) as conn:
+        cursor = conn.cursor()
 
-    # Calculate remaining_quantity based on initial_quantity and units_sold
-    remaining_quantity = initial_quantity - units_sold
+        # Calculate remaining_quantity based on initial_quantity and units_sold
+        remaining_quantity = initial_quantity - units_sold
 
-    # Insert data into FullData table, including remaining_quantity and actual units_sold
-    cursor.execute("""
-        INSERT INTO FullData (product_id, date, product_category, product_name, units_sold, unit_price, total_revenue, initial_quantity, remaining_quantity) 
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (product_id, datetime.date.today().strftime('%m/%d/%Y'), category, name, units_sold, unit_price, units_sold * unit_price, initial_quantity, remaining_quantity))
+        current_date = datetime.date.today().strftime(DATE_FORMAT)
 
-    # Insert inventory information into Inventory table with remaining_quantity
-    current_date = datetime.date.today().strftime('%m/%d/%Y')
-    cursor.execute("""
-        INSERT INTO Inventory (product_id, inventory_date, quantity, remaining_quantity) 
-        VALUES (?, ?, ?, ?)
-    """, (product_id, current_date, initial_quantity, remaining_quantity))
+        # Insert data into FullData table, including remaining_quantity and actual units_sold
+        cursor.execute("""
+            INSERT INTO FullData (product_id, date, product_category, product_name, units_sold, unit_price, total_revenue, initial_quantity, remaining_quantity) 
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (product_id, current_date, category, name, units_sold, unit_price, units_sold * unit_price, initial_quantity, remaining_quantity))
 
-    conn.commit()
-    conn.close()
+        # Insert inventory information into Inventory table with remaining_quantity
+        cursor.execute("""
+            INSERT INTO Inventory (product_id, inventory_date, quantity, remaining_quantity) 
+            VALUES (?, ?, ?, ?)
+        """, (product_id, current_date, initial_quantity, remaining_quantity))
 
 # Delete product from inventory
 def delete_product(product_id, db_name="inventory.db"):
-    conn = connect_db(db_name)
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM Products WHERE product_id = ?", (product_id,))
-    cursor.execute("DELETE FROM Inventory WHERE product_id = ?", (product_id,))
-    conn.commit()
+    with write_connection(db_name) as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM Products WHERE product_id = ?", (product_id,))
+        cursor.execute("DELETE FROM Inventory WHERE product_id = ?", (product_id,))
+        write_off_stock(conn, product_id)
     print(f"Product with ID {product_id} deleted successfully.")
-    conn.close()
 
 # Update product quantity in the Inventory table
 def update_inventory(product_id, units_sold, db_name="inventory.db"):
-    conn = connect_db(db_name)
-    cursor = conn.cursor()
-    
-    # Get the current quantity from the Inventory table
-    cursor.execute("SELECT quantity FROM Inventory WHERE product_id = ? ORDER BY inventory_id DESC LIMIT 1", (product_id,))
-    current_quantity = cursor.fetchone()
-    
-    if current_quantity is None:
-        print(f"No inventory record found for product ID {product_id}.")
+    new_quantities = decrement_stock({product_id: units_sold}, db_name)
+    if new_quantities is None:
         return
-    
-    # Calculate new inventory quantity
-    new_quantity = current_quantity[0] - units_sold
-    if new_quantity < 0:
-        print("Insufficient inventory!")
-        return
-    
-    cursor.execute("INSERT INTO Inventory (product_id, inventory_date, quantity) VALUES (?, ?, ?)",
-                   (product_id, datetime.date.today(), new_quantity))
-    
-    print(f"Inventory updated for product ID {product_id}. New quantity: {new_quantity}.")
-    conn.commit()
-    conn.close()
+
+    print(f"Inventory updated for product ID {product_id}. New quantity: {new_quantities[product_id]}.")
+
+# Take stock for one order: items maps product_id to units. Every line is checked and
+# written in a single IMMEDIATE transaction, so concurrent order processors (threads or
+# processes) can never both pass the check and oversell. Either all lines are applied,
+# returning each product's new quantity, or none are and None is returned.
+def decrement_stock(items, db_name="inventory.db", movement_date=None):
+    if not isinstance(items, dict):
+        order = {}
+        for product_id, units in items:
+            order[product_id] = order.get(product_id, 0) + units
+        items = order
+    for product_id, units in items.items():
+        if units <= 0:
+            raise ValueError(f"Units for product ID {product_id} must be positive.")
+
+    def apply(conn):
+        new_quantities = {}
+        for product_id, units in items.items():
+            current_quantity = stock_level(conn, product_id)
+            if current_quantity is None:
+                print(f"No inventory record found for product ID {product_id}.")
+                return None
+            if current_quantity < units:
+                print("Insufficient inventory!")
+                return None
+            new_quantities[product_id] = current_quantity - units
+
+        for product_id, units in items.items():
+            record_movement(conn, product_id, 'sale', -units, movement_date)
+            record_inventory_level(conn, product_id, new_quantities[product_id], movement_date)
+        return new_quantities
+
+    return retry_write(apply, db_name)
+
+# Kinds of stock movement recorded in the StockMovement ledger
+MOVEMENT_KINDS = ('receipt', 'sale', 'adjustment', 'opening')
+
+# Append a movement to the stock ledger; the StockLevel balance is updated by trigger
+# in the same transaction. quantity is signed: positive for stock in, negative for out.
+def record_movement(conn, product_id, kind, quantity, movement_date=None):
+    if kind not in MOVEMENT_KINDS:
+        raise ValueError(f"Unknown movement kind {kind!r}; choose from {', '.join(MOVEMENT_KINDS)}.")
+    movement_date = movement_date or datetime.date.today().strftime(DATE_FORMAT)
+    conn.execute("INSERT INTO StockMovement (product_id, movement_date, kind, quantity) VALUES (?, ?, ?, ?)",
+                 (product_id, movement_date, kind, quantity))
+
+# Current quantity of a product from StockLevel, or None if it has no stock history
+def stock_level(conn, product_id):
+    row = conn.execute("SELECT quantity FROM StockLevel WHERE product_id = ?", (product_id,)).fetchone()
+    return row[0] if row else None
+
+def current_quantity(product_id, db_name="inventory.db"):
+    with read_connection(db_name) as conn:
+        return stock_level(conn, product_id)
+
+# Record an adjustment bringing a product's balance to the given quantity
+def set_stock_level(conn, product_id, quantity, movement_date=None):
+    delta = quantity - (stock_level(conn, product_id) or 0)
+    if delta:
+        record_movement(conn, product_id, 'adjustment', delta, movement_date)
+
+# Write the remaining stock off when a product is deleted; the ledger keeps its history.
+# The balance row goes too, so a product re-added under the same ID receives its
+# opening receipt again.
+def write_off_stock(conn, product_id):
+    if stock_level(conn, product_id) is not None:
+        set_stock_level(conn, product_id, 0)
+        conn.execute("DELETE FROM StockLevel WHERE product_id = ?", (product_id,))
+
+# Keep the day's closing stock in Inventory, which the monthly inventory view reads
+def record_inventory_level(conn, product_id, quantity, inventory_date=None):
+    inventory_date = inventory_date or datetime.date.today().strftime(DATE_FORMAT)
+    conn.execute("""
+        INSERT INTO Inventory (product_id, inventory_date, quantity) VALUES (?, ?, ?)
+        ON CONFLICT(product_id, inventory_date) DO UPDATE SET quantity = excluded.quantity
+    """, (product_id, inventory_date, quantity))
+
+# Store every product's balance as of a date (default today) in StockSnapshot, so
+# historical balances replay only the movements recorded since the snapshot
+def snapshot_stock_levels(db_name="inventory.db", snapshot_date=None):
+    snapshot_date = snapshot_date or datetime.date.today().strftime(DATE_FORMAT)
+    with write_connection(db_name) as conn:
+        cursor = conn.execute("""
+            INSERT INTO StockSnapshot (product_id, snapshot_date, quantity, movement_id)
+            SELECT product_id, ?, SUM(quantity), (SELECT COALESCE(MAX(movement_id), 0) FROM StockMovement)
+            FROM StockMovement
+            WHERE movement_date <= ?
+            GROUP BY product_id
+            ON CONFLICT(product_id, snapshot_date) DO UPDATE SET
+                quantity = excluded.quantity,
+                movement_id = excluded.movement_id
+        """, (snapshot_date, snapshot_date))
+    print(f"Stock snapshot for {snapshot_date}: {cursor.rowcount} products.")
+    return cursor.rowcount
+
+# Balance of a product at the end of a date: the latest snapshot on or before it, plus
+# movements dated after the snapshot, plus backdated movements recorded since it was taken
+def stock_level_at(product_id, date, db_name="inventory.db"):
+    with read_connection(db_name) as conn:
+        # Read the snapshot and the movements in one consistent view
+        conn.execute("BEGIN")
+        snapshot = conn.execute("""
+            SELECT snapshot_date, quantity, movement_id FROM StockSnapshot
+            WHERE product_id = ? AND snapshot_date <= ?
+            ORDER BY snapshot_date DESC LIMIT 1
+        """, (product_id, date)).fetchone()
+        if snapshot is None:
+            return conn.execute("""
+                SELECT COALESCE(SUM(quantity), 0) FROM StockMovement
+                WHERE product_id = ? AND movement_date <= ?
+            """, (product_id, date)).fetchone()[0]
+
+        snapshot_date, quantity, movement_id = snapshot
+        later = conn.execute("""
+            SELECT COALESCE(SUM(quantity), 0) FROM StockMovement
+            WHERE product_id = ? AND movement_date > ? AND movement_date <= ?
+        """, (product_id, snapshot_date, date)).fetchone()[0]
+        backdated = conn.execute("""
+            SELECT COALESCE(SUM(quantity), 0) FROM StockMovement
+            WHERE product_id = ? AND movement_date <= ? AND movement_id > ?
+        """, (product_id, snapshot_date, movement_id)).fetchone()[0]
+    return quantity + later + backdated
+
+# First product ID handed out on an empty catalogue, matching the existing five-digit IDs
+FIRST_PRODUCT_ID = 10000
+
+# Reserve a block of consecutive product IDs inside the caller's transaction. IDs only
+# grow, so new rows append at the end of the product_id indexes, and the block starts
+# past any ID already present, e.g. one loaded from a CSV file.
+def _allocate_product_ids(conn, count):
+    if not count:
+        return range(0)
+    row = conn.execute("""
+        SELECT MAX(
+            COALESCE((SELECT next_value FROM Sequences WHERE name = 'product_id'), ?),
+            COALESCE((SELECT MAX(product_id) FROM Products), 0) + 1,
+            COALESCE((SELECT MAX(product_id) FROM FullData), 0) + 1)
+    """, (FIRST_PRODUCT_ID,)).fetchone()
+    first_id = row[0]
+    conn.execute("""
+        INSERT INTO Sequences (name, next_value) VALUES ('product_id', ?)
+        ON CONFLICT(name) DO UPDATE SET next_value = excluded.next_value
+    """, (first_id + count,))
+    return range(first_id, first_id + count)
+
+# Reserve count new product IDs, safe against concurrent allocators in other processes
+def allocate_product_ids(count=1, db_name="inventory.db"):
+    return retry_write(lambda conn: _allocate_product_ids(conn, count), db_name)
+
+# Bulk variants for catalogue syncs. Each takes an iterable of records, applies all of
+# them with executemany in one transaction, and returns a (product_id, status) pair per
+# record in input order.
+
+# Product IDs per IN (...) lookup, below SQLite's historical 999-parameter limit
+ID_BATCH = 900
+
+def _existing_products(conn, product_ids):
+    product_ids = list(product_ids)
+    existing = set()
+    for start in range(0, len(product_ids), ID_BATCH):
+        batch = product_ids[start:start + ID_BATCH]
+        placeholders = ', '.join('?' * len(batch))
+        existing.update(row[0] for row in conn.execute(
+            f"SELECT product_id FROM Products WHERE product_id IN ({placeholders})", batch))
+    return existing
+
+# Split records into those for known products and a result list marking the rest missing
+def _known_records(conn, records):
+    records = list(records)
+    existing = _existing_products(conn, {record[0] for record in records})
+    results = [(record[0], 'updated' if record[0] in existing else 'missing') for record in records]
+    return [record for record in records if record[0] in existing], results
+
+# Add many products, as the Add Product form does for one: records are
+# (product_id, name, category, initial_quantity, unit_price, units_sold).
+# A product_id of None takes the next ID from the allocator, reserved as one block for
+# the batch. IDs that already exist, or repeat within the batch, are 'duplicate'.
+def add_products(records, db_name="inventory.db"):
+    current_date = datetime.date.today().strftime(DATE_FORMAT)
+    records = list(records)
+
+    # An IMMEDIATE transaction, so the ID block cannot be read by another process
+    # before this one reserves it
+    def add(conn):
+        new_ids = iter(_allocate_product_ids(conn, sum(1 for record in records if record[0] is None)))
+        assigned = [(next(new_ids),) + tuple(record[1:]) if record[0] is None else record for record in records]
+        existing = _existing_products(conn, {record[0] for record in assigned})
+        results, new = [], []
+        for record in assigned:
+            if record[0] in existing:
+                results.append((record[0], 'duplicate'))
+            else:
+                existing.add(record[0])
+                new.append(record)
+                results.append((record[0], 'added'))
+
+        cursor = conn.cursor()
+        cursor.executemany("""
+            INSERT INTO Products (product_id, product_name, product_category, initial_quantity)
+            VALUES (?, ?, ?, ?)
+        """, ((pid, name, category, initial) for pid, name, category, initial, price, sold in new))
+        cursor.executemany("""
+            INSERT INTO Sales (product_id, sale_date, units_sold, unit_price, total_revenue)
+            VALUES (?, ?, ?, ?, ?)
+        """, ((pid, current_date, sold, price, sold * price) for pid, name, category, initial, price, sold in new))
+
+        # remaining_quantity is filled where the columns exist
+        fulldata_remaining = 'remaining_quantity' in table_columns(conn, 'FullData')
+        cursor.executemany(f"""
+            INSERT INTO FullData (product_id, date, product_category, product_name, units_sold, unit_price, total_revenue, initial_quantity{', remaining_quantity' if fulldata_remaining else ''})
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?{', ?' if fulldata_remaining else ''})
+        """, ((pid, current_date, category, name, sold, price, sold * price, initial)
+              + ((initial - sold,) if fulldata_remaining else ())
+              for pid, name, category, initial, price, sold in new))
+        inventory_remaining = 'remaining_quantity' in table_columns(conn, 'Inventory')
+        cursor.executemany(f"""
+            INSERT INTO Inventory (product_id, inventory_date, quantity{', remaining_quantity' if inventory_remaining else ''})
+            VALUES (?, ?, ?{', ?' if inventory_remaining else ''})
+        """, ((pid, current_date, initial) + ((initial - sold,) if inventory_remaining else ())
+              for pid, name, category, initial, price, sold in new))
+        return results
+
+    return retry_write(add, db_name)
+
+# Update many products, as the Update Product form does for one: records are
+# (product_id, units_sold, unit_price, initial_quantity). Unknown IDs are 'missing'.
+def update_products(records, db_name="inventory.db"):
+    records = list(records)
+
+    # An IMMEDIATE transaction retried while another writer holds the lock, as in add_products
+    def update(conn):
+        known, results = _known_records(conn, records)
+        cursor = conn.cursor()
+
+        fulldata_remaining = 'remaining_quantity' in table_columns(conn, 'FullData')
+        cursor.executemany(f"""
+            UPDATE FullData
+            SET units_sold = ?, unit_price = ?, total_revenue = ?, initial_quantity = ?{', remaining_quantity = ?' if fulldata_remaining else ''}
+            WHERE product_id = ?
+        """, ((sold, price, sold * price, initial) + ((initial - sold,) if fulldata_remaining else ()) + (pid,)
+              for pid, sold, price, initial in known))
+        inventory_remaining = 'remaining_quantity' in table_columns(conn, 'Inventory')
+        cursor.executemany(f"""
+            UPDATE Inventory
+            SET quantity = ?{', remaining_quantity = ?' if inventory_remaining else ''}
+            WHERE product_id = ?
+        """, ((initial,) + ((initial - sold,) if inventory_remaining else ()) + (pid,)
+              for pid, sold, price, initial in known))
+        cursor.executemany("""
+            UPDATE Sales
+            SET units_sold = ?, unit_price = ?, total_revenue = ?
+            WHERE product_id = ?
+        """, ((sold, price, sold * price, pid) for pid, sold, price, initial in known))
+        cursor.executemany("UPDATE Products SET initial_quantity = ? WHERE product_id = ?",
+                           ((initial, pid) for pid, sold, price, initial in known))
+
+        # Bring each stock balance to the corrected remaining quantity
+        cursor.executemany("""
+            INSERT INTO StockMovement (product_id, movement_date, kind, quantity)
+            SELECT product_id, movement_date, 'adjustment', delta
+            FROM (SELECT ? AS product_id, ? AS movement_date,
+                         ? - COALESCE((SELECT quantity FROM StockLevel WHERE product_id = ?), 0) AS delta)
+            WHERE delta != 0
+        """, ((pid, datetime.date.today().strftime(DATE_FORMAT), initial - sold, pid)
+              for pid, sold, price, initial in known))
+        return results
+
+    return retry_write(update, db_name)
+
+# Reprice many products: records are (product_id, unit_price). Revenue is recomputed
+# from the units already sold. Unknown IDs are 'missing'.
+def update_prices(records, db_name="inventory.db"):
+    records = list(records)
+
+    def reprice(conn):
+        known, results = _known_records(conn, records)
+        for table in ('FullData', 'Sales'):
+            conn.executemany(f"""
+                UPDATE {table} SET unit_price = ?, total_revenue = units_sold * ?
+                WHERE product_id = ?
+            """, ((price, price, pid) for pid, price in known))
+        return results
+
+    return retry_write(reprice, db_name)
+
+# Delete many products from every table, writing off their remaining stock and dropping
+# their balance rows, as write_off_stock does. Unknown IDs are 'missing'.
+def delete_products(product_ids, db_name="inventory.db"):
+    product_ids = list(product_ids)
+
+    def delete(conn):
+        existing = _existing_products(conn, set(product_ids))
+        results = [(pid, 'deleted' if pid in existing else 'missing') for pid in product_ids]
+        existing = [(pid,) for pid in existing]
+        for table in ('Products', 'Inventory', 'Sales', 'FullData'):
+            conn.executemany(f"DELETE FROM {table} WHERE product_id = ?", existing)
+        conn.executemany("""
+            INSERT INTO StockMovement (product_id, movement_date, kind, quantity)
+            SELECT product_id, ?, 'adjustment', -quantity FROM StockLevel
+            WHERE product_id = ? AND quantity != 0
+        """, ((datetime.date.today().strftime(DATE_FORMAT),) + pid for pid in existing))
+        conn.executemany("DELETE FROM StockLevel WHERE product_id = ?", existing)
+        return results
+
+    return retry_write(delete, db_name)
+
+profiling.instrument(sys.modules[__name__])
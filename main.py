@@ -1,107 +1,8 @@
-import sqlite3
 import tkinter as tk
-from tkinter import messagebox, Toplevel, Text, Entry, Label, Button, ttk, Frame, OptionMenu, StringVar
-import matplotlib.pyplot as plt
-import pandas as pd
-import random
-from datetime import datetime
-from database import connect_db
-from inventory_management import delete_product, add_product
-from forecasting import forecast_inventory
-
-# Add and update the 'remaining_quantity' column in both 'FullData' and 'Inventory' tables
-def add_remaining_quantity_column():
-    try:
-        # Connect to your SQLite database
-        conn = sqlite3.connect("inventory.db")
-        cursor = conn.cursor()
-        
-        # Add remaining_quantity column to FullData table if not exists
-        cursor.execute("ALTER TABLE FullData ADD COLUMN remaining_quantity INTEGER")
-        
-        # Calculate remaining_quantity for FullData table and update it
-        cursor.execute("""
-            UPDATE FullData
-            SET remaining_quantity = initial_quantity - units_sold
-            WHERE initial_quantity IS NOT NULL AND units_sold IS NOT NULL
-        """)
-        
-        # Add remaining_quantity column to Inventory table if not exists
-        cursor.execute("ALTER TABLE Inventory ADD COLUMN remaining_quantity INTEGER")
-        
-        # Update remaining_quantity in Inventory table based on FullData sales information
-        cursor.execute("""
-            UPDATE Inventory
-            SET remaining_quantity = (
-                SELECT remaining_quantity 
-                FROM FullData 
-                WHERE FullData.product_id = Inventory.product_id
-            )
-        """)
-        
-        # Commit the changes
-        conn.commit()
-        
-        # Verify the updates
-        full_data = cursor.execute("SELECT * FROM FullData LIMIT 5").fetchall()
-        inventory_data = cursor.execute("SELECT * FROM Inventory LIMIT 5").fetchall()
-        
-        print("Sample FullData with Remaining Quantity:")
-        for row in full_data:
-            print(row)
-        
-        print("\nSample Inventory with Remaining Quantity:")
-        for row in inventory_data:
-            print(row)
-        
-        # Close the connection
-        conn.close()
-        print("Remaining quantity column added and updated successfully in both tables.")
-
-    except sqlite3.OperationalError as e:
-        print(f"Error: {e}")
-    except Exception as e:
-        print(f"Unexpected error: {e}")
-
-# Call the function to add and update remaining_quantity column
-add_remaining_quantity_column()
-
-# Define the standardize_date_format function here
-def standardize_date_format():
-    conn = connect_db()
-    cursor = conn.cursor()
-    
-    # Update Inventory table dates to %m/%d/%Y
-    cursor.execute("SELECT product_id, inventory_date, quantity FROM Inventory")
-    rows = cursor.fetchall()
-    for row in rows:
-        product_id, inventory_date, quantity = row
-        try:
-            # Check if the date is in %Y-%m-%d format and convert it
-            standardized_date = datetime.strptime(inventory_date, '%Y-%m-%d').strftime('%m/%d/%Y')
-            cursor.execute("UPDATE Inventory SET inventory_date = ? WHERE product_id = ? AND inventory_date = ?", 
-                           (standardized_date, product_id, inventory_date))
-        except ValueError:
-            # If it's already in %m/%d/%Y format, ignore it
-            continue
-
-    # Update FullData table dates to %m/%d/%Y
-    cursor.execute("SELECT product_id, date FROM FullData")
-    rows = cursor.fetchall()
-    for row in rows:
-        product_id, date = row
-        try:
-            # Check if the date is in %Y-%m-%d format and convert it
-            standardized_date = datetime.strptime(date, '%Y-%m-%d').strftime('%m/%d/%Y')
-            cursor.execute("UPDATE FullData SET date = ? WHERE product_id = ? AND date = ?", 
-                           (standardized_date, product_id, date))
-        except ValueError:
-            # If it's already in %m/%d/%Y format, ignore it
-            continue
-
-    conn.commit()
-    conn.close()
-    print("Date format standardized to %m/%d/%Y in Inventory and FullData tables.")
+from tkinter import messagebox, Toplevel, Entry, Label, Button, ttk, Frame, OptionMenu, StringVar
+from database import init_db, read_connection, close_connections, fetch_page, search_condition, table_columns, PAGE_SIZE
+from inventory_management import add_products, update_products, delete_products
+from background import BackgroundTasks
 
 class InventoryApp:
     def __init__(self, root):
@@ -134,24 +35,58 @@ class InventoryApp:
 
         Button(root, text="Exit", command=self.exit_application, width=30).pack(pady=5)
 
+        # Progress bar shown while database work runs in the background
+        self.progress = ttk.Progressbar(root, mode="indeterminate", length=200)
+
+        # Worker threads for queries, so the window stays responsive during long reports
+        self.tasks = BackgroundTasks(root, on_busy=self.show_busy)
+
+        # In-memory catalogue snapshot, loaded in the background; once it is ready the
+        # forms check product IDs against it before opening a write transaction
+        self.catalogue = None
+        self.tasks.submit("catalogue", self.load_catalogue, self.set_catalogue)
+
+    def load_catalogue(self, task):
+        from catalogue import get_catalogue  # Loads numpy on a worker, not at startup
+        return get_catalogue()
+
+    def set_catalogue(self, catalogue):
+        self.catalogue = catalogue
+
+    # Whether a product exists, from the catalogue snapshot when it has loaded; until
+    # then the write itself reports unknown IDs
+    def product_exists(self, product_id):
+        return self.catalogue is None or self.catalogue.contains(product_id)
+
+    # Show or hide the progress bar as background jobs start and finish
+    def show_busy(self, busy):
+        if busy:
+            self.progress.pack(pady=5)
+            self.progress.start(15)
+        else:
+            self.progress.stop()
+            self.progress.pack_forget()
+
     # Display the total monthly inventory quantity    
     def show_monthly_inventory(self):
-        try:
-            conn = connect_db()# Connect to the database
-             # Query to calculate total inventory quantity for the current month
+
+        # Query to calculate total inventory quantity for the current month,
+        # as a range on the indexed ISO inventory_date
+        def load(task):
+            import pandas as pd
+
             query = """
-                SELECT SUBSTR(inventory_date, 1, 2) || '/' || SUBSTR(inventory_date, 7, 4) AS month, 
+                SELECT SUBSTR(inventory_date, 1, 7) AS month,
                        SUM(remaining_quantity) AS total_quantity
                 FROM Inventory
-                WHERE SUBSTR(inventory_date, 1, 2) || '/' || SUBSTR(inventory_date, 7, 4) = 
-                      strftime('%m/%Y', 'now')
+                WHERE inventory_date >= date('now', 'start of month')
+                  AND inventory_date < date('now', 'start of month', '+1 month')
                 GROUP BY month
             """
+            with task.reader() as conn:
+                return pd.read_sql_query(query, conn)
 
-            # Execute the query and load data into a DataFrame
-            df = pd.read_sql_query(query, conn) 
-            conn.close() # Close the database connection
-            
+        def show(df):
             # Check if there's data for the current month
             if df.empty:
                 messagebox.showinfo("Monthly Inventory", "No inventory data for this month.")
@@ -159,102 +94,107 @@ class InventoryApp:
                 total_quantity = df['total_quantity'].iloc[0]
                 messagebox.showinfo("Monthly Inventory", f"Inventory quantity for the current month: {total_quantity}")
 
-        except Exception as e:
-            messagebox.showerror("Error", f"Unable to display monthly inventory: {e}")
+        self.tasks.submit("monthly_inventory", load, show,
+                          on_error=lambda e: messagebox.showerror("Error", f"Unable to display monthly inventory: {e}"))
 
-    # Display sales chart with total monthly revenue
+    # Display sales chart with total monthly revenue, embedded in its own window with
+    # category and product drilldown; it reads the monthly rollups and refreshes as sales land
     def show_sales_chart(self):
-        try:
-            conn = connect_db()
-            # Query to calculate total revenue by sale date
-            query = "SELECT sale_date, SUM(total_revenue) AS total_revenue FROM Sales GROUP BY sale_date"
-            sales_data = pd.read_sql_query(query, conn)
-            conn.close()
-
-            # Check if there's sales data to display
-            if sales_data.empty:
-                messagebox.showinfo("Sales Chart", "No sales data to display.")
-                return
+        from sales_chart import SalesChartWindow  # matplotlib loads on first use, not at startup
+        SalesChartWindow(self.root, self.tasks)
 
-            # Convert 'sale_date' to datetime format and aggregate monthly
-            sales_data['sale_date'] = pd.to_datetime(sales_data['sale_date'], format='%m/%d/%Y')
-            sales_data = sales_data.resample('M', on='sale_date').sum().reset_index()
-
-            # Plotting the aggregated monthly data
-            plt.figure(figsize=(10, 6))
-            plt.bar(sales_data['sale_date'].dt.strftime('%m/%Y'), sales_data['total_revenue'], color='skyblue')
-            plt.xlabel("Month")
-            plt.ylabel("Total Revenue")
-            plt.title("Monthly Sales Revenue Over Time")
-            plt.xticks(rotation=45, ha="right")
-
-            # Adding labels for each bar
-            for index, value in enumerate(sales_data['total_revenue']):
-                plt.text(index, value, f"{value:.2f}", ha='center', va='bottom')
-            
-            plt.tight_layout() # Adjust layout to fit everything neatly
-            plt.show() # Display the chart
-
-        except Exception as e:
-            messagebox.showerror("Error", f"Unable to display sales chart: {e}")
-
-    # Define function to display all data from FullData table with search and sort functionality
+    # Define function to display data from FullData table with search and sort functionality.
+    # Rows are fetched a page at a time with keyset pagination as the user scrolls, so
+    # opening the viewer costs the same regardless of table size.
     def show_full_data(self):
 
+        # Current search filter, sort order and position of the last loaded row
+        view = {'where': "", 'params': (), 'sort_column': None, 'descending': False,
+                'last_key': None, 'exhausted': False, 'pending': False, 'count': 0}
+
+        # Background jobs of this window share a channel, so a new search or sort
+        # cancels a page fetch that is still running
+        channel = ("full_data", id(view))
+
+        # Define function for fetching the next page in the background
+        def load_page():
+            if view['exhausted']:
+                view['pending'] = False
+                return
+            args = (view['where'], view['params'], view['sort_column'], view['descending'], view['last_key'])
+
+            def fetch(task):
+                with task.reader() as conn:
+                    return fetch_page(conn, "FullData", *args)
+
+            status_label.config(text=f"Showing {view['count']} rows (loading...)")
+            self.tasks.submit(channel, fetch, show_page,
+                              on_error=lambda e: messagebox.showerror("Error", f"Unable to load FullData: {e}", parent=top))
+
+        # Define function for appending a fetched page to the table
+        def show_page(rows):
+            view['pending'] = False
+            for row in rows:
+                tree.insert('', 'end', values=row[1:])
+            view['count'] += len(rows)
+            view['exhausted'] = len(rows) < PAGE_SIZE
+            if rows:
+                sort_index = columns.index(view['sort_column']) + 1 if view['sort_column'] else None
+                view['last_key'] = (rows[-1][sort_index] if sort_index else None, rows[-1][0])
+            more = "" if view['exhausted'] else " (scroll for more)"
+            status_label.config(text=f"Showing {view['count']} rows{more}")
+            if view['count'] == 0:
+                messagebox.showinfo("FullData", "No matching data found.", parent=top)
+
+        # Define function for clearing the table and loading the first page again
+        def reload():
+            tree.delete(*tree.get_children())
+            view.update(last_key=None, exhausted=False, pending=True, count=0)
+            load_page()
+
+        # Load the next page once the user scrolls near the end of the loaded rows
+        def on_scroll(first, last):
+            scrollbar.set(first, last)
+            if float(last) > 0.95 and not view['exhausted'] and not view['pending']:
+                view['pending'] = True
+                top.after_idle(load_page)
+
         # Define function for applying search based on selected column and search term
         def apply_search():
             search_value = search_entry.get() # Get search term from entry box
             column = search_column.get() # Get selected column for search
 
-            # Construct search query with LIKE for partial matching
-            query = f"SELECT * FROM FullData WHERE {column} LIKE ?"
-            search_term = f"%{search_value}%"
-
-            conn = connect_db()
-            df = pd.read_sql_query(query, conn, params=(search_term,))
-            conn.close()
-
-            # Display search results in the GUI
-            display_data(df)
+            # Product names and categories go through the full-text index, numbers and
+            # dates become range filters; an empty term shows every row
+            if search_value.strip():
+                try:
+                    with read_connection() as conn:
+                        where, params = search_condition(conn, column, search_value)
+                except ValueError as e:
+                    messagebox.showerror("Error", str(e))
+                    return
+                view.update(where=where, params=params)
+            else:
+                view.update(where="", params=())
+            reload()
 
         # Define function for applying sort based on selected column and order
         def apply_sort():
-            sort_column = sort_column_var.get() # Get selected column for sorting
-            sort_order = sort_order_var.get() # Get selected sort order (ASC or DESC)
-
-            conn = connect_db()
-            query = f"SELECT * FROM FullData ORDER BY {sort_column} {sort_order}"
-            df = pd.read_sql_query(query, conn)
-            conn.close()
-    
-            # Display sorted data in the GUI
-            display_data(df)
-
-        # Define function for updating the GUI with current DataFrame data
-        def display_data(dataframe):
-            """Update the display with the current DataFrame."""
-            if dataframe.empty:
-                messagebox.showinfo("FullData", "No matching data found.")
-            else:
-                for widget in result_frame.winfo_children(): # Clear any previous data from result frame
-                    widget.destroy()
-            
-                text = Text(result_frame, wrap='none') # Create text widget for displaying data
-                text.insert('1.0', dataframe.to_string(index=False)) # Insert DataFrame content into text widget
-                text.pack(fill='both', expand=True) # Pack and expand text widget to fit frame
+            view['sort_column'] = sort_column_var.get() # Get selected column for sorting
+            view['descending'] = sort_order_var.get() == "DESC" # Get selected sort order (ASC or DESC)
+            reload()
 
         # Create a new window for displaying FullData
         top = Toplevel(self.root)
         top.title("Display FullData")
+        top.bind("<Destroy>", lambda event: self.tasks.cancel(channel) if event.widget is top else None)
 
         # Maximize window to full screen
         top.state("zoomed")
 
         # Get column names from FullData table for search and sort options
-        conn = connect_db()
-        initial_df = pd.read_sql_query("SELECT * FROM FullData", conn)
-        columns = initial_df.columns.tolist()
-        conn.close()
+        with read_connection() as conn:
+            columns = table_columns(conn, "FullData")
 
         # Set up search section with options for selecting column and entering search term
         Label(top, text="Search by:").grid(row=0, column=0, sticky="w")
@@ -284,14 +224,27 @@ class InventoryApp:
         sort_button = Button(top, text="Apply Sort", command=apply_sort)
         sort_button.grid(row=1, column=3)
 
-         # Frame to display the search or sort results
+        # Frame holding the result table; the Treeview only draws the rows in view
         result_frame = Frame(top)
         result_frame.grid(row=2, column=0, columnspan=4, sticky="nsew")
         top.grid_rowconfigure(2, weight=1)
         top.grid_columnconfigure(3, weight=1)
 
-        # Display initial unsorted data
-        display_data(initial_df)
+        tree = ttk.Treeview(result_frame, columns=columns, show="headings")
+        for column in columns:
+            tree.heading(column, text=column)
+            tree.column(column, width=120, anchor="w")
+        scrollbar = ttk.Scrollbar(result_frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=on_scroll)
+        tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+        # Row count of what has been loaded so far
+        status_label = Label(top, text="")
+        status_label.grid(row=3, column=0, columnspan=4, sticky="w")
+
+        # Display the first page of unsorted data
+        reload()
 
     # Define function to create form for adding a new product
     def add_product_form(self):
@@ -327,34 +280,19 @@ class InventoryApp:
 
         # Function to handle product addition
         def submit():
-            product_id = random.randint(10000, 99999)  # Generate a random product ID
             product_category = category_entry.get().title() # Get and capitalize product category
             product_name = name_entry.get().title() # Get and capitalize product name
             units_sold = int(sold_entry.get()) # Get units sold as integer
             unit_price = float(price_entry.get())  # Get unit price as float
             initial_quantity = int(quantity_entry.get()) # Get initial quantity as integer
-            current_date = datetime.now().strftime('%m/%d/%Y') # Get the current date
 
-            # Connect to the database and insert product data
-            conn = connect_db()
-            cursor = conn.cursor()
-            add_product(product_id, product_name, product_category, initial_quantity, unit_price, units_sold)
+            # Insert the product into Products, Sales, FullData and Inventory in one
+            # transaction under the next ID from the allocator
+            [(product_id, status)] = add_products([(None, product_name, product_category, initial_quantity, unit_price, units_sold)])
 
-            # Insert product information into Products table
-            cursor.execute("""
-                INSERT INTO Products (product_id, product_name, product_category, initial_quantity) 
-                VALUES (?, ?, ?, ?)
-            """, (product_id, product_name, product_category, initial_quantity))
-                
-            # Insert initial sales data into Sales table
-            cursor.execute("""
-                INSERT INTO Sales (product_id, sale_date, units_sold, unit_price, total_revenue) 
-                VALUES (?, ?, ?, ?, ?)
-            """, (product_id, current_date, units_sold, unit_price, units_sold * unit_price))
-
-            
-            conn.commit()
-            conn.close()
+            if status != 'added':
+                messagebox.showerror("Error", f"Product ID {product_id} already exists.")
+                return
 
             # Show success message and close form
             messagebox.showinfo("Add Product", f"Product with ID {product_id} has been added successfully.")
@@ -396,59 +334,21 @@ class InventoryApp:
             unit_price = float(price_entry.get()) # Get unit price as float
             initial_quantity = int(quantity_entry.get()) # Get initial quantity as integer
 
-            conn = connect_db()
-            cursor = conn.cursor()
+            if not self.product_exists(product_id):
+                messagebox.showerror("Error", f"Product ID {product_id} does not exist.")
+                return
 
-            # Check if the product ID exists
-            cursor.execute("SELECT product_id FROM Products WHERE product_id = ?", (product_id,))
-            result = cursor.fetchone()
-
-            if result:
-                # Update product details in FullData table
-                cursor.execute("""
-                    UPDATE FullData 
-                    SET units_sold = ?, unit_price = ?, initial_quantity = ? 
-                    WHERE product_id = ?
-                """, (units_sold, unit_price, initial_quantity, product_id))
-
-                # Recalculate remaining_quantity for FullData
-                cursor.execute("""
-                    UPDATE FullData 
-                    SET remaining_quantity = initial_quantity - units_sold 
-                    WHERE product_id = ?
-                """, (product_id,))
-
-                # Update quantity and remaining_quantity in Inventory table
-                cursor.execute("""
-                    UPDATE Inventory
-                    SET quantity = ?, remaining_quantity = ?
-                    WHERE product_id = ?
-                """, (initial_quantity, initial_quantity - units_sold, product_id))
-
-                # Update units sold, unit price, and total revenue in Sales table
-                cursor.execute("""
-                    UPDATE Sales
-                    SET units_sold = ?, unit_price = ?, total_revenue = ?
-                    WHERE product_id = ?
-                """, (units_sold, unit_price, units_sold * unit_price, product_id))
-
-                # Update initial quantity in Products table
-                cursor.execute("""
-                    UPDATE Products
-                    SET initial_quantity = ?
-                    WHERE product_id = ?
-                """, (initial_quantity, product_id))
-                     
-                conn.commit()
+            # Update FullData, Inventory, Sales, Products and the stock ledger in one transaction
+            [(_, status)] = update_products([(product_id, units_sold, unit_price, initial_quantity)])
+
+            # Report the outcome once the transaction has been committed
+            if status == 'updated':
                 messagebox.showinfo("Update Product", f"Product with ID {product_id} has been updated successfully.")
                 form.destroy()
-
             else:
                 # Show an error if the product ID does not exist
                 messagebox.showerror("Error", f"Product ID {product_id} does not exist.")
 
-            conn.close()
-
         Button(form, text="Update Product", command=submit_update).grid(row=4, column=1)
 
     # Function to delete product
@@ -467,28 +367,20 @@ class InventoryApp:
         def submit_delete():
             product_id = int(product_id_entry.get()) # Get product ID as integer
 
-            conn = connect_db()
-            cursor = conn.cursor()
+            if not self.product_exists(product_id):
+                messagebox.showerror("Error", f"Product ID {product_id} does not exist.")
+                return
+
+            # Delete the product from every table if it exists
+            [(_, status)] = delete_products([product_id])
 
-            # Check if the product ID exists
-            cursor.execute("SELECT product_id FROM Products WHERE product_id = ?", (product_id,))
-            result = cursor.fetchone()
-
-            if result:
-                # Proceed with deletion if the product exists
-                cursor.execute("DELETE FROM Products WHERE product_id = ?", (product_id,))
-                cursor.execute("DELETE FROM Inventory WHERE product_id = ?", (product_id,))
-                cursor.execute("DELETE FROM Sales WHERE product_id = ?", (product_id,))
-                cursor.execute("DELETE FROM FullData WHERE product_id = ?", (product_id,))
-                conn.commit()            
+            if status == 'deleted':
                 messagebox.showinfo("Delete Product", f"Product with ID {product_id} has been deleted successfully.")
                 form.destroy()
             else:
                 # Show an error if the product ID does not exist
                 messagebox.showerror("Error", f"Product ID {product_id} does not exist.")
 
-            conn.close()
-
         Button(form, text="Delete Product", command=submit_delete).grid(row=1, column=1)
 
     # Function to forecast inventory for a product without displaying chart.
@@ -510,13 +402,24 @@ class InventoryApp:
         # Function to handle inventory forecasting
         def submit_forecast():
             product_id = int(product_id_entry.get()) # Get product ID as integer
-            forecast_df = forecast_inventory(product_id) # Get forecast data for the product
+            message_label.config(text="Forecasting...", fg="black")
+
+            # Get forecast data for the product in the background, reusing unchanged results
+            def forecast(task):
+                from forecasting import cached_forecast  # Loads pandas and numpy on first use
+                return cached_forecast(product_id)
+
+            self.tasks.submit(("forecast", id(form)), forecast,
+                              lambda forecast_df: show_forecast(product_id, forecast_df),
+                              on_error=lambda e: message_label.config(text=f"Unable to forecast: {e}", fg="red"))
 
+        # Function to display the forecast once it is ready
+        def show_forecast(product_id, forecast_df):
             # Check if forecast data is available
             if isinstance(forecast_df, list) or forecast_df.empty:
                 
                 # Display error message if no data is available
-                message_label.config(text=f"No data available for product ID {product_id}.")
+                message_label.config(text=f"No data available for product ID {product_id}.", fg="red")
             else:
                 # Display forecasted inventory data in a message box
                 forecast_text = "Inventory forecast for the next 10 days:\n"
@@ -532,11 +435,13 @@ class InventoryApp:
 
         # Confirm exit and close the application if confirmed
         if messagebox.askokcancel("Exit", "Are you sure you want to exit?"):
+            self.tasks.shutdown()  # Stop background jobs
+            close_connections()  # Release the pooled database connections
             self.root.quit()  # Exit the Tkinter main loop
             self.root.destroy()  # Destroy all Tkinter windows
 
 #Display login window and verify credentials.    
-def login():
+def login(root):
 
     # Function to check the entered credentials
     def check_credentials():
@@ -544,16 +449,15 @@ def login():
         password = password_entry.get() # Get entered password
 
         # Connect to the database and validate credentials
-        conn = connect_db()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM Users WHERE username = ? AND password = ?", (username, password))
-        result = cursor.fetchone() # Fetch the result if credentials are valid
-        conn.close()
+        with read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM Users WHERE username = ? AND password = ?", (username, password))
+            result = cursor.fetchone() # Fetch the result if credentials are valid
 
         # If credentials are correct, proceed to main app; otherwise, show error
         if result:
             login_window.destroy()  # Close login window if successful
-            show_main_app()  # Show main app window after login
+            show_main_app(root)  # Show main app window after login
         else:
             messagebox.showerror("Error", "Incorrect username or password!")
 
@@ -573,21 +477,28 @@ def login():
     
     Button(login_window, text="Login", command=check_credentials).pack(pady=10)
 
-def show_main_app():
+def show_main_app(root):
     # Create and show the main application interface
     main_app = InventoryApp(root)
     root.deiconify()  # Show the main window
 
-# Initialize Tkinter root window, but hide it initially
-root = tk.Tk()
-root.withdraw()  # Hide the main window until login is successful
-root.title("Warehouse Management System")
+def main():
+    # Bring the database schema up to date before the interface opens
+    init_db()
+
+    # Initialize Tkinter root window, but hide it initially
+    root = tk.Tk()
+    root.withdraw()  # Hide the main window until login is successful
+    root.title("Warehouse Management System")
+
+    # Call the login function when the application starts
+    login(root)
 
-# Call the login function when the application starts
-login()
+    # Start the Tkinter main loop
+    root.mainloop()
 
-# Start the Tkinter main loop
-root.mainloop()
+if __name__ == "__main__":
+    main()
 
 
 
@@ -0,0 +1,169 @@
+import datetime
+import os
+import shutil
+import sys
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pyarrow import fs
+import profiling
+from database import init_db, read_connection, write_connection, table_columns, DATE_FORMAT
+
+# Tables exported for analytics and the hive partition keys of each. month is derived
+# from the table's date column, so a query for one month or category only opens
+# the files under that directory.
+PARTITIONS = {
+    'Products': (),
+    'FullData': ('month', 'product_category'),
+    'Sales': ('month',),
+    'Inventory': ('month',),
+    'StockLevel': (),
+}
+
+# Tables that can be loaded back, in the order they are imported: the catalogue first,
+# then the history. FullData's triggers rebuild the stock ledger on import, which
+# misses sales recorded only in the ledger (decrement_stock), so StockLevel comes last
+# and brings each balance to its exported value with an adjustment movement.
+IMPORT_TABLES = ('Products', 'FullData', 'Sales', 'Inventory', 'StockLevel')
+
+# Date column each table's month partition is taken from
+MONTH_COLUMNS = {'FullData': 'date', 'Sales': 'sale_date', 'Inventory': 'inventory_date'}
+
+# Rows fetched from SQLite per Arrow record batch
+BATCH_SIZE = 100000
+
+# Arrow types for SQLite's declared column types
+ARROW_TYPES = {'INTEGER': pa.int64(), 'REAL': pa.float64(), 'TEXT': pa.string()}
+
+def _table_schema(conn, table):
+    fields = [pa.field(row[1], ARROW_TYPES.get(row[2].upper(), pa.string()))
+              for row in conn.execute(f"PRAGMA table_info({table})")]
+    if 'month' in PARTITIONS[table]:
+        fields.append(pa.field('month', pa.string()))
+    return pa.schema(fields)
+
+def _record_batches(cursor, schema, batch_size):
+    # Stream query results as Arrow record batches, one fetchmany at a time
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        columns = list(zip(*rows))
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema)
+
+# Export one table to a partitioned Parquet dataset under out_dir/<table>, replacing any
+# previous export. Rows are streamed in batches, so memory stays flat for any table size.
+def export_table(table, out_dir, db_name="inventory.db", batch_size=BATCH_SIZE):
+    path = os.path.join(out_dir, table)
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+
+    with read_connection(db_name) as conn:
+        schema = _table_schema(conn, table)
+        columns = ', '.join(f'"{name}"' for name in table_columns(conn, table))
+        if table in MONTH_COLUMNS:
+            columns += f", SUBSTR({MONTH_COLUMNS[table]}, 1, 7) AS month"
+        cursor = conn.execute(f"SELECT {columns} FROM {table}")
+        partitioning = ds.partitioning(
+            pa.schema([schema.field(key) for key in PARTITIONS[table]]), flavor='hive') if PARTITIONS[table] else None
+        ds.write_dataset(_record_batches(cursor, schema, batch_size), path, schema=schema, format='parquet',
+                         partitioning=partitioning, max_partitions=100000,
+                         existing_data_behavior='overwrite_or_ignore')
+    return path
+
+# Export every analytics table; returns the dataset path of each
+def export_parquet(out_dir, db_name="inventory.db", tables=None):
+    paths = {}
+    for table in tables or PARTITIONS:
+        paths[table] = export_table(table, out_dir, db_name)
+        print(f"Exported {table} to {paths[table]}.")
+    return paths
+
+# Open an exported table as an Arrow dataset; nothing is read until it is scanned
+def open_dataset(table, in_dir):
+    return ds.dataset(os.path.join(in_dir, table), format='parquet', partitioning='hive',
+                      filesystem=fs.LocalFileSystem(use_mmap=True))
+
+# Read an exported table into an Arrow table. Parquet files are memory-mapped, and only
+# the requested columns and the partitions matching the filter are read,
+# e.g. filter=ds.field('month') == '2024-03'.
+def read_table(table, in_dir, columns=None, filter=None):
+    return open_dataset(table, in_dir).to_table(columns=columns, filter=filter)
+
+# Load an exported table back into the database. Rows that already exist are kept,
+# so re-importing an export is harmless.
+def import_table(table, in_dir, db_name="inventory.db", batch_size=BATCH_SIZE):
+    dataset = open_dataset(table, in_dir)
+    rows = 0
+    with write_connection(db_name) as conn:
+        columns = [name for name in table_columns(conn, table) if name in dataset.schema.names]
+        sql = f"""
+            INSERT OR IGNORE INTO {table} ({', '.join(f'"{name}"' for name in columns)})
+            VALUES ({', '.join('?' * len(columns))})
+        """
+        for batch in dataset.to_batches(columns=columns, batch_size=batch_size):
+            conn.executemany(sql, zip(*(batch.column(name).to_pylist() for name in columns)))
+            rows += batch.num_rows
+    return rows
+
+# Bring each product's stock balance to its exported value; returns the rows read.
+# Products without an exported balance, such as deleted ones that FullData's triggers
+# gave a balance again, are written off as write_off_stock does.
+def import_stock_levels(in_dir, db_name="inventory.db", batch_size=BATCH_SIZE):
+    dataset = open_dataset('StockLevel', in_dir)
+    movement_date = datetime.date.today().strftime(DATE_FORMAT)
+    rows = 0
+    with write_connection(db_name) as conn:
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS ImportedStock (product_id INTEGER PRIMARY KEY)")
+        conn.execute("DELETE FROM temp.ImportedStock")
+        for batch in dataset.to_batches(columns=['product_id', 'quantity'], batch_size=batch_size):
+            conn.executemany("INSERT OR IGNORE INTO temp.ImportedStock (product_id) VALUES (?)",
+                             ((product_id,) for product_id in batch.column('product_id').to_pylist()))
+            conn.executemany("""
+                INSERT INTO StockMovement (product_id, movement_date, kind, quantity)
+                SELECT product_id, ?, 'adjustment', delta
+                FROM (SELECT ? AS product_id,
+                             ? - COALESCE((SELECT quantity FROM StockLevel WHERE product_id = ?), 0) AS delta)
+                WHERE delta != 0
+            """, ((movement_date, product_id, quantity, product_id) for product_id, quantity
+                  in zip(batch.column('product_id').to_pylist(), batch.column('quantity').to_pylist())))
+            rows += batch.num_rows
+
+        unexported = "product_id NOT IN (SELECT product_id FROM temp.ImportedStock)"
+        conn.execute(f"""
+            INSERT INTO StockMovement (product_id, movement_date, kind, quantity)
+            SELECT product_id, ?, 'adjustment', -quantity FROM StockLevel
+            WHERE quantity != 0 AND {unexported}
+        """, (movement_date,))
+        conn.execute(f"DELETE FROM StockLevel WHERE {unexported}")
+        conn.execute("DROP TABLE temp.ImportedStock")
+    return rows
+
+# Import every exported table found under in_dir, creating the schema first if the
+# database is new; returns the rows read per table
+def import_parquet(in_dir, db_name="inventory.db", tables=None):
+    init_db(db_name)
+    counts = {}
+    for table in tables or IMPORT_TABLES:
+        if table not in IMPORT_TABLES:
+            raise ValueError(f"{table} cannot be imported; choose from {', '.join(IMPORT_TABLES)}.")
+    for table in sorted(tables or IMPORT_TABLES, key=IMPORT_TABLES.index):
+        if os.path.isdir(os.path.join(in_dir, table)):
+            if table == 'StockLevel':
+                counts[table] = import_stock_levels(in_dir, db_name)
+            else:
+                counts[table] = import_table(table, in_dir, db_name)
+            print(f"Imported {counts[table]} {table} rows from {in_dir}.")
+    return counts
+
+profiling.instrument(sys.modules[__name__])
+
+if __name__ == "__main__":
+    # python parquet_store.py export|import <directory> [table ...]
+    if len(sys.argv) < 3 or sys.argv[1] not in ('export', 'import'):
+        sys.exit("Usage: python parquet_store.py export|import <directory> [table ...]")
+    command, directory, tables = sys.argv[1], sys.argv[2], sys.argv[3:] or None
+    if command == 'export':
+        export_parquet(directory, tables=tables)
+    else:
+        import_parquet(directory, tables=tables)
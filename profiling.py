@@ -0,0 +1,332 @@
+import atexit
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Opt-in instrumentation. Set INVENTORY_PROFILE to a file path before starting the
+# application (or call enable() before the first connection is opened) and every
+# pooled connection traces its statements: latency, rows returned and, for the
+# slowest statements, their EXPLAIN QUERY PLAN. Modules that call instrument() at
+# import time also get each public function timed. Aggregates are written to that
+# path on exit, in Prometheus text format for a .prom file and as JSON otherwise.
+# When profiling is off, connections are plain sqlite3 connections and functions
+# are left unwrapped, so there is no overhead.
+PROFILE_ENV = "INVENTORY_PROFILE"
+
+# Upper bounds, in seconds, of the latency histogram buckets
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Statements slower than this have their query plan captured for the report
+SLOW_QUERY_SECONDS = 0.05
+
+# Distinct statements tracked; further ones are counted under OTHER_STATEMENT
+MAX_STATEMENTS = 1000
+OTHER_STATEMENT = "<other>"
+
+class Histogram:
+    # Latency distribution of one statement or function
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        index = 0
+        while index < len(BUCKETS) and seconds > BUCKETS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self):
+        return {'count': self.count, 'total_seconds': self.total, 'max_seconds': self.max,
+                'mean_seconds': self.total / self.count if self.count else 0.0,
+                'buckets': dict(zip([str(bound) for bound in BUCKETS] + ['+Inf'], self.counts))}
+
+class StatementStats(Histogram):
+    # Histogram of one SQL statement, plus the rows it returned and the parameters of
+    # its slowest execution, used to explain its plan when a report is written
+
+    def __init__(self):
+        super().__init__()
+        self.rows = 0
+        self.slowest = None
+
+_enabled = False
+_pid = None
+_lock = threading.Lock()
+_statements = {}
+_functions = {}
+
+def enabled():
+    return _enabled
+
+def enable(report_path=None):
+    # Turn profiling on for connections opened from now on; with report_path the
+    # aggregates are written there when the process exits
+    global _enabled, _pid
+    _enabled = True
+    _pid = os.getpid()
+    if report_path:
+        atexit.register(_write_at_exit, report_path)
+
+def disable():
+    global _enabled
+    _enabled = False
+
+def reset():
+    with _lock:
+        _statements.clear()
+        _functions.clear()
+
+def _write_at_exit(path):
+    # Pool worker processes inherit the handler but not the parent's measurements
+    if os.getpid() == _pid:
+        write_report(path)
+
+def normalize_sql(sql):
+    return ' '.join(sql.split())
+
+def record_query(sql, seconds, rows=0, database=None, uri=False, parameters=None):
+    key = normalize_sql(sql)
+    with _lock:
+        stats = _statements.get(key)
+        if stats is None:
+            if len(_statements) >= MAX_STATEMENTS:
+                key, parameters = OTHER_STATEMENT, None
+                stats = _statements.setdefault(key, StatementStats())
+            else:
+                stats = _statements[key] = StatementStats()
+        stats.observe(seconds)
+        stats.rows += rows
+        if seconds >= SLOW_QUERY_SECONDS and seconds >= stats.max and database is not None:
+            stats.slowest = (database, uri, parameters)
+
+def record_call(name, seconds):
+    with _lock:
+        histogram = _functions.get(name)
+        if histogram is None:
+            histogram = _functions[name] = Histogram()
+        histogram.observe(seconds)
+
+@contextmanager
+def timer(name):
+    # Time a block under the given function name when profiling is on
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_call(name, time.perf_counter() - start)
+
+def timed(func, name=None):
+    name = name or f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            record_call(name, time.perf_counter() - start)
+    return wrapper
+
+def instrument(module, extra=(), skip=()):
+    # Replace the module's public functions, and any private ones named in extra, with
+    # timed wrappers. Called at the end of the module so names imported from it
+    # elsewhere are already the wrappers. Does nothing unless profiling is on.
+    if not _enabled:
+        return
+    for name, value in list(vars(module).items()):
+        if (callable(value) and not isinstance(value, type) and getattr(value, '__module__', None) == module.__name__
+                and (not name.startswith('_') or name in extra) and name not in skip):
+            setattr(module, name, timed(value))
+
+class TracingCursor(sqlite3.Cursor):
+    # Cursor that measures the time each statement spends in SQLite, from execute
+    # until its results are exhausted or the cursor is reused, closed or collected.
+    # Time the caller spends between fetches is not counted.
+    _pending = None
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._pending = [sql, parameters, time.perf_counter() - start, 0]
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._pending = [sql, None, time.perf_counter() - start, 0]
+
+    def _track(self, start, rows, done):
+        if self._pending is not None:
+            self._pending[2] += time.perf_counter() - start
+            self._pending[3] += rows
+            if done:
+                self._finish()
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._track(start, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        start = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._track(start, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._track(start, len(rows), True)
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._track(start, 0, True)
+            raise
+        self._track(start, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+    def _finish(self):
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            sql, parameters, seconds, rows = pending
+            connection = self.connection
+            record_query(sql, seconds, rows, getattr(connection, 'database', None),
+                         getattr(connection, 'uri', False), parameters)
+
+class TracingConnection(sqlite3.Connection):
+    # sqlite3 connection whose cursors, including those behind execute() and
+    # pandas.read_sql_query, are TracingCursors
+
+    def __init__(self, database, *args, **kwargs):
+        super().__init__(database, *args, **kwargs)
+        self.database = database
+        self.uri = kwargs.get('uri', False)
+
+    def cursor(self, factory=TracingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def connection_factory():
+    # Class to pass as sqlite3.connect(factory=...)
+    return TracingConnection if _enabled else sqlite3.Connection
+
+def explain(database, sql, parameters=(), uri=False):
+    # EXPLAIN QUERY PLAN of a statement, as the list of plan lines, over a fresh
+    # connection so it never disturbs the pooled ones
+    conn = sqlite3.connect(database, uri=uri)
+    try:
+        return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", parameters or ())]
+    except sqlite3.Error as e:
+        return [f"unavailable: {e}"]
+    finally:
+        conn.close()
+
+def full_scans(plan):
+    # Plan lines that read a whole table rather than seeking through an index
+    return [line for line in plan if line.startswith('SCAN') and 'INDEX' not in line]
+
+def slow_statements(n=10, key='total'):
+    # Top n statements by total or max latency, with their plans
+    with _lock:
+        items = [(sql, stats.as_dict(), stats.rows, stats.slowest) for sql, stats in _statements.items()]
+    items.sort(key=lambda item: item[1][f'{key}_seconds'], reverse=True)
+    results = []
+    for sql, histogram, rows, slowest in items[:n]:
+        entry = dict(histogram, statement=sql, rows=rows)
+        if slowest is not None:
+            database, uri, parameters = slowest
+            entry['plan'] = explain(database, sql, parameters, uri)
+            entry['full_scans'] = full_scans(entry['plan'])
+        results.append(entry)
+    return results
+
+def snapshot():
+    # All aggregates as a JSON-serializable dict
+    with _lock:
+        statements = {sql: dict(stats.as_dict(), rows=stats.rows) for sql, stats in _statements.items()}
+        functions = {name: histogram.as_dict() for name, histogram in _functions.items()}
+    return {'statements': statements, 'functions': functions,
+            'slowest_by_total': slow_statements(key='total'), 'slowest_by_max': slow_statements(key='max')}
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _histogram_lines(metric, labels, histogram):
+    lines = []
+    cumulative = 0
+    for bound, count in zip([str(bound) for bound in BUCKETS] + ['+Inf'], histogram.counts):
+        cumulative += count
+        lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{metric}_sum{{{labels}}} {histogram.total}')
+    lines.append(f'{metric}_count{{{labels}}} {histogram.count}')
+    return lines
+
+def prometheus_text():
+    # Aggregates in the Prometheus text exposition format. Statements are labelled with
+    # a short hash of their text and the text itself, truncated.
+    with _lock:
+        statements = [(hashlib.sha1(sql.encode()).hexdigest()[:10], sql, stats) for sql, stats in _statements.items()]
+        functions = list(_functions.items())
+    lines = ['# HELP inventory_query_duration_seconds Time SQLite spent on each statement.',
+             '# TYPE inventory_query_duration_seconds histogram']
+    for statement_id, sql, stats in statements:
+        labels = f'statement_id="{statement_id}",statement="{_label(sql[:200])}"'
+        lines.extend(_histogram_lines('inventory_query_duration_seconds', labels, stats))
+    lines += ['# HELP inventory_query_rows_total Rows returned by each statement.',
+              '# TYPE inventory_query_rows_total counter']
+    for statement_id, sql, stats in statements:
+        lines.append(f'inventory_query_rows_total{{statement_id="{statement_id}"}} {stats.rows}')
+    lines += ['# HELP inventory_function_duration_seconds Wall time of each instrumented function.',
+              '# TYPE inventory_function_duration_seconds histogram']
+    for name, histogram in functions:
+        lines.extend(_histogram_lines('inventory_function_duration_seconds', f'function="{_label(name)}"', histogram))
+    return '\n'.join(lines) + '\n'
+
+def write_report(path):
+    # Write the aggregates to path: Prometheus text for a .prom file, JSON otherwise
+    with open(path, 'w') as f:
+        if path.endswith('.prom'):
+            f.write(prometheus_text())
+        else:
+            json.dump(snapshot(), f, indent=2)
+    print(f"Profile written to {path}.")
+
+if os.environ.get(PROFILE_ENV):
+    enable(os.environ[PROFILE_ENV])
@@ -0,0 +1,120 @@
+import sys
+import time
+import profiling
+from database import init_db, read_connection, retry_write
+
+# Days of sales history the demand statistics are taken over, ending at the latest sale
+DEMAND_WINDOW_DAYS = 90
+
+# Days between placing a purchase order and receiving the stock
+LEAD_TIME_DAYS = 7
+
+# Standard normal quantile of the cycle service level: 1.65 covers demand during the
+# lead time in about 95% of replenishment cycles
+SERVICE_Z = 1.65
+
+# Recompute every queued product in one pass. Days without a sale count as zero demand,
+# so the mean and variance are taken over the whole window:
+#   safety_stock  = z * stddev * sqrt(lead time)
+#   reorder_point = mean * lead time + safety_stock
+#   days_of_cover = on_hand / mean
+# The Sales join is a range on the (product_id, sale_date) unique index per product.
+REFRESH_QUERY = """
+    WITH demand AS (
+        SELECT queued.product_id,
+               COALESCE(SUM(Sales.units_sold), 0) * 1.0 / :window_days AS mean,
+               COALESCE(SUM(Sales.units_sold * Sales.units_sold), 0) * 1.0 / :window_days AS mean_square
+        FROM ReorderQueue AS queued
+        JOIN Products ON Products.product_id = queued.product_id
+        LEFT JOIN Sales ON Sales.product_id = queued.product_id
+                       AND Sales.sale_date >= date(:window_end, :window_start)
+                       AND Sales.sale_date < date(:window_end, '+1 day')
+        GROUP BY queued.product_id
+    ),
+    stats AS (
+        SELECT demand.product_id, COALESCE(StockLevel.quantity, 0) AS on_hand, mean,
+               sqrt(MAX(mean_square - mean * mean, 0)) AS stddev
+        FROM demand
+        LEFT JOIN StockLevel ON StockLevel.product_id = demand.product_id
+    ),
+    points AS (
+        SELECT *, :service_z * stddev * sqrt(:lead_time_days) AS safety_stock,
+               mean * :lead_time_days + :service_z * stddev * sqrt(:lead_time_days) AS reorder_point
+        FROM stats
+    )
+    INSERT OR REPLACE INTO ReorderStatus (product_id, on_hand, avg_daily_demand, demand_stddev, lead_time_days,
+                                          service_z, safety_stock, reorder_point, days_of_cover, low_stock,
+                                          window_end, computed_at)
+    SELECT product_id, on_hand, mean, stddev, :lead_time_days, :service_z, safety_stock, reorder_point,
+           CASE WHEN mean > 0 THEN on_hand / mean END,
+           mean > 0 AND on_hand <= reorder_point,
+           :window_end, datetime('now')
+    FROM points
+"""
+
+# Recompute the reorder status of every product whose sales, stock or catalogue entry
+# changed since the last refresh; returns the number of products recomputed.
+# The window ends at as_of, by default the latest sale date. When the window moves
+# or the lead time or service level change, every product is recomputed once.
+def refresh_reorder_status(db_name="inventory.db", as_of=None, window_days=DEMAND_WINDOW_DAYS,
+                           lead_time_days=LEAD_TIME_DAYS, service_z=SERVICE_Z, full=False):
+    if window_days < 1 or lead_time_days < 0:
+        raise ValueError("window_days must be positive and lead_time_days not negative.")
+
+    def refresh(conn):
+        window_end = as_of or conn.execute("SELECT SUBSTR(MAX(sale_date), 1, 10) FROM Sales").fetchone()[0]
+        params = {'window_days': window_days, 'window_start': f"-{window_days - 1} days", 'window_end': window_end,
+                  'lead_time_days': lead_time_days, 'service_z': service_z}
+        if full:
+            conn.execute("INSERT OR IGNORE INTO ReorderQueue (product_id) SELECT product_id FROM Products")
+        else:
+            conn.execute("""
+                INSERT OR IGNORE INTO ReorderQueue (product_id)
+                SELECT product_id FROM ReorderStatus
+                WHERE window_end IS NOT :window_end OR lead_time_days != :lead_time_days OR service_z != :service_z
+            """, params)
+
+        # Products removed from the catalogue drop out of the status table
+        conn.execute("""
+            DELETE FROM ReorderStatus
+            WHERE product_id IN (SELECT product_id FROM ReorderQueue)
+              AND product_id NOT IN (SELECT product_id FROM Products)
+        """)
+        conn.execute(REFRESH_QUERY, params)
+        recomputed = conn.execute("SELECT changes()").fetchone()[0]
+        conn.execute("DELETE FROM ReorderQueue")
+        return recomputed
+
+    return retry_write(refresh, db_name)
+
+# Products at or below their reorder point, those with the fewest days of cover first
+def low_stock_products(db_name="inventory.db", limit=None):
+    with read_connection(db_name) as conn:
+        return conn.execute("""
+            SELECT ReorderStatus.product_id, product_name, product_category, on_hand, avg_daily_demand,
+                   safety_stock, reorder_point, days_of_cover
+            FROM ReorderStatus
+            JOIN Products ON Products.product_id = ReorderStatus.product_id
+            WHERE low_stock = 1
+            ORDER BY days_of_cover
+            LIMIT ?
+        """, (-1 if limit is None else limit,)).fetchall()
+
+profiling.instrument(sys.modules[__name__])
+
+if __name__ == "__main__":
+    # python reorder.py [database] [interval_seconds]: refresh once, or every interval
+    db_name = sys.argv[1] if len(sys.argv) > 1 else "inventory.db"
+    interval = float(sys.argv[2]) if len(sys.argv) > 2 else None
+    init_db(db_name)
+    try:
+        while True:
+            recomputed = refresh_reorder_status(db_name)
+            with read_connection(db_name) as conn:
+                low = conn.execute("SELECT COUNT(*) FROM ReorderStatus WHERE low_stock = 1").fetchone()[0]
+            print(f"Reorder status refreshed for {recomputed} products; {low} at or below their reorder point.")
+            if interval is None:
+                break
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
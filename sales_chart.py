@@ -0,0 +1,317 @@
+import numpy as np
+from tkinter import Toplevel, Frame, Label, Entry, Button, StringVar, OptionMenu, messagebox
+from matplotlib.figure import Figure
+from matplotlib.ticker import MaxNLocator
+
+# Most bars drawn at once; longer histories are binned into quarters or years, so
+# drawing costs the same however many months of sales there are
+MAX_BARS = 48
+
+# Bars get a value label only when there are at most this many
+LABELED_BARS = 24
+
+# Most tick labels along the x axis
+MAX_TICKS = 12
+
+# Bin sizes in months; 'Auto' picks the smallest that fits in MAX_BARS
+BIN_MONTHS = {'Month': 1, 'Quarter': 3, 'Year': 12}
+
+# How often an open chart checks the rollups for new sales, in milliseconds
+REFRESH_MS = 5000
+
+ALL_CATEGORIES = "All categories"
+
+# Monthly revenue from the sales rollups: overall, for one category or for one product,
+# optionally only from month `since` (YYYY-MM) on. Returns (month, total_revenue) rows.
+def monthly_sales(conn, category=None, product_id=None, since=None):
+    conditions, params = [], []
+    if product_id is not None:
+        table = "SalesMonthlyProduct"
+        conditions.append("product_id = ?")
+        params.append(product_id)
+    elif category is not None:
+        table = "SalesMonthlyProduct"
+        conditions.append("product_id IN (SELECT product_id FROM Products WHERE product_category = ?)")
+        params.append(category)
+    else:
+        table = "SalesMonthly"
+    if since is not None:
+        conditions.append("month >= ?")
+        params.append(since)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return conn.execute(f"""
+        SELECT month, SUM(total_revenue) FROM {table} {where}
+        GROUP BY month ORDER BY month
+    """, params).fetchall()
+
+def _month_number(month):
+    return int(month[:4]) * 12 + int(month[5:7]) - 1
+
+def _bin_label(number, bin_months):
+    year, month = divmod(number, 12)
+    if bin_months == 12:
+        return str(year)
+    if bin_months == 3:
+        return f"Q{month // 3 + 1} {year}"
+    return f"{month + 1:02d}/{year}"
+
+# Sum a monthly series into calendar-aligned bins of bin_months, or of the smallest size
+# that fits in MAX_BARS when bin_months is None; months without sales count as zero.
+# Returns (labels, totals).
+def bin_series(series, bin_months=None):
+    if not series:
+        return [], np.zeros(0)
+    numbers = np.array([_month_number(month) for month in series])
+    revenue = np.array([series[month] for month in series], dtype=float)
+    if bin_months is None:
+        span = numbers.max() - numbers.min() + 1
+        bin_months = next((size for size in BIN_MONTHS.values() if -(-span // size) <= MAX_BARS), 12)
+    first = numbers.min() - numbers.min() % bin_months
+    bins = (numbers - first) // bin_months
+    totals = np.bincount(bins, weights=revenue, minlength=bins.max() + 1)
+    return [_bin_label(first + i * bin_months, bin_months) for i in range(len(totals))], totals
+
+class SalesChartView:
+    # Revenue bar chart drawn on one figure that is reused for every scope and refresh.
+    # Bars and their labels are animated artists: a full draw renders only the axes,
+    # ticks and titles, whose image is cached, and the bars are blitted over it. A
+    # refresh that only changes bar heights within the current y range therefore
+    # redraws just the bars. The bar and label artists are kept in pools and reused
+    # when the scope or bins change, and the axis labels sit at fixed positions, so a
+    # full render does not lay out anything it drew before. Value labels cost about
+    # as much as the rest of a short chart; with schedule (e.g. Tk's after_idle) a
+    # full render shows the axes and bars first and blits the labels just after.
+    # Works with any Agg canvas, e.g. FigureCanvasTkAgg.
+
+    def __init__(self, figure, canvas, schedule=None):
+        self.figure = figure
+        self.canvas = canvas
+        self.schedule = schedule
+        self.axes = figure.add_subplot()
+        self.series = {}
+        self.bin_months = None
+        self.labels = []
+        self.bars = []
+        self.texts = []
+        self._bar_pool = []
+        self._text_pool = []
+        self._background = None
+        self._labels_pending = False
+        self.axes.set_xlabel("Period")
+        self.axes.set_ylabel("Total Revenue")
+        # Fixed margins with room for the rotated tick labels, and axis labels at fixed
+        # positions; tight_layout or automatic label placement would measure every
+        # tick label on each render
+        self.figure.subplots_adjust(left=0.1, right=0.97, top=0.93, bottom=0.2)
+        self.axes.xaxis.set_label_coords(0.5, -0.2)
+        self.axes.yaxis.set_label_coords(-0.08, 0.5)
+        # At most six revenue ticks; each tick label is a text to lay out and rasterize
+        self.axes.yaxis.set_major_locator(MaxNLocator(nbins=5))
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    @property
+    def last_month(self):
+        return max(self.series) if self.series else None
+
+    def set_data(self, rows, title, bin_months=None):
+        # Replace the series with (month, revenue) rows and redraw everything
+        self.series = {month: revenue or 0.0 for month, revenue in rows}
+        self.bin_months = bin_months
+        # A fixed title position; the automatic one checks every artist for overlap
+        self.axes.set_title(title, y=1.0)
+        self.render()
+
+    def update_tail(self, rows):
+        # Merge rows for the latest months into the series; blit if only heights changed
+        changed = False
+        for month, revenue in rows:
+            if self.series.get(month) != (revenue or 0.0):
+                self.series[month] = revenue or 0.0
+                changed = True
+        if not changed:
+            return False
+        labels, totals = bin_series(self.series, self.bin_months)
+        if labels != self.labels or totals.max(initial=0) > self.axes.get_ylim()[1]:
+            self.render()
+        else:
+            self._set_heights(totals)
+            self._blit()
+        return True
+
+    def render(self):
+        # Rebuild the bars for the current series and redraw the whole figure
+        labels, totals = bin_series(self.series, self.bin_months)
+        if labels != self.labels:
+            self._use_artists(len(labels))
+            step = max(1, -(-len(labels) // MAX_TICKS))
+            self.axes.set_xticks(range(0, len(labels), step), labels[::step], rotation=45, ha='right')
+            self.axes.set_xlim(-0.6, max(len(labels), 1) - 0.4)
+            self.labels = labels
+        self.axes.set_ylim(0, max(totals.max(initial=0) * 1.15, 1))
+        self._set_heights(totals)
+        self.canvas.draw()
+
+    def _use_artists(self, count):
+        # Show the first count pooled bars, and labels for them if there are few enough,
+        # creating artists only when the pool is too small
+        while len(self._bar_pool) < count:
+            self._bar_pool.extend(self.axes.bar(range(len(self._bar_pool), count), 0, color='skyblue', animated=True))
+        labeled = count if count <= LABELED_BARS else 0
+        while len(self._text_pool) < labeled:
+            self._text_pool.append(self.axes.text(len(self._text_pool), 0, "", ha='center', va='bottom',
+                                                  fontsize=8, animated=True))
+        for index, artist in enumerate(self._bar_pool):
+            artist.set_visible(index < count)
+        for index, artist in enumerate(self._text_pool):
+            artist.set_visible(index < labeled)
+        self.bars = self._bar_pool[:count]
+        self.texts = self._text_pool[:labeled]
+
+    def _set_heights(self, totals):
+        for bar, text, value in zip(self.bars, self.texts or [None] * len(self.bars), totals):
+            bar.set_height(value)
+            if text is not None:
+                text.set_y(value)
+                text.set_text(f"{value:.2f}")
+
+    def _on_draw(self, event):
+        # After a full draw (including resizes), cache the static image and add the bars
+        # and, now or once the drawn frame is shown, their value labels
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+        for bar in self.bars:
+            self.axes.draw_artist(bar)
+        if self.texts and self.schedule is not None:
+            self._labels_pending = True
+            self.schedule(self._draw_labels)
+        else:
+            for text in self.texts:
+                self.axes.draw_artist(text)
+
+    def _draw_labels(self):
+        # Deferred labels of the last full draw, unless a blit has drawn them since
+        if self._labels_pending:
+            self._labels_pending = False
+            for text in self.texts:
+                self.axes.draw_artist(text)
+            self.canvas.blit(self.figure.bbox)
+
+    def _draw_animated(self):
+        for artist in self.bars + self.texts:
+            self.axes.draw_artist(artist)
+
+    def _blit(self):
+        if self._background is None:
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self._background)
+        self._labels_pending = False
+        self._draw_animated()
+        self.canvas.blit(self.figure.bbox)
+
+class SalesChartWindow:
+    # Sales chart embedded in a Tk window, with category and product drilldown and a
+    # choice of bin size. Data is read from the rollups on a background worker, and the
+    # open chart checks the months since its latest one every REFRESH_MS.
+
+    def __init__(self, root, tasks, db_name="inventory.db"):
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+        self.root = root
+        self.tasks = tasks
+        self.db_name = db_name
+        self.scope = (None, None)
+        self.channel = ("sales_chart", id(self))
+        self.refresh_channel = ("sales_chart_refresh", id(self))
+
+        self.top = Toplevel(root)
+        self.top.title("Monthly Sales Revenue")
+        self.top.bind("<Destroy>", self._on_destroy)
+
+        controls = Frame(self.top)
+        controls.pack(fill="x")
+        Label(controls, text="Category:").pack(side="left")
+        self.category = StringVar(self.top, ALL_CATEGORIES)
+        self.category_menu = OptionMenu(controls, self.category, ALL_CATEGORIES)
+        self.category_menu.pack(side="left")
+        Label(controls, text="Product ID:").pack(side="left")
+        self.product_entry = Entry(controls, width=10)
+        self.product_entry.pack(side="left")
+        Label(controls, text="Bins:").pack(side="left")
+        self.bins = StringVar(self.top, "Auto")
+        OptionMenu(controls, self.bins, "Auto", *BIN_MONTHS).pack(side="left")
+        Button(controls, text="Show", command=self.load).pack(side="left", padx=5)
+
+        figure = Figure(figsize=(10, 6))
+        canvas = FigureCanvasTkAgg(figure, master=self.top)
+        canvas.get_tk_widget().pack(fill="both", expand=True)
+        self.view = SalesChartView(figure, canvas, schedule=self._after_idle)
+
+        self._load_categories()
+        self.load()
+        self._after = self.top.after(REFRESH_MS, self._refresh)
+
+    def _after_idle(self, func):
+        # Run func once Tk is idle, unless the window has been closed by then
+        self.top.after_idle(lambda: func() if self.top.winfo_exists() else None)
+
+    def _load_categories(self):
+        def fetch(task):
+            with task.reader(self.db_name) as conn:
+                return [row[0] for row in conn.execute(
+                    "SELECT DISTINCT product_category FROM Products WHERE product_category IS NOT NULL ORDER BY 1")]
+
+        def show(categories):
+            menu = self.category_menu['menu']
+            for category in categories:
+                menu.add_command(label=category, command=lambda value=category: self.category.set(value))
+
+        self.tasks.submit(("sales_chart_categories", id(self)), fetch, show)
+
+    def load(self):
+        # Read the selected scope in full and redraw the chart
+        product = self.product_entry.get().strip()
+        if product and not product.isdigit():
+            messagebox.showerror("Error", "Product ID must be a number.", parent=self.top)
+            return
+        category = None if self.category.get() == ALL_CATEGORIES else self.category.get()
+        scope = (category, int(product) if product else None)
+        bin_months = BIN_MONTHS.get(self.bins.get())
+        if scope[1] is not None:
+            title = f"Monthly Sales Revenue: product {scope[1]}"
+        else:
+            title = f"Monthly Sales Revenue: {category or ALL_CATEGORIES.lower()}"
+
+        def fetch(task):
+            with task.reader(self.db_name) as conn:
+                return monthly_sales(conn, *scope)
+
+        def show(rows):
+            self.scope = scope
+            if not rows:
+                messagebox.showinfo("Sales Chart", "No sales data to display.", parent=self.top)
+            self.view.set_data(rows, title, bin_months)
+
+        self.tasks.cancel(self.refresh_channel)
+        self.tasks.submit(self.channel, fetch, show,
+                          on_error=lambda e: messagebox.showerror("Error", f"Unable to display sales chart: {e}", parent=self.top))
+
+    def _refresh(self):
+        # Re-read only the latest month onwards; the rollup triggers keep it current
+        scope, since = self.scope, self.view.last_month
+
+        def fetch(task):
+            with task.reader(self.db_name) as conn:
+                return monthly_sales(conn, *scope, since=since)
+
+        def show(rows):
+            if scope == self.scope:
+                self.view.update_tail(rows)
+
+        self.tasks.submit(self.refresh_channel, fetch, show)
+        self._after = self.top.after(REFRESH_MS, self._refresh)
+
+    def _on_destroy(self, event):
+        if event.widget is self.top:
+            self.top.after_cancel(self._after)
+            for channel in (self.channel, self.refresh_channel, ("sales_chart_categories", id(self))):
+                self.tasks.cancel(channel)
@@ -1,10 +1,10 @@
-from database import create_tables, load_data_from_csv
+from database import init_db, load_data_from_csv
 
 # Path to your CSV file
 csv_file_path = "D:/inventory/Online Sales Data.csv"
 
-# Initialize tables and load data from CSV
-create_tables()
-load_data_from_csv(csv_file_path)
+# Initialize tables and load data from CSV; re-runs only load rows added since the last import
+init_db()
+load_data_from_csv(csv_file_path, incremental=True)
 
 print("Database initialized and data loaded from CSV.")